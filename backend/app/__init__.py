@@ -1,24 +1,67 @@
+import os
+
 from flask import Flask
 from app.core.config import settings
-from app.extensions import init_app as init_extensions
+from app.core import database, health, metrics, slow_profiler, sql_profiler
+from app.extensions import db, init_app as init_extensions
+from app.utils import login_throttle, serving_snapshot
+from app.utils.serializers import FastJSONProvider, compile_all
+
 
+def create_app(test_config=None) -> Flask:
+    """
+    Create and configure the Flask application
 
-def create_app() -> Flask:
-    """Create and configure the Flask application"""
-    app = Flask(__name__)
+    Safe to call once in a prefork master (gunicorn --preload): connection
+    pools, the Neo4j driver and worker threads are reset in each forked
+    process, so the routes and serializers built here are shared
+    copy-on-write by the workers.
+    """
+    app = Flask(__name__, instance_relative_config=True)
+    app.json = FastJSONProvider(app)
 
     # Load configuration
     app.config.from_object(settings)
     app.config['settings'] = settings
 
+    # Load test configuration if provided
+    if test_config:
+        app.config.update(test_config)
+
+    # Ensure the instance folder exists
+    os.makedirs(app.instance_path, exist_ok=True)
+
     # Initialize extensions
+    database.configure_engines(app)
     init_extensions(app)
+    database.init_app(app)
+    health.init_app(app)
+    metrics.init_app(app)
+    sql_profiler.init_app(app)
+    slow_profiler.init_app(app)
+    serving_snapshot.init_app(app)
+    login_throttle.init_app(app)
+
+    # Setup security features
+    from app.core.security import setup_security
+    setup_security(app)
 
     # Register blueprints
     from app.api.v1 import api_router
     from app.api.auth import auth_router
 
-    app.register_blueprint(api_router, aurl_prefix='/api/v1')
-    app.register_blueprint(auth_router, url_prefix='/auth')
+    app.register_blueprint(api_router, url_prefix='/api/v1')
+    app.register_blueprint(auth_router, url_prefix='/api/auth')
+
+    # Generate model serializers once instead of on first request
+    compile_all(db.Model)
+
+    # Public: cache, replica and pool details are exported from /metrics instead
+    @app.route('/health')
+    def health_check():
+        return {
+            "status": "healthy",
+            "version": settings.API_VERSION
+        }
 
     return app
@@ -3,8 +3,11 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime
 
+from app.models.base import transactional
 from app.models.user.user import User
 from app.core.security import generate_csrf_token
+from app.utils.login_throttle import login_throttle
+from app.utils.password_hasher import HasherBusyError
 
 # Create auth blueprint
 auth_router = Blueprint('auth', __name__)
@@ -18,6 +21,7 @@ class LoginSchema(Schema):
 
 @auth_router.route('/login', methods=['POST'])
 @jwt_required(optional=True)
+@transactional
 def login():
     """Authenticate user and return JWT token"""
   
@@ -26,23 +30,30 @@ def login():
         schema = LoginSchema()
         data = schema.load(request.json)
 
+        # Refuse throttled clients before spending any hashing time
+        retry_after = login_throttle.retry_after(data['username'], request.remote_addr)
+        if retry_after is not None:
+            return jsonify({
+                "error": "Too many failed login attempts"
+            }), 429, {"Retry-After": str(retry_after)}
+
         # Check credentials
         user = User.get_by_username(data['username'])
 
         if not user or not user.check_password(data['password']):
+            login_throttle.record_failure(data['username'], request.remote_addr)
             return jsonify({
                 "error": "Invalid credentials"
             }), 401
+        login_throttle.reset(data['username'])
 
         if not user.is_active:
             return jsonify({
                 "error": "User account is inactive"
             }), 403
 
-        # Create access token
+        # Create access token; roles and superuser status are resolved on the server per request
         additional_claims = {
-            "permissions": user.get_permissions(),
-            "is_superuser": user.is_superuser,
             "sub": str(user.id)
         }
 
@@ -64,6 +75,7 @@ def login():
         response = jsonify({
             "access_token": access_token,
             "csrf_token": csrf_token,
+            "permissions": user.get_permissions(),
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -76,6 +88,10 @@ def login():
         
         return response, 200
 
+    except HasherBusyError:
+        return jsonify({
+            "error": "Login temporarily unavailable, please retry"
+        }), 503, {"Retry-After": "1"}
     except ValidationError as e:
         print('ValidationError:', e)
         return jsonify({
@@ -1,8 +1,10 @@
 from flask import Blueprint
 from app.api.v1.advertiser import advertiser_router
+from app.api.v1.audit import audit_router
 from app.api.v1.campaign import campaign_router
 from app.api.v1.creative import creative_router
 from app.api.v1.report import report_router
+from app.api.v1.serving import serving_router
 from app.api.v1.user import user_router
 
 # Create API v1 blueprint
@@ -14,3 +16,5 @@ api_router.register_blueprint(campaign_router, url_prefix='/campaigns')
 api_router.register_blueprint(creative_router, url_prefix='/creatives')
 api_router.register_blueprint(report_router, url_prefix='/reports')
 api_router.register_blueprint(user_router, url_prefix='/users')
+api_router.register_blueprint(audit_router, url_prefix='/audit')
+api_router.register_blueprint(serving_router, url_prefix='/serving')
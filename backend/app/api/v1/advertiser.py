@@ -5,10 +5,11 @@ import os
 import uuid
 from werkzeug.utils import secure_filename
 
-from app.models.base import db
+from app.models.base import db, transactional
 from app.models.advertiser.advertiser import Advertiser, QualificationFile, Transaction
 from app.models.user.user import User
-from app.utils.validators import validate_permissions
+from app.utils.pagination import InvalidCursorError
+from app.utils.validators import claims_have_permission, token_is_superuser, validate_permissions
 
 # Create advertiser blueprint
 advertiser_router = Blueprint('advertiser', __name__)
@@ -58,8 +59,9 @@ class TransactionSchema(Schema):
 @validate_permissions(['advertisers.view'])
 def get_advertisers():
     """Get list of advertisers with pagination"""
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
 
     # Get JWT claims to check for advertiser_id
     claims = get_jwt()
@@ -67,12 +69,17 @@ def get_advertisers():
 
     # Filters
     filters = {}
-    if advertiser_id and not claims.get('is_superuser'):
+    if advertiser_id and not token_is_superuser(claims):
         # Regular users can only view their own advertiser
         filters['id'] = advertiser_id
 
-    # Query based on filters
-    result = Advertiser.paginate(page=page, per_page=per_page, **filters)
+    # Query based on filters (offset pagination only when a page is requested)
+    try:
+        result = Advertiser.paginate(page=page, per_page=per_page, cursor=cursor, **filters)
+    except InvalidCursorError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
 
     return jsonify(result), 200
 
@@ -85,7 +92,7 @@ def get_advertiser(advertiser_id):
     claims = get_jwt()
 
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'advertisers.view' in claims.get('permissions', []) or
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'advertisers.view') or
             claims.get('advertiser_id') == advertiser_id):
         return jsonify({
             "error": "Not authorized to view this advertiser"
@@ -105,6 +112,7 @@ def get_advertiser(advertiser_id):
 @advertiser_router.route('/', methods=['POST'])
 @jwt_required()
 @validate_permissions(['advertisers.create'])
+@transactional
 def create_advertiser():
     """Create a new advertiser"""
     try:
@@ -150,6 +158,7 @@ def create_advertiser():
 
 @advertiser_router.route('/<int:advertiser_id>', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_advertiser(advertiser_id):
     """Update an existing advertiser"""
     try:
@@ -157,7 +166,7 @@ def update_advertiser(advertiser_id):
         claims = get_jwt()
 
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'advertisers.update' in claims.get('permissions', []) or
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'advertisers.update') or
                 claims.get('advertiser_id') == advertiser_id):
             return jsonify({
                 "error": "Not authorized to update this advertiser"
@@ -209,6 +218,7 @@ def update_advertiser(advertiser_id):
 @advertiser_router.route('/<int:advertiser_id>/status', methods=['PUT'])
 @jwt_required()
 @validate_permissions(['advertisers.review'])
+@transactional
 def update_advertiser_status(advertiser_id):
     """Update advertiser status (approval workflow)"""
     try:
@@ -250,6 +260,7 @@ def update_advertiser_status(advertiser_id):
 
 @advertiser_router.route('/<int:advertiser_id>/upload', methods=['POST'])
 @jwt_required()
+@transactional
 def upload_qualification_file(advertiser_id):
     """Upload qualification documents for advertiser"""
     try:
@@ -257,7 +268,7 @@ def upload_qualification_file(advertiser_id):
         claims = get_jwt()
 
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'advertisers.upload' in claims.get('permissions', []) or
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'advertisers.upload') or
                 claims.get('advertiser_id') == advertiser_id):
             return jsonify({
                 "error": "Not authorized to upload files for this advertiser"
@@ -342,6 +353,7 @@ def upload_qualification_file(advertiser_id):
 @advertiser_router.route('/<int:advertiser_id>/deposit', methods=['POST'])
 @jwt_required()
 @validate_permissions(['advertisers.finance'])
+@transactional
 def deposit_funds(advertiser_id):
     """Deposit funds to advertiser account"""
     try:
@@ -389,6 +401,7 @@ def deposit_funds(advertiser_id):
 @advertiser_router.route('/<int:advertiser_id>/withdraw', methods=['POST'])
 @jwt_required()
 @validate_permissions(['advertisers.finance'])
+@transactional
 def withdraw_funds(advertiser_id):
     """Withdraw funds from advertiser account"""
     try:
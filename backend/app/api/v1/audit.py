@@ -0,0 +1,68 @@
+from typing import Optional
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt, jwt_required
+from sqlalchemy import select
+
+from app.models.base import AuditLogMixin, db
+from app.models.advertiser.advertiser import Advertiser
+from app.models.audit.audit import AuditEvent
+from app.utils.pagination import InvalidCursorError
+from app.utils.validators import token_is_superuser, validate_permissions
+
+# Create audit blueprint
+audit_router = Blueprint('audit', __name__)
+
+
+def get_audited_entity_types():
+    """Models that record an audit trail, by table name"""
+    return {
+        mapper.class_.__tablename__: mapper.class_
+        for mapper in db.Model.registry.mappers
+        if issubclass(mapper.class_, AuditLogMixin)
+    }
+
+
+def get_entity_advertiser_id(model, entity_id: int) -> Optional[int]:
+    """Advertiser an audited entity belongs to; None if it has none or no longer exists"""
+    if model is Advertiser:
+        return entity_id
+    column = model.__table__.c.get('advertiser_id')
+    if column is None:
+        return None
+    return db.session.execute(
+        select(column).where(model.__table__.c.id == entity_id)
+    ).scalar()
+
+
+@audit_router.route('/<entity_type>/<int:entity_id>', methods=['GET'])
+@jwt_required()
+@validate_permissions(['audit.view'])
+def get_audit_history(entity_type, entity_id):
+    """Get audit history of an entity with cursor pagination"""
+    model = get_audited_entity_types().get(entity_type)
+    if model is None:
+        return jsonify({
+            "error": f"Unknown entity type: {entity_type}"
+        }), 404
+
+    # Regular users can only view the history of their own advertiser's entities
+    claims = get_jwt()
+    advertiser_id = claims.get('advertiser_id')
+    if (advertiser_id and not token_is_superuser(claims)
+            and get_entity_advertiser_id(model, entity_id) != advertiser_id):
+        return jsonify({
+            "error": "Not authorized to view this audit history"
+        }), 403
+
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
+
+    try:
+        result = AuditEvent.history(entity_type, entity_id, cursor=cursor, per_page=per_page)
+    except InvalidCursorError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
+
+    return jsonify(result), 200
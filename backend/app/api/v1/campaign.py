@@ -3,9 +3,11 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime
 
-from app.models.base import db
+from app.models.base import db, transactional
 from app.models.campaign.campaign import Campaign, Creative, TargetingRule
-from app.utils.validators import validate_permissions
+from app.utils.pagination import InvalidCursorError
+from app.utils.serializers import InvalidFieldsError, resolve_fields
+from app.utils.validators import claims_have_permission, token_is_superuser, validate_permissions
 
 # Create campaign blueprint
 campaign_router = Blueprint('campaign', __name__)
@@ -53,8 +55,9 @@ class CampaignStatusSchema(Schema):
 @jwt_required()
 def get_campaigns():
     """Get list of campaigns with pagination"""
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
     
     # Get JWT claims to check for advertiser_id
     claims = get_jwt()
@@ -62,12 +65,18 @@ def get_campaigns():
     
     # Filters
     filters = {}
-    if advertiser_id and not claims.get('is_superuser'):
+    if advertiser_id and not token_is_superuser(claims):
         # Regular users can only view their own campaigns
         filters['advertiser_id'] = advertiser_id
     
-    # Query based on filters
-    result = Campaign.paginate(page=page, per_page=per_page, **filters)
+    # Query based on filters (offset pagination only when a page is requested)
+    try:
+        fields = resolve_fields(Campaign, request.args.get('fields'), Campaign.list_fields())
+        result = Campaign.paginate(page=page, per_page=per_page, cursor=cursor, fields=fields, **filters)
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
     
     return jsonify(result), 200
 
@@ -79,28 +88,38 @@ def get_campaign(campaign_id):
     # Get JWT claims to check for permissions
     claims = get_jwt()
     
+    # Optional sparse fieldset (?fields=a,b); the ownership check also needs advertiser_id
+    try:
+        fields = resolve_fields(Campaign, request.args.get('fields'))
+    except InvalidFieldsError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
+
     # Find campaign
-    campaign = Campaign.get_by_id(campaign_id)
+    columns = fields + ('advertiser_id',) if fields is not None else None
+    campaign = Campaign.get_by_id(campaign_id, columns=columns)
     if not campaign:
         return jsonify({
             "error": "Campaign not found"
         }), 404
     
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'campaigns.view' in claims.get('permissions', []) or 
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'campaigns.view') or 
             claims.get('advertiser_id') == campaign.advertiser_id):
         return jsonify({
             "error": "Not authorized to view this campaign"
         }), 403
     
     return jsonify({
-        "campaign": campaign.to_dict()
+        "campaign": campaign.to_dict(fields)
     }), 200
 
 
 @campaign_router.route('/', methods=['POST'])
 @jwt_required()
 @validate_permissions(['campaigns.create'])
+@transactional
 def create_campaign():
     """Create a new campaign"""
     try:
@@ -149,6 +168,7 @@ def create_campaign():
 
 @campaign_router.route('/<int:campaign_id>', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_campaign(campaign_id):
     """Update an existing campaign"""
     try:
@@ -163,7 +183,7 @@ def update_campaign(campaign_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'campaigns.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'campaigns.update') or 
                 claims.get('advertiser_id') == campaign.advertiser_id):
             return jsonify({
                 "error": "Not authorized to update this campaign"
@@ -208,6 +228,7 @@ def update_campaign(campaign_id):
 @campaign_router.route('/<int:campaign_id>/status', methods=['PUT'])
 @jwt_required()
 @validate_permissions(['campaigns.review'])
+@transactional
 def update_campaign_status(campaign_id):
     """Update campaign status"""
     try:
@@ -257,6 +278,7 @@ def update_campaign_status(campaign_id):
 
 @campaign_router.route('/<int:campaign_id>/targeting', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_campaign_targeting(campaign_id):
     """Update campaign targeting rules"""
     try:
@@ -271,7 +293,7 @@ def update_campaign_targeting(campaign_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'campaigns.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'campaigns.update') or 
                 claims.get('advertiser_id') == campaign.advertiser_id):
             return jsonify({
                 "error": "Not authorized to update this campaign"
@@ -5,9 +5,11 @@ import os
 import uuid
 from werkzeug.utils import secure_filename
 
-from app.models.base import db
+from app.models.base import db, transactional
 from app.models.campaign.campaign import Creative, Campaign
-from app.utils.validators import validate_permissions
+from app.utils.pagination import InvalidCursorError
+from app.utils.serializers import InvalidFieldsError, resolve_fields
+from app.utils.validators import claims_have_permission, token_is_superuser, validate_permissions
 
 # Create creative blueprint
 creative_router = Blueprint('creative', __name__)
@@ -46,8 +48,9 @@ class CreativeStatusSchema(Schema):
 @jwt_required()
 def get_creatives():
     """Get list of creatives with pagination"""
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
     
     # Get JWT claims to check for advertiser_id
     claims = get_jwt()
@@ -55,12 +58,18 @@ def get_creatives():
     
     # Filters
     filters = {}
-    if advertiser_id and not claims.get('is_superuser'):
+    if advertiser_id and not token_is_superuser(claims):
         # Regular users can only view their own creatives
         filters['advertiser_id'] = advertiser_id
     
-    # Query based on filters
-    result = Creative.paginate(page=page, per_page=per_page, **filters)
+    # Query based on filters (offset pagination only when a page is requested)
+    try:
+        fields = resolve_fields(Creative, request.args.get('fields'), Creative.list_fields())
+        result = Creative.paginate(page=page, per_page=per_page, cursor=cursor, fields=fields, **filters)
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
     
     return jsonify(result), 200
 
@@ -72,28 +81,38 @@ def get_creative(creative_id):
     # Get JWT claims to check for permissions
     claims = get_jwt()
     
+    # Optional sparse fieldset (?fields=a,b); the ownership check also needs campaign_id
+    try:
+        fields = resolve_fields(Creative, request.args.get('fields'))
+    except InvalidFieldsError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
+
     # Find creative
-    creative = Creative.get_by_id(creative_id)
+    columns = fields + ('campaign_id',) if fields is not None else None
+    creative = Creative.get_by_id(creative_id, columns=columns)
     if not creative:
         return jsonify({
             "error": "Creative not found"
         }), 404
     
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'creatives.view' in claims.get('permissions', []) or 
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'creatives.view') or 
             claims.get('advertiser_id') == creative.campaign.advertiser_id):
         return jsonify({
             "error": "Not authorized to view this creative"
         }), 403
     
     return jsonify({
-        "creative": creative.to_dict()
+        "creative": creative.to_dict(fields)
     }), 200
 
 
 @creative_router.route('/', methods=['POST'])
 @jwt_required()
 @validate_permissions(['creatives.create'])
+@transactional
 def create_creative():
     """Create a new creative"""
     try:
@@ -139,6 +158,7 @@ def create_creative():
 
 @creative_router.route('/<int:creative_id>', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_creative(creative_id):
     """Update an existing creative"""
     try:
@@ -153,7 +173,7 @@ def update_creative(creative_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'creatives.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'creatives.update') or 
                 claims.get('advertiser_id') == creative.campaign.advertiser_id):
             return jsonify({
                 "error": "Not authorized to update this creative"
@@ -198,6 +218,7 @@ def update_creative(creative_id):
 @creative_router.route('/<int:creative_id>/status', methods=['PUT'])
 @jwt_required()
 @validate_permissions(['creatives.review'])
+@transactional
 def update_creative_status(creative_id):
     """Update creative status"""
     try:
@@ -247,6 +268,7 @@ def update_creative_status(creative_id):
 
 @creative_router.route('/<int:creative_id>/upload', methods=['POST'])
 @jwt_required()
+@transactional
 def upload_creative_file(creative_id):
     """Upload creative content file"""
     try:
@@ -261,7 +283,7 @@ def upload_creative_file(creative_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'creatives.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'creatives.update') or 
                 claims.get('advertiser_id') == creative.campaign.advertiser_id):
             return jsonify({
                 "error": "Not authorized to upload files for this creative"
@@ -2,13 +2,13 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime, timedelta
-import pandas as pd
 import json
 
 from app.models.base import db
 from app.models.campaign.campaign import Campaign, Creative
 from app.models.report.report import Report
-from app.utils.validators import validate_permissions
+from app.utils.pagination import InvalidCursorError
+from app.utils.validators import advertiser_rate_limit, claims_have_permission, token_is_superuser, validate_permissions
 from app.utils.report_generators import (
     generate_campaign_report,
     generate_creative_report,
@@ -38,6 +38,7 @@ class ReportRequestSchema(Schema):
 @report_router.route('/generate', methods=['POST'])
 @jwt_required()
 @validate_permissions(['reports.generate'])
+@advertiser_rate_limit
 def generate_report():
     """Generate a new report"""
     try:
@@ -109,8 +110,9 @@ def generate_report():
 @jwt_required()
 def get_reports():
     """Get list of reports with pagination"""
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
 
     # Get JWT claims to check for advertiser_id
     claims = get_jwt()
@@ -118,12 +120,17 @@ def get_reports():
 
     # Filters
     filters = {}
-    if advertiser_id and not claims.get('is_superuser'):
+    if advertiser_id and not token_is_superuser(claims):
         # Regular users can only view their own reports
         filters['advertiser_id'] = advertiser_id
 
-    # Query based on filters
-    result = Report.paginate(page=page, per_page=per_page, **filters)
+    # Query based on filters (offset pagination only when a page is requested)
+    try:
+        result = Report.paginate(page=page, per_page=per_page, cursor=cursor, **filters)
+    except InvalidCursorError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
 
     return jsonify(result), 200
 
@@ -143,7 +150,7 @@ def get_report(report_id):
         }), 404
 
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'reports.view' in claims.get('permissions', []) or
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'reports.view') or
             claims.get('advertiser_id') == report.advertiser_id):
         return jsonify({
             "error": "Not authorized to view this report"
@@ -185,7 +192,7 @@ def download_report(report_id):
         }), 404
 
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'reports.download' in claims.get('permissions', []) or
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'reports.download') or
             claims.get('advertiser_id') == report.advertiser_id):
         return jsonify({
             "error": "Not authorized to download this report"
@@ -208,6 +215,7 @@ def download_report(report_id):
     data = report.get_data()
 
     # Convert to DataFrame
+    import pandas as pd
     df = pd.DataFrame(data)
 
     # Generate file based on format
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import Blueprint, jsonify
+from flask_jwt_extended import get_jwt, jwt_required
+
+from app.utils.serving_snapshot import SnapshotRecord, serving_snapshot
+from app.utils.validators import claims_have_permission, token_is_superuser
+
+# Create serving blueprint
+serving_router = Blueprint('serving', __name__)
+
+# Campaign fields locating its creatives inside the snapshot
+INTERNAL_FIELDS = ('creatives_start', 'creatives_count')
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+def _campaign_payload(campaign: SnapshotRecord) -> Dict[str, Any]:
+    payload = campaign.to_dict()
+    for name in INTERNAL_FIELDS:
+        del payload[name]
+    payload['start_at'] = _isoformat(payload['start_at'])
+    payload['end_at'] = _isoformat(payload['end_at'])
+    return payload
+
+
+@serving_router.route('/campaigns/<int:campaign_id>', methods=['GET'])
+@jwt_required()
+def get_serving_campaign(campaign_id):
+    """
+    Get a campaign and its creatives as currently served
+
+    Read from the serving snapshot, not the database: a campaign or
+    creative is listed only while it is active, as of the last snapshot
+    build.
+    """
+    generated_at = serving_snapshot.generated_at
+    if generated_at is None:
+        return jsonify({
+            "error": "Serving snapshot not available"
+        }), 503
+
+    campaign = serving_snapshot.campaign(campaign_id)
+    if campaign is None:
+        return jsonify({
+            "error": "Campaign is not serving"
+        }), 404
+
+    # Ownership first: it needs no permission lookup
+    claims = get_jwt()
+    if not (claims.get('advertiser_id') == campaign.advertiser_id or token_is_superuser(claims) or
+            claims_have_permission(claims, 'campaigns.view')):
+        return jsonify({
+            "error": "Not authorized to view this campaign"
+        }), 403
+
+    return jsonify({
+        "campaign": _campaign_payload(campaign),
+        "creatives": [creative.to_dict() for creative in serving_snapshot.creatives(campaign_id)],
+        "generated_at": _isoformat(generated_at)
+    }), 200
@@ -1,12 +1,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, create_access_token
 from marshmallow import Schema, fields, validate, ValidationError
-from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
-from app.models.base import db
+from app.models.base import db, transactional
 from app.models.user.user import User, Role, Permission
-from app.utils.validators import validate_permissions
+from app.utils.pagination import InvalidCursorError
+from app.utils.password_hasher import HasherBusyError
+from app.utils.validators import claims_have_permission, token_is_superuser, validate_permissions
 from app.utils.email import send_password_reset_email, send_welcome_email
 
 # Create user blueprint
@@ -53,6 +54,7 @@ class PasswordResetSchema(Schema):
 @user_router.route('/register', methods=['POST'])
 @jwt_required()
 @validate_permissions(['users.create'])
+@transactional
 def register_user():
     """Register a new user"""
     try:
@@ -72,7 +74,6 @@ def register_user():
         # Create user
         user = User(
             email=data['email'],
-            password=generate_password_hash(data['password']),
             first_name=data['first_name'],
             last_name=data['last_name'],
             role_id=data['role_id'],
@@ -82,6 +83,8 @@ def register_user():
             updated_by_id=current_user_id
         )
         
+        user.set_password(data['password'])
+
         # Save user
         user.save()
         
@@ -93,6 +96,10 @@ def register_user():
             "user": user.to_dict()
         }), 201
         
+    except HasherBusyError:
+        return jsonify({
+            "error": "Password service busy, please retry"
+        }), 503, {"Retry-After": "1"}
     except ValidationError as e:
         return jsonify({
             "error": "Validation error",
@@ -109,8 +116,9 @@ def register_user():
 @validate_permissions(['users.view'])
 def get_users():
     """Get list of users with pagination"""
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
     
     # Get JWT claims to check for advertiser_id
     claims = get_jwt()
@@ -118,12 +126,17 @@ def get_users():
     
     # Filters
     filters = {}
-    if advertiser_id and not claims.get('is_superuser'):
+    if advertiser_id and not token_is_superuser(claims):
         # Regular users can only view users from their advertiser
         filters['advertiser_id'] = advertiser_id
     
-    # Query based on filters
-    result = User.paginate(page=page, per_page=per_page, **filters)
+    # Query based on filters (offset pagination only when a page is requested)
+    try:
+        result = User.paginate(page=page, per_page=per_page, cursor=cursor, **filters)
+    except InvalidCursorError as e:
+        return jsonify({
+            "error": str(e)
+        }), 400
     
     return jsonify(result), 200
 
@@ -143,7 +156,7 @@ def get_user(user_id):
         }), 404
     
     # Check permissions or ownership
-    if not (claims.get('is_superuser') or 'users.view' in claims.get('permissions', []) or 
+    if not (token_is_superuser(claims) or claims_have_permission(claims, 'users.view') or 
             claims.get('advertiser_id') == user.advertiser_id or 
             claims.get('sub') == user_id):
         return jsonify({
@@ -157,6 +170,7 @@ def get_user(user_id):
 
 @user_router.route('/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_user(user_id):
     """Update user details"""
     try:
@@ -171,7 +185,7 @@ def update_user(user_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'users.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'users.update') or 
                 claims.get('advertiser_id') == user.advertiser_id or 
                 claims.get('sub') == user_id):
             return jsonify({
@@ -216,6 +230,7 @@ def update_user(user_id):
 
 @user_router.route('/<int:user_id>/password', methods=['PUT'])
 @jwt_required()
+@transactional
 def update_password(user_id):
     """Update user password"""
     try:
@@ -230,7 +245,7 @@ def update_password(user_id):
             }), 404
         
         # Check permissions or ownership
-        if not (claims.get('is_superuser') or 'users.update' in claims.get('permissions', []) or 
+        if not (token_is_superuser(claims) or claims_have_permission(claims, 'users.update') or 
                 claims.get('sub') == user_id):
             return jsonify({
                 "error": "Not authorized to update this user's password"
@@ -241,7 +256,7 @@ def update_password(user_id):
         data = schema.load(request.json)
         
         # Verify current password
-        if not check_password_hash(user.password, data['current_password']):
+        if not user.check_password(data['current_password']):
             return jsonify({
                 "error": "Current password is incorrect"
             }), 400
@@ -250,7 +265,7 @@ def update_password(user_id):
         current_user_id = get_jwt_identity()
         
         # Update password
-        user.password = generate_password_hash(data['new_password'])
+        user.set_password(data['new_password'])
         user.updated_by_id = current_user_id
         
         # Log change in audit log
@@ -263,6 +278,10 @@ def update_password(user_id):
             "message": "Password updated successfully"
         }), 200
         
+    except HasherBusyError:
+        return jsonify({
+            "error": "Password service busy, please retry"
+        }), 503, {"Retry-After": "1"}
     except ValidationError as e:
         return jsonify({
             "error": "Validation error",
@@ -311,6 +330,7 @@ def request_password_reset():
 
 
 @user_router.route('/password/reset', methods=['POST'])
+@transactional
 def reset_password():
     """Reset password using token"""
     try:
@@ -326,7 +346,7 @@ def reset_password():
             }), 400
         
         # Update password
-        user.password = generate_password_hash(data['new_password'])
+        user.set_password(data['new_password'])
         user.updated_by_id = user.id  # Self-update
         
         # Log change in audit log
@@ -339,6 +359,10 @@ def reset_password():
             "message": "Password reset successfully"
         }), 200
         
+    except HasherBusyError:
+        return jsonify({
+            "error": "Password service busy, please retry"
+        }), 503, {"Retry-After": "1"}
     except ValidationError as e:
         return jsonify({
             "error": "Validation error",
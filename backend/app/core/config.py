@@ -1,5 +1,5 @@
 import os
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import BaseSettings, AnyHttpUrl, validator
 
 
@@ -15,13 +15,47 @@ class Settings(BaseSettings):
     MYSQL_PASSWORD: str = os.getenv("MYSQL_PASSWORD", "gtinging")
     MYSQL_DATABASE: str = os.getenv("MYSQL_DATABASE", "dsp_ad_system")
     
+    # Full primary URL, overriding the MySQL settings above (e.g. a local SQLite file)
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"mysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}?charset=utf8mb4"
     
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
     SQLALCHEMY_ECHO: bool = DEBUG
 
+    # Read replicas (comma-separated URLs), used for GET requests and report generation
+    REPLICA_DATABASE_URLS: str = os.getenv("REPLICA_DATABASE_URLS", "")
+    # Seconds of lag after which a replica gets no reads / seconds between lag checks
+    REPLICA_MAX_LAG: float = float(os.getenv("REPLICA_MAX_LAG", 5.0))
+    REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", 2.0))
+    # Seconds a client's reads stay on the primary after it writes
+    READ_YOUR_WRITES_WINDOW: float = float(os.getenv("READ_YOUR_WRITES_WINDOW", 5.0))
+    # GET endpoints that must read from the primary
+    REPLICA_EXCLUDED_ENDPOINTS: List[str] = ["health_check", "readiness_check", "auth.verify_token"]
+
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> List[str]:
+        return [url.strip() for url in self.REPLICA_DATABASE_URLS.split(",") if url.strip()]
+
+    @property
+    def SQLALCHEMY_BINDS(self) -> Dict[str, str]:
+        return {f"replica_{index}": uri for index, uri in enumerate(self.SQLALCHEMY_REPLICA_URIS)}
+
+    # Connection pool of each engine, per worker process
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10.0))
+    # Seconds after which a connection is replaced (below MySQL's wait_timeout)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true", "1", "t")
+    # Per-bind overrides of the above, e.g. {"replica_0": {"pool_size": 20}}; the primary is "default"
+    DB_POOL_OPTIONS: Dict[str, Dict[str, Union[int, float, bool]]] = {}
+
     # JWT Settings
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "dev_jwt_key")
     JWT_ACCESS_TOKEN_EXPIRES: int = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES", 86400))
@@ -64,8 +98,131 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/2")
     CELERY_RESULT_BACKEND: str = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/2")
 
-    # API Rate Limiting
-    RATE_LIMIT_DEFAULT: str = "100/hour"
+    # List endpoint totals (seconds a count is served before refresh, and how long
+    # it is reported as exact; writes by other workers aren't seen before that)
+    COUNT_CACHE_TTL: int = int(os.getenv("COUNT_CACHE_TTL", 60))
+    COUNT_EXACT_TTL: float = float(os.getenv("COUNT_EXACT_TTL", 5.0))
+
+    # Audit trail writer (events per INSERT / max seconds an event waits)
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+
+    # Spend ledger (write-ahead log directory / seconds between settlements /
+    # user recorded as creator of settlement transactions)
+    SPEND_LEDGER_DIR: str = os.getenv("SPEND_LEDGER_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ledger"))
+    SPEND_SETTLE_INTERVAL: float = float(os.getenv("SPEND_SETTLE_INTERVAL", 1.0))
+    LEDGER_SYSTEM_USER_ID: int = int(os.getenv("LEDGER_SYSTEM_USER_ID", 1))
+
+    # Balance guard (shared memory segment name / max advertisers per node /
+    # seconds between credit line refills / credit below which campaigns stop)
+    BALANCE_GUARD_SHM_NAME: str = os.getenv("BALANCE_GUARD_SHM_NAME", "dsp_balance_guard")
+    BALANCE_GUARD_CAPACITY: int = int(os.getenv("BALANCE_GUARD_CAPACITY", 65536))
+    BALANCE_GUARD_REFRESH_INTERVAL: float = float(os.getenv("BALANCE_GUARD_REFRESH_INTERVAL", 5.0))
+    BALANCE_GUARD_MIN_CREDIT: float = float(os.getenv("BALANCE_GUARD_MIN_CREDIT", 0.01))
+
+    # Serving counters (shared memory name prefix / max campaign and creative id /
+    # max worker processes per node / seconds between aggregator flushes)
+    SERVING_COUNTERS_SHM_NAME: str = os.getenv("SERVING_COUNTERS_SHM_NAME", "dsp_serving")
+    SERVING_COUNTERS_CAPACITY: int = int(os.getenv("SERVING_COUNTERS_CAPACITY", 65536))
+    SERVING_COUNTERS_WORKERS: int = int(os.getenv("SERVING_COUNTERS_WORKERS", 16))
+    SERVING_COUNTERS_FLUSH_INTERVAL: float = float(os.getenv("SERVING_COUNTERS_FLUSH_INTERVAL", 5.0))
+
+    # Serving snapshot (file written by the builder and mapped by every worker /
+    # seconds between checks for a newer file)
+    SERVING_SNAPSHOT_PATH: str = os.getenv("SERVING_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshots", "serving.snap"))
+    SERVING_SNAPSHOT_CHECK_INTERVAL: float = float(os.getenv("SERVING_SNAPSHOT_CHECK_INTERVAL", 1.0))
+
+    # Shared cache tier (Flask-Caching; RedisCache in production)
+    CACHE_TYPE: str = os.getenv("CACHE_TYPE", "SimpleCache")
+    CACHE_REDIS_URL: str = os.getenv("REDIS_CACHE_URL", "redis://localhost:6379/1")
+    CACHE_DEFAULT_TIMEOUT: int = int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300))
+    CACHE_THRESHOLD: int = int(os.getenv("CACHE_THRESHOLD", 50000))
+
+    # Model cache for get_by_id (seconds a shared entry lives / seconds a
+    # process trusts its local copy / rows held per process)
+    MODEL_CACHE_TTL: int = int(os.getenv("MODEL_CACHE_TTL", 300))
+    MODEL_CACHE_LOCAL_TTL: float = float(os.getenv("MODEL_CACHE_LOCAL_TTL", 2.0))
+    MODEL_CACHE_LOCAL_SIZE: int = int(os.getenv("MODEL_CACHE_LOCAL_SIZE", 10000))
+
+    # Seconds before a role permission change reaches other processes
+    PERMISSION_REFRESH_INTERVAL: float = float(os.getenv("PERMISSION_REFRESH_INTERVAL", 5.0))
+
+    # Password hashing (PBKDF2 iterations; changing it rehashes on next login /
+    # hashing threads per process / hashes allowed to wait for a thread)
+    PASSWORD_HASH_ITERATIONS: int = int(os.getenv("PASSWORD_HASH_ITERATIONS", 100000))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE: int = int(os.getenv("PASSWORD_HASH_QUEUE", 32))
+
+    # Login throttling (failed attempts allowed per username and per IP in each window of seconds)
+    LOGIN_MAX_FAILURES_PER_USER: int = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", 5))
+    LOGIN_MAX_FAILURES_PER_IP: int = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", 50))
+    LOGIN_THROTTLE_WINDOW: int = int(os.getenv("LOGIN_THROTTLE_WINDOW", 300))
+
+    # Readiness checks (/ready): seconds all checks may take / seconds after which a
+    # dependency counts as failing / seconds results are reused
+    READINESS_TIMEOUT: float = float(os.getenv("READINESS_TIMEOUT", 2.0))
+    READINESS_SLOW_THRESHOLD: float = float(os.getenv("READINESS_SLOW_THRESHOLD", 1.0))
+    READINESS_CACHE_TTL: float = float(os.getenv("READINESS_CACHE_TTL", 2.0))
+    # Checks whose failure takes the node out of rotation; replicas, the rate limit
+    # store and Neo4j are only reported (reads and the limiter fall back without them)
+    READINESS_REQUIRED: List[str] = ["database", "cache"]
+
+    # Prometheus metrics at /metrics, summed over the node's worker processes in
+    # shared memory. Served only when METRICS_TOKEN is set; scrapers send it as a
+    # Bearer token. METRICS_WORKER_SLOTS bounds the workers counted at once (a dead
+    # worker's slot and counts pass to the next one started). Set METRICS_INSTANCE when
+    # servers in different PID namespaces (containers) share /dev/shm
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "t")
+    METRICS_TOKEN: Optional[str] = os.getenv("METRICS_TOKEN")
+    METRICS_SHM_NAME: str = os.getenv("METRICS_SHM_NAME", "dsp_request_metrics")
+    METRICS_WORKER_SLOTS: int = int(os.getenv("METRICS_WORKER_SLOTS", 64))
+    METRICS_INSTANCE: str = os.getenv("METRICS_INSTANCE", "")
+
+    # SQL profiler: "off", "sampled" (SQL_PROFILER_SAMPLE_RATE of requests and report
+    # jobs, safe in production) or "all". Profiles are logged; a SELECT repeated
+    # SQL_PROFILER_N_PLUS_ONE times in one profile is flagged as a possible N+1
+    SQL_PROFILER_MODE: str = os.getenv("SQL_PROFILER_MODE", "sampled")
+    SQL_PROFILER_SAMPLE_RATE: float = float(os.getenv("SQL_PROFILER_SAMPLE_RATE", 0.01))
+    SQL_PROFILER_N_PLUS_ONE: int = int(os.getenv("SQL_PROFILER_N_PLUS_ONE", 10))
+    # Log the plan of profiled SELECTs slower than this many milliseconds (0 disables)
+    SQL_PROFILER_EXPLAIN_MS: float = float(os.getenv("SQL_PROFILER_EXPLAIN_MS", 0))
+
+    # Slow request profiler: requests (and report jobs) running at least this many
+    # milliseconds get a stack-sampled profile saved for flamegraphs (0 disables)
+    SLOW_PROFILE_THRESHOLD_MS: float = float(os.getenv("SLOW_PROFILE_THRESHOLD_MS", 2000))
+    SLOW_PROFILE_JOB_THRESHOLD_MS: float = float(os.getenv("SLOW_PROFILE_JOB_THRESHOLD_MS", 60000))
+    SLOW_PROFILE_DIR: str = os.getenv("SLOW_PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"))
+    # Budgets (ms between samples / max fraction of a CPU spent sampling /
+    # profiles saved per worker per hour)
+    SLOW_PROFILE_INTERVAL_MS: float = float(os.getenv("SLOW_PROFILE_INTERVAL_MS", 20))
+    SLOW_PROFILE_MAX_OVERHEAD: float = float(os.getenv("SLOW_PROFILE_MAX_OVERHEAD", 0.01))
+    SLOW_PROFILE_MAX_PER_HOUR: int = int(os.getenv("SLOW_PROFILE_MAX_PER_HOUR", 60))
+
+    # Report jobs (MB a job may grow the process by before it finishes in chunks,
+    # 0 keeps every job in memory / rows per chunk / also trace each stage's
+    # Python allocations with tracemalloc, which slows ORM-heavy stages ~5x)
+    REPORT_MEMORY_LIMIT_MB: int = int(os.getenv("REPORT_MEMORY_LIMIT_MB", 1024))
+    REPORT_CHUNK_ROWS: int = int(os.getenv("REPORT_CHUNK_ROWS", 50000))
+    REPORT_TRACE_MEMORY: bool = os.getenv("REPORT_TRACE_MEMORY", "False").lower() in ("true", "1", "t")
+
+    # API Rate Limiting (per user for authenticated requests, else per client address)
+    RATE_LIMIT_DEFAULT: str = os.getenv("RATE_LIMIT_DEFAULT", "6000/hour")
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted
+    TRUSTED_PROXY_COUNT: int = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+    # Token buckets: "memory://" (per process) or a Redis URL shared by all workers
+    RATE_LIMIT_STORAGE_URL: str = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+    # Per-endpoint limits replacing the default (JSON object of endpoint -> rate)
+    RATE_LIMIT_ROUTES: Dict[str, str] = {
+        "auth.login": "20/minute"
+    }
+    # Endpoints never limited
+    RATE_LIMIT_EXEMPT: List[str] = ["health_check", "readiness_check", "prometheus_metrics"]
+    # Per-advertiser limit for routes using advertiser_rate_limit, with per-id overrides
+    RATE_LIMIT_ADVERTISER: str = os.getenv("RATE_LIMIT_ADVERTISER", "1000/hour")
+    RATE_LIMIT_ADVERTISERS: Dict[str, str] = {}
+    # Share of a bucket leased to a process at once / seconds a lease lasts
+    RATE_LIMIT_LEASE_FRACTION: float = float(os.getenv("RATE_LIMIT_LEASE_FRACTION", 0.05))
+    RATE_LIMIT_LEASE_TTL: float = float(os.getenv("RATE_LIMIT_LEASE_TTL", 1.0))
 
     # File Upload Settings
     UPLOAD_FOLDER: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
@@ -0,0 +1,388 @@
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from flask import Flask, current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# session.info flag: this transaction wrote, so its reads stay on the primary
+WROTE_KEY = 'routing_wrote'
+
+# 'replica' or 'primary' when a block of code chose where its reads go
+_read_target: ContextVar[Optional[str]] = ContextVar('read_target', default=None)
+# time.time() by which a replica must have applied every commit to serve this block's reads
+_caught_up_to: ContextVar[Optional[float]] = ContextVar('replica_caught_up_to', default=None)
+
+
+@contextmanager
+def replica_reads(caught_up_to: Optional[float] = None) -> Iterator[None]:
+    """
+    Send this block's reads to a replica, e.g. in report generators
+
+    With ``caught_up_to`` (a time.time() value), only to a replica known to
+    have applied everything committed by then, else to the primary.
+    """
+    token = _read_target.set('replica')
+    caught_up_token = _caught_up_to.set(caught_up_to)
+    try:
+        yield
+    finally:
+        _caught_up_to.reset(caught_up_token)
+        _read_target.reset(token)
+
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """Keep this block's reads on the primary, even inside a read-only request"""
+    token = _read_target.set('primary')
+    try:
+        yield
+    finally:
+        _read_target.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Picks a replica engine for reads, skipping replicas that lag
+
+    Each replica's lag is measured at most every ``check_interval`` seconds.
+    MySQL reports it in SHOW REPLICA STATUS. For SQLite stand-ins the sync
+    script stores the time of its last copy in ``PRAGMA user_version``.
+    Replicas more than ``max_lag`` seconds behind, or that fail the check,
+    get no reads until a later check finds them caught up.
+    """
+
+    def __init__(self, max_lag: float = 5.0, check_interval: float = 2.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag: Dict[str, Optional[float]] = {}
+        # Wall-clock time each replica had applied every commit up to, as of its last check
+        self._synced_to: Dict[str, float] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def pick(self, engines, caught_up_to: Optional[float] = None) -> Optional[object]:
+        """A healthy replica engine, synced at least to ``caught_up_to`` if given, or None to use the primary"""
+        keys = [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)]
+        if not keys:
+            return None
+
+        self._refresh(engines, keys)
+        healthy = [
+            key for key in keys
+            if self._lag.get(key) is not None and self._lag[key] <= self.max_lag
+            and (caught_up_to is None or self._synced_to.get(key, 0.0) >= caught_up_to)
+        ]
+        if not healthy:
+            return None
+        return engines[healthy[next(self._counter) % len(healthy)]]
+
+    def status(self) -> Dict[str, Optional[float]]:
+        """Last measured lag per replica in seconds (None when unreachable)"""
+        return dict(self._lag)
+
+    def _refresh(self, engines, keys: List[str]) -> None:
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        # Another thread may be checking: use its previous measurements, or
+        # wait for the first ones
+        if not self._lock.acquire(blocking=not self._checked_at):
+            return
+        try:
+            if self._checked_at and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            for key in keys:
+                try:
+                    measured_at = time.time()
+                    self._lag[key] = _measure_lag(engines[key])
+                except Exception as e:
+                    logger.warning(f"Replica {key} lag check failed: {e}")
+                    self._lag[key] = None
+                if self._lag[key] is not None:
+                    self._synced_to[key] = measured_at - self._lag[key]
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+
+def _measure_lag(engine) -> Optional[float]:
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            synced_at = connection.execute(text('PRAGMA user_version')).scalar()
+            return max(0.0, time.time() - synced_at) if synced_at else None
+
+        if engine.dialect.name == 'mysql':
+            try:
+                row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+            except Exception:
+                # MySQL before 8.0.22
+                row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+            if row is None:
+                # Not a replica (e.g. the primary itself): never behind
+                return 0.0
+            lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+            return float(lag) if lag is not None else None
+
+    return 0.0
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads in read-only scopes to a replica
+
+    Writes, flushes and locking reads always use the primary. So does every
+    read after the transaction has written, and every read for a client
+    that wrote within the read-your-writes window.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and self._may_read_replica(clause):
+            engine = replica_router.pick(self._db.engines, caught_up_to=_caught_up_to.get())
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _may_read_replica(self, clause) -> bool:
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return False
+        if self.info.get(WROTE_KEY) or self.new or self.dirty or self.deleted:
+            return False
+
+        target = _read_target.get()
+        if target is None and has_request_context():
+            target = 'replica' if g.get('_replica_reads') and not _recently_wrote() else 'primary'
+        return target == 'replica'
+
+
+class PoolMetrics:
+    """Checkout latency histogram and wait counts of one connection pool"""
+
+    BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.peak_in_use = 0
+        # One count per bucket, plus one for checkouts slower than the last
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def observe(self, elapsed: float, waited: bool, in_use: int) -> None:
+        elapsed_ms = elapsed * 1000
+        bucket = next((i for i, bound in enumerate(self.BUCKETS_MS) if elapsed_ms <= bound), len(self.BUCKETS_MS))
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            self.histogram[bucket] += 1
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.waits += 1
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            bounds = list(self.BUCKETS_MS) + ["inf"]
+            buckets = [{"le_ms": bound, "count": count} for bound, count in zip(bounds, self.histogram)]
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_checkout_ms": round(self.total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_checkout_ms": round(self.max_ms, 3),
+                "peak_in_use": self.peak_in_use,
+                "checkout_ms": buckets
+            }
+
+
+_pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout takes
+
+    A checkout counts as a wait when every connection, overflow included,
+    was in use at the time it was requested. Metrics are kept per pool
+    logging name, which is the bind key, so they survive engine.dispose().
+    """
+
+    def connect(self):
+        name = self.logging_name or 'default'
+        metrics = _pool_metrics.get(name) or _pool_metrics.setdefault(name, PoolMetrics())
+        waited = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            metrics.timed_out()
+            raise
+        metrics.observe(time.perf_counter() - start, waited, self.checkedout())
+        return connection
+
+
+def _pool_options(url, key: str) -> Dict[str, object]:
+    url = make_url(url)
+    if url.drivername.startswith('sqlite') and url.database in (None, '', ':memory:'):
+        # In-memory SQLite shares one connection (StaticPool), there is nothing to size
+        return {}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_logging_name': key,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING
+    }
+    options.update(settings.DB_POOL_OPTIONS.get(key, {}))
+    return options
+
+
+def configure_engines(app: Flask) -> None:
+    """Add pool settings to the primary's and every bind's engine options; call before db.init_app"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **_pool_options(app.config['SQLALCHEMY_DATABASE_URI'], 'default'),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    binds = {}
+    for key, value in app.config.get('SQLALCHEMY_BINDS', {}).items():
+        options = dict(value) if isinstance(value, dict) else {'url': value}
+        binds[key] = {**_pool_options(options['url'], key), **options}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def pool_status(engines) -> Dict[str, Dict[str, object]]:
+    """Size, connections in use and checkout metrics of each instrumented pool"""
+    status = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        if not isinstance(pool, InstrumentedQueuePool):
+            continue
+        name = key or 'default'
+        metrics = _pool_metrics.get(name)
+        status[name] = {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            **(metrics.snapshot() if metrics else PoolMetrics().snapshot())
+        }
+    return status
+
+
+def client_key() -> str:
+    """User id of the verified token, else the client address"""
+    try:
+        from flask_jwt_extended import get_jwt_identity
+
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    return f"user:{identity}" if identity else f"ip:{request.remote_addr}"
+
+
+def _shared_cache():
+    from app.extensions import cache
+
+    backends = current_app.extensions.get("cache")
+    return backends.get(cache) if backends else None
+
+
+def _sticky_window() -> float:
+    # Reads must stay on the primary at least as long as a replica may lag
+    return max(settings.READ_YOUR_WRITES_WINDOW, settings.REPLICA_MAX_LAG)
+
+
+def _recently_wrote() -> bool:
+    """Whether this client wrote recently; checked once per request"""
+    sticky = g.get('_sticky_primary')
+    if sticky is None:
+        backend = _shared_cache()
+        sticky = g._sticky_primary = bool(backend and backend.get(f"db:rw:{client_key()}"))
+    return sticky
+
+
+# Apps whose engines are replaced in forked processes
+_apps: "weakref.WeakSet[Flask]" = weakref.WeakSet()
+
+
+def init_app(app: Flask) -> None:
+    """Reset the app's pools after fork, and route GET requests' reads to replicas when configured"""
+    _apps.add(app)
+    if not settings.SQLALCHEMY_REPLICA_URIS:
+        return
+
+    @app.before_request
+    def mark_read_only_request():
+        if request.method == 'GET' and request.endpoint not in settings.REPLICA_EXCLUDED_ENDPOINTS:
+            g._replica_reads = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _note_write_statement(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_flush(session, flush_context) -> None:
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _start_read_your_writes(session) -> None:
+    if session.info.pop(WROTE_KEY, False) and settings.SQLALCHEMY_REPLICA_URIS and has_request_context():
+        backend = _shared_cache()
+        if backend is not None:
+            backend.set(f"db:rw:{client_key()}", 1, timeout=math.ceil(_sticky_window()))
+        g._sticky_primary = True
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session) -> None:
+    session.info.pop(WROTE_KEY, None)
+
+
+def _dispose_after_fork() -> None:
+    # Connections opened before fork belong to the parent; close=False
+    # drops them from this process's pools without closing the parent's
+    from app.extensions import db
+
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    _pool_metrics.clear()
+
+
+os.register_at_fork(after_in_child=_dispose_after_fork)
+
+replica_router = ReplicaRouter(
+    max_lag=settings.REPLICA_MAX_LAG,
+    check_interval=settings.REPLICA_LAG_CHECK_INTERVAL
+)
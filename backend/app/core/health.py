@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CheckSkipped(Exception):
+    """Raised by a check whose dependency this process hasn't connected to"""
+
+
+class ReadinessProbe:
+    """
+    Concurrent, time-bounded dependency checks for the /ready endpoint
+
+    All checks run in parallel and are given ``timeout`` seconds in total.
+    A check slower than ``slow_threshold`` seconds counts as failing, so a
+    node whose dependencies degrade leaves the load balancer before its
+    requests start timing out. A failing ``required`` check makes the node
+    not ready; the others are only reported. Results are reused for
+    ``cache_ttl`` seconds, so frequent polling adds no load, and a check
+    still hanging from an earlier round is reported as timed out instead
+    of being started again. A check that raises ``CheckSkipped`` is
+    reported as ``not_connected`` and fails only if it is required.
+    """
+
+    def __init__(self, required, timeout: float = 2.0, slow_threshold: float = 1.0, cache_ttl: float = 2.0):
+        self.required = set(required)
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold
+        self.cache_ttl = cache_ttl
+        self._checks: Dict[str, Callable[[], None]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._report: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name: str, check: Callable[[], None]) -> None:
+        """Add a check: a callable that raises when the dependency is unusable"""
+        self._checks[name] = check
+
+    def report(self) -> dict:
+        """The latest readiness report, running the checks if it is stale"""
+        if self._report is None or time.monotonic() - self._checked_at >= self.cache_ttl:
+            # Concurrent pollers wait for one round instead of starting their own
+            with self._lock:
+                if self._report is None or time.monotonic() - self._checked_at >= self.cache_ttl:
+                    self._report = self._run()
+                    self._checked_at = time.monotonic()
+        return self._report
+
+    def _run(self) -> dict:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._checks)), thread_name_prefix='ready')
+
+        started = time.perf_counter()
+        for name, check in self._checks.items():
+            if name not in self._pending:
+                self._pending[name] = self._executor.submit(self._timed, check)
+        wait(list(self._pending.values()), timeout=self.timeout)
+
+        checks = {}
+        ready = True
+        for name in self._checks:
+            required = name in self.required
+            future = self._pending[name]
+            if not future.done():
+                result = {"status": "timeout", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+            else:
+                del self._pending[name]
+                latency, error = future.result()
+                result = {"status": "ok", "latency_ms": round(latency * 1000, 1)}
+                if error is CheckSkipped:
+                    result = {"status": "not_connected"}
+                elif error is not None:
+                    result.update(status="down", error=error)
+                elif latency > self.slow_threshold:
+                    result["status"] = "slow"
+            result["required"] = required
+            if result["status"] == "not_connected":
+                ready = ready and not required
+            elif result["status"] != "ok":
+                logger.warning(f"Readiness check {name} is {result['status']}")
+                ready = ready and not required
+            checks[name] = result
+
+        return {"status": "ready" if ready else "unavailable", "checks": checks}
+
+    def _after_fork(self) -> None:
+        # The parent's probe threads and results don't belong to this process
+        self._executor = None
+        self._pending = {}
+        self._report = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _timed(check: Callable[[], None]) -> Tuple[float, Optional[object]]:
+        start = time.perf_counter()
+        try:
+            check()
+            error = None
+        except CheckSkipped:
+            error = CheckSkipped
+        except Exception as e:
+            # Only the exception type is shown: /ready is unauthenticated
+            logger.warning(f"Readiness check failed: {e}")
+            error = type(e).__name__
+        return time.perf_counter() - start, error
+
+
+def _ping_engine(engine) -> Callable[[], None]:
+    def check():
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    return check
+
+
+def _ping_cache(backend) -> Callable[[], None]:
+    def check():
+        # A miss is fine; only an error means the cache is down
+        backend.get('ready:probe')
+    return check
+
+
+def _ping_neo4j() -> None:
+    from app.extensions import get_neo4j_driver
+
+    # Nothing on the request path uses Neo4j; don't create the driver just to probe it
+    driver = get_neo4j_driver(create=False)
+    if driver is None:
+        raise CheckSkipped()
+    driver.verify_connectivity()
+
+
+def init_app(app: Flask) -> None:
+    """Register the dependency checks and the /ready endpoint"""
+    from app.extensions import cache, db
+    from app.utils.rate_limiter import RedisTokenStore, rate_limiter
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            readiness.register(key or 'database', _ping_engine(engine))
+
+    backend = app.extensions.get('cache', {}).get(cache)
+    if backend is not None and not app.config.get('CACHE_TYPE', '').endswith(('SimpleCache', 'NullCache')):
+        readiness.register('cache', _ping_cache(backend))
+    if isinstance(rate_limiter.store, RedisTokenStore):
+        readiness.register('rate_limit_store', rate_limiter.store.ping)
+    readiness.register('neo4j', _ping_neo4j)
+
+    @app.route('/ready')
+    def readiness_check():
+        report = readiness.report()
+        return report, 200 if report["status"] == "ready" else 503
+
+
+readiness = ReadinessProbe(
+    settings.READINESS_REQUIRED,
+    timeout=settings.READINESS_TIMEOUT,
+    slow_threshold=settings.READINESS_SLOW_THRESHOLD,
+    cache_ttl=settings.READINESS_CACHE_TTL
+)
@@ -0,0 +1,308 @@
+import glob
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.utils.shared_counters import SharedCounterArray, remove_counter_array, to_micros
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets are powers of two in microseconds (log-scale like HDR
+# histograms with one significant bit), so a request's bucket is just the
+# bit length of its duration. Exported bounds run from 128us to ~67s.
+MIN_BUCKET = 7
+MAX_BUCKET = 26
+BUCKET_BOUNDS = [f"{2 ** bits / 1000000:g}" for bits in range(MIN_BUCKET, MAX_BUCKET + 1)]
+
+# Status codes counted one by one; any other is reported as status="other"
+STATUS_CODES = (200, 201, 202, 204, 301, 302, 304, 400, 401, 403, 404, 405, 409,
+                413, 415, 422, 429, 500, 502, 503, 504)
+
+# Counters per route: one per status code, one per bucket in BUCKET_BOUNDS
+# plus one for slower requests, then the time and database totals
+STATUS_FIELDS = {code: f"status_{code}" for code in STATUS_CODES}
+BUCKET_FIELDS = [f"bucket_{index}" for index in range(MAX_BUCKET - MIN_BUCKET + 2)]
+FIELDS = tuple(STATUS_FIELDS.values()) + ('status_other',) + tuple(BUCKET_FIELDS) + (
+    'micros', 'db_queries', 'db_micros'
+)
+
+# Endpoint of requests no route matched, counted per method
+UNMATCHED = 'unmatched'
+METHODS = ('DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT')
+
+# [start time, queries, seconds in queries] of the request being handled
+_request_state: ContextVar[Optional[list]] = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Per-route request counts, latency histograms, status codes and DB usage
+
+    Counters live in a SharedCounterArray, so whichever worker answers a
+    scrape renders the totals of every worker on the node. Routes are
+    numbered from the app's URL map, which is the same in every worker; the
+    segment name carries a digest of that numbering, so a deploy that
+    changes the routes starts new counters instead of mislabelling old
+    ones. The name also carries ``instance`` and the pid of the server
+    master that forked the workers, so two servers on one host never
+    share counters. Only segments of this instance are ever removed: those
+    whose master has exited, and this master's own from before a reload.
+    Recording a request is a dict lookup and a few additions to this
+    worker's own slot.
+    """
+
+    def __init__(self, name: str, workers: int, instance: str = ''):
+        self.name = name
+        self.workers = workers
+        self.prefix = f"{name}-{instance}-" if instance else f"{name}-"
+        self._routes: Dict[Tuple[str, str], int] = {}
+        self._labels: List[str] = []
+        self._counters: Optional[SharedCounterArray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return self._counters is not None
+
+    def configure(self, routes: Iterable[Tuple[str, str]]) -> None:
+        """Number the (endpoint, method) pairs to count; requests to others count as unmatched"""
+        routes = sorted(set(routes) | {(UNMATCHED, method) for method in METHODS})
+        with self._lock:
+            if self._counters is not None and list(self._routes) == routes:
+                return
+
+            digest = zlib.crc32("\n".join(f"{endpoint} {method}" for endpoint, method in routes).encode())
+            # Configured after the fork, so the parent is the master (or a single process's launcher)
+            master = os.getppid()
+            segment = f"{self.prefix}{master}-{digest:08x}"
+            for path in glob.glob(f"/dev/shm/{self.prefix}*"):
+                # Names of other instances sharing this prefix don't match and are left alone
+                owner = re.fullmatch(r'(\d+)-[0-9a-f]{8}', os.path.basename(path)[len(self.prefix):])
+                if owner is None or os.path.basename(path) == segment:
+                    continue
+                # An earlier route table of this master (before a reload) is never read again
+                if int(owner.group(1)) == master or not _is_running(int(owner.group(1))):
+                    remove_counter_array(os.path.basename(path))
+
+            self._labels = [_labels(endpoint, method) for endpoint, method in routes]
+            self._labels.append(_labels(UNMATCHED, 'other'))
+            self._routes = {route: index for index, route in enumerate(routes)}
+            self._counters = SharedCounterArray(segment, FIELDS, capacity=len(self._labels), workers=self.workers)
+
+    def record(self, endpoint: str, method: str, status: int,
+               elapsed: float, db_queries: int, db_seconds: float) -> None:
+        counters = self._counters
+        if counters is None:
+            return
+
+        bucket = int(elapsed * 1000000).bit_length()
+        if bucket < MIN_BUCKET:
+            bucket = MIN_BUCKET
+        elif bucket > MAX_BUCKET + 1:
+            bucket = MAX_BUCKET + 1
+        index = self._routes.get((endpoint, method))
+        if index is None:
+            index = self._routes.get((UNMATCHED, method), len(self._routes))
+
+        try:
+            counters.increment_many(index, {
+                STATUS_FIELDS.get(status, 'status_other'): 1,
+                BUCKET_FIELDS[bucket - MIN_BUCKET]: 1,
+                'micros': to_micros(elapsed),
+                'db_queries': db_queries,
+                'db_micros': to_micros(db_seconds)
+            })
+        except RuntimeError as e:
+            # Every worker slot is taken: count nothing here rather than fail requests
+            logger.warning(f"Request metrics disabled in worker {os.getpid()}: {e}")
+            self._counters = None
+
+    def render(self) -> str:
+        """All metrics, summed over the node's workers, in the Prometheus text exposition format"""
+        counters = self._counters
+        totals = counters.totals_by_index() if counters is not None else []
+
+        requests: List[str] = [
+            "# HELP http_requests_total Requests handled, by route and status code",
+            "# TYPE http_requests_total counter"
+        ]
+        latency = [
+            "# HELP http_request_duration_seconds Time to handle a request",
+            "# TYPE http_request_duration_seconds histogram"
+        ]
+        db_queries = [
+            "# HELP http_request_db_queries_total Database queries issued while handling requests",
+            "# TYPE http_request_db_queries_total counter"
+        ]
+        db_seconds = [
+            "# HELP http_request_db_seconds_total Time spent in database queries while handling requests",
+            "# TYPE http_request_db_seconds_total counter"
+        ]
+        statuses = [str(code) for code in STATUS_CODES] + ['other']
+        buckets_at = len(statuses)
+        for labels, values in zip(self._labels, totals):
+            buckets = values[buckets_at:buckets_at + len(BUCKET_FIELDS)]
+            micros, queries, query_micros = values[buckets_at + len(BUCKET_FIELDS):]
+            total = sum(buckets)
+            if not total:
+                continue
+
+            for status, count in zip(statuses, values):
+                if count:
+                    requests.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, buckets):
+                cumulative += count
+                latency.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            latency.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            latency.append(f'http_request_duration_seconds_sum{{{labels}}} {micros / 1000000:.6f}')
+            latency.append(f'http_request_duration_seconds_count{{{labels}}} {total}')
+            db_queries.append(f'http_request_db_queries_total{{{labels}}} {queries}')
+            db_seconds.append(f'http_request_db_seconds_total{{{labels}}} {query_micros / 1000000:.6f}')
+
+        return "\n".join(requests + latency + db_queries + db_seconds) + "\n"
+
+
+def render_process_metrics() -> str:
+    """
+    Model cache, replica lag and connection pool gauges of the worker answering the scrape
+
+    Moved here from /health, which anyone can read.
+    """
+    from app.core.database import pool_status, replica_router
+    from app.extensions import db
+    from app.utils.model_cache import model_cache
+
+    cache = model_cache.stats()
+    lines = [
+        "# HELP model_cache_lookups_total get_by_id lookups through the model cache",
+        "# TYPE model_cache_lookups_total counter",
+        f"model_cache_lookups_total {cache['lookups']}",
+        "# HELP model_cache_invalidations_total Cached rows invalidated by writes",
+        "# TYPE model_cache_invalidations_total counter",
+        f"model_cache_invalidations_total {cache['invalidations']}",
+        "# HELP model_cache_local_entries Rows in this worker's local tier",
+        "# TYPE model_cache_local_entries gauge",
+        f"model_cache_local_entries {cache['local_entries']}",
+        "# HELP model_cache_hit_ratio Share of lookups answered from a cache tier",
+        "# TYPE model_cache_hit_ratio gauge",
+    ]
+    for tier, key in (("any", "hit_rate"), ("local", "local_hit_rate")):
+        if cache[key] is not None:
+            lines.append(f'model_cache_hit_ratio{{tier="{tier}"}} {cache[key]}')
+
+    lines += [
+        "# HELP db_replica_lag_seconds Last measured replication lag (NaN when unreachable)",
+        "# TYPE db_replica_lag_seconds gauge",
+    ]
+    for replica, lag in replica_router.status().items():
+        lines.append(f'db_replica_lag_seconds{{replica="{replica}"}} {"NaN" if lag is None else f"{lag:.3f}"}')
+
+    gauges = (("size", "Pool size"), ("max_overflow", "Connections allowed past the pool size"),
+              ("in_use", "Connections checked out"), ("idle", "Connections in the pool"),
+              ("peak_in_use", "Most connections checked out at once"))
+    counters = (("checkouts", "Connection checkouts"), ("waits", "Checkouts that waited for a connection"),
+                ("timeouts", "Checkouts that timed out"))
+    pools = pool_status(db.engines)
+    for field, help_text in gauges:
+        lines += [f"# HELP db_pool_{field} {help_text}", f"# TYPE db_pool_{field} gauge"]
+        lines += [f'db_pool_{field}{{pool="{pool}"}} {status[field]}' for pool, status in pools.items()]
+    for field, help_text in counters:
+        lines += [f"# HELP db_pool_{field}_total {help_text}", f"# TYPE db_pool_{field}_total counter"]
+        lines += [f'db_pool_{field}_total{{pool="{pool}"}} {status[field]}' for pool, status in pools.items()]
+    return "\n".join(lines) + "\n"
+
+
+def _labels(endpoint: str, method: str) -> str:
+    blueprint = endpoint.rpartition('.')[0]
+    return f'blueprint="{blueprint}",endpoint="{endpoint}",method="{method}"'
+
+
+def _url_routes(app: Flask) -> List[Tuple[str, str]]:
+    """(endpoint, method) of every route of the app"""
+    return [(rule.endpoint, method) for rule in app.url_map.iter_rules() for method in rule.methods]
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, under another user
+        pass
+    return True
+
+
+def _start_request() -> None:
+    _request_state.set([time.perf_counter(), 0, 0.0])
+
+
+def _finish_request(response):
+    state = _request_state.get()
+    if state is not None:
+        _request_state.set(None)
+        if not request_metrics.configured:
+            # Routes are all registered by the first request
+            request_metrics.configure(_url_routes(current_app))
+        # One proxy lookup; each attribute read through the proxy costs about a microsecond
+        current = request._get_current_object()
+        request_metrics.record(
+            current.endpoint or 'unmatched', current.method, response.status_code,
+            time.perf_counter() - state[0], state[1], state[2]
+        )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _request_state.get() is not None:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    state = _request_state.get()
+    if state is not None and conn.info.get('metrics_query_start'):
+        state[1] += 1
+        state[2] += time.perf_counter() - conn.info['metrics_query_start'].pop()
+
+
+def init_app(app: Flask) -> None:
+    """Time every request and serve the metrics at /metrics"""
+    if not settings.METRICS_ENABLED:
+        return
+    if not settings.METRICS_TOKEN:
+        logger.warning("METRICS_TOKEN is not set; /metrics is disabled")
+        return
+
+    # First, so requests rejected by later hooks (CSRF, rate limits) are timed too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f"Bearer {settings.METRICS_TOKEN}"):
+            return {"error": "Invalid metrics token"}, 401
+        body = request_metrics.render() + render_process_metrics()
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+request_metrics = RequestMetrics(
+    settings.METRICS_SHM_NAME,
+    workers=settings.METRICS_WORKER_SLOTS,
+    instance=settings.METRICS_INSTANCE
+)
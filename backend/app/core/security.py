@@ -4,17 +4,25 @@ import secrets
 import base64
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-from flask import Flask, request, abort, g, Request
-from flask_jwt_extended import create_access_token, get_jwt_identity
+from flask import Flask, request, abort, g, Request, jsonify
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+from werkzeug.middleware.proxy_fix import ProxyFix
 from app.core.config import settings
+from app.core.database import client_key
+from app.utils.password_hasher import password_hasher
+from app.utils.rate_limiter import rate_limiter
 
 
 def setup_security(app: Flask) -> None:
     """Setup security features for the Flask app"""
     # Set max content length for uploads
     app.config['MAX_CONTENT_LENGTH'] = settings.MAX_CONTENT_LENGTH
+
+    # Take the client address and scheme from the trusted proxies' headers
+    if settings.TRUSTED_PROXY_COUNT:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=settings.TRUSTED_PROXY_COUNT, x_proto=settings.TRUSTED_PROXY_COUNT
+        )
     
     # Register middleware
     app.before_request(csrf_protection)
@@ -25,6 +33,8 @@ def csrf_protection() -> None:
     """Check CSRF token for unsafe methods"""
     if request.method in ('POST', 'PUT', 'DELETE', 'PATCH'):
         token = request.headers.get('X-CSRF-Token')
+        # Tokens are bound to the JWT identity, which runs before the view's @jwt_required
+        verify_jwt_in_request(optional=True)
         if not token or not verify_csrf_token(token):
             abort(403, description="CSRF token missing or invalid")
 
@@ -64,15 +74,35 @@ def generate_csrf_token() -> str:
     return f"{timestamp}:{signature}"
 
 
-def rate_limit() -> None:
-    """Simple rate limiting middleware"""
-    # This is a placeholder - a real implementation would use Redis
-    # to track request counts per IP/user and time window
-    pass
+def rate_limit():
+    """Apply the default or per-route rate limit for the user, or the client IP without a token"""
+    endpoint = request.endpoint
+    if request.method == 'OPTIONS' or endpoint in settings.RATE_LIMIT_EXEMPT:
+        return None
+
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        # An invalid token is rejected by the view; limit the request by address
+        pass
+    key = client_key()
+
+    route_rate = settings.RATE_LIMIT_ROUTES.get(endpoint)
+    if route_rate is not None:
+        allowed, retry_after = rate_limiter.hit(f"route:{endpoint}:{key}", route_rate)
+    else:
+        allowed, retry_after = rate_limiter.hit(key, settings.RATE_LIMIT_DEFAULT)
+
+    if not allowed:
+        return jsonify({"error": "Rate limit exceeded"}), 429, {"Retry-After": str(retry_after)}
+    return None
 
 
 def encrypt_data(data: str) -> str:
     """Encrypt data using AES"""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
     key = settings.AES_SECRET_KEY.encode()
     # Ensure key is 16, 24, or 32 bytes long (AES-128, AES-192, or AES-256)
     if len(key) not in (16, 24, 32):
@@ -88,6 +118,9 @@ def encrypt_data(data: str) -> str:
 
 def decrypt_data(encrypted_data: str) -> str:
     """Decrypt AES encrypted data"""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import unpad
+
     key = settings.AES_SECRET_KEY.encode()
     if len(key) not in (16, 24, 32):
         key = hashlib.sha256(key).digest()[:16]
@@ -120,27 +153,10 @@ def create_user_token(user_id: int, additional_claims: Optional[Dict[str, Any]]
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password for storing"""
-    salt = secrets.token_hex(16)
-    pwdhash = hashlib.pbkdf2_hmac(
-        'sha256', 
-        password.encode('utf-8'), 
-        salt.encode('utf-8'), 
-        100000
-    ).hex()
-    return f"{salt}${pwdhash}"
+    """Hash a password for storing (on the bounded hashing executor)"""
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a stored password against a provided password"""
-    try:
-        salt, stored_hash = hashed_password.split('$', 1)
-        pwdhash = hashlib.pbkdf2_hmac(
-            'sha256', 
-            plain_password.encode('utf-8'), 
-            salt.encode('utf-8'), 
-            100000
-        ).hex()
-        return hmac.compare_digest(pwdhash, stored_hash)
-    except Exception:
-        return False 
\ No newline at end of file
+    return password_hasher.verify(plain_password, hashed_password)[0]
\ No newline at end of file
@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from flask import Flask, request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Samples kept per profile (about 10 minutes at the default interval)
+MAX_SAMPLES = 30000
+# Profile files kept in SLOW_PROFILE_DIR; the oldest are deleted beyond this
+MAX_FILES = 1000
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Entry of the request being handled, when it is being sampled
+_request_entry: ContextVar[Optional["_Entry"]] = ContextVar('slow_profile', default=None)
+
+
+class _Entry:
+    """A request or job being sampled"""
+
+    __slots__ = ('name', 'thread_id', 'threshold', 'started', 'stacks', 'samples')
+
+    def __init__(self, name: str, thread_id: int, threshold: float):
+        self.name = name
+        self.thread_id = thread_id
+        self.threshold = threshold
+        self.started = time.perf_counter()
+        # Stack (code objects, innermost first) -> samples
+        self.stacks: Dict[tuple, int] = {}
+        self.samples = 0
+
+
+class SlowProfiler:
+    """
+    Stack sampler that keeps the profiles of slow requests and jobs
+
+    While anything is registered, one thread samples the stacks of the
+    registered threads every interval seconds. When a request or job
+    finishes under its threshold its samples are dropped; otherwise they
+    are written in the folded stack format (one "root;...;leaf count" line
+    per stack) read by flamegraph.pl, inferno and speedscope.
+
+    Budgets: the interval stretches so sampling uses at most max_overhead
+    of a CPU, and at most max_per_hour profiles are written per process.
+    """
+
+    def __init__(self, directory: str, interval: float, max_overhead: float, max_per_hour: int):
+        self.directory = directory
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_per_hour = max_per_hour
+        self._active: Dict[int, _Entry] = {}
+        self._saved: deque = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def begin(self, name: str, threshold: float) -> Optional[_Entry]:
+        """Start sampling the current thread, unless it already is or the budget is spent"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self._active or self._budget_spent():
+                return None
+            entry = self._active[thread_id] = _Entry(name, thread_id, threshold)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-profiler', daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return entry
+
+    def finish(self, entry: _Entry) -> Optional[str]:
+        """Stop sampling; save the profile if the threshold was exceeded and return its path"""
+        elapsed = time.perf_counter() - entry.started
+        with self._lock:
+            self._active.pop(entry.thread_id, None)
+            if elapsed < entry.threshold or not entry.samples or self._budget_spent():
+                return None
+            self._saved.append(time.monotonic())
+
+        try:
+            path = self._save(entry, elapsed)
+        except OSError as e:
+            logger.error(f"Failed to save profile of {entry.name}: {e}")
+            return None
+        logger.warning(
+            f"Slow {entry.name} took {elapsed * 1000:.0f} ms; "
+            f"{entry.samples} stack samples saved to {path}"
+        )
+        return path
+
+    def _budget_spent(self) -> bool:
+        hour_ago = time.monotonic() - 3600
+        while self._saved and self._saved[0] < hour_ago:
+            self._saved.popleft()
+        return len(self._saved) >= self.max_per_hour
+
+    def _run(self) -> None:
+        delay = self.interval
+        while True:
+            self._wake.wait()
+            # Sampling starts an interval in, so short requests are never walked
+            time.sleep(delay)
+            started = time.thread_time()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for entry in self._active.values():
+                    frame = frames.get(entry.thread_id)
+                    if frame is None or entry.samples >= MAX_SAMPLES:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack = tuple(stack)
+                    entry.stacks[stack] = entry.stacks.get(stack, 0) + 1
+                    entry.samples += 1
+                frames = frame = None
+            # CPU time of this thread, not wall time spent waiting for the GIL;
+            # sleep long enough that cost / (cost + sleep) stays within max_overhead
+            cost = time.thread_time() - started
+            delay = max(self.interval, cost * (1 / self.max_overhead - 1))
+
+    def _save(self, entry: _Entry, elapsed: float) -> str:
+        labels: Dict[object, str] = {}
+        folded: Dict[str, int] = {}
+        for stack, count in entry.stacks.items():
+            line = ';'.join(_label(code, labels) for code in reversed(stack))
+            folded[line] = folded.get(line, 0) + count
+
+        os.makedirs(self.directory, exist_ok=True)
+        slug = _UNSAFE.sub('_', entry.name).strip('_')[:80]
+        filename = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{os.getpid()}-{slug}-{elapsed * 1000:.0f}ms.folded"
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            f.writelines(f"{line} {count}\n" for line, count in folded.items())
+
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith('.folded'))
+        for name in profiles[:-MAX_FILES]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        return path
+
+    def _after_fork(self) -> None:
+        # The sampler thread doesn't survive fork; a worker starts its own on demand
+        self._active = {}
+        self._saved = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+
+def _label(code, labels: Dict[object, str]) -> str:
+    """Frame name for a flamegraph: function (file:first line)"""
+    label = labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(BACKEND_DIR):
+            filename = os.path.relpath(filename, BACKEND_DIR)
+        elif 'site-packages' in filename:
+            filename = filename.rsplit('site-packages' + os.sep, 1)[1]
+        label = labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+    return label
+
+
+@contextmanager
+def profile_slow(name: str, threshold_ms: float) -> Iterator[None]:
+    """Sample the block's stacks and save them if it runs for threshold_ms or longer"""
+    entry = slow_profiler.begin(name, threshold_ms / 1000) if threshold_ms > 0 else None
+    try:
+        yield
+    finally:
+        if entry is not None:
+            slow_profiler.finish(entry)
+
+
+def init_app(app: Flask) -> None:
+    """Save a stack profile of requests slower than SLOW_PROFILE_THRESHOLD_MS"""
+    if settings.SLOW_PROFILE_THRESHOLD_MS <= 0:
+        return
+    threshold = settings.SLOW_PROFILE_THRESHOLD_MS / 1000
+
+    def start_slow_profile():
+        _request_entry.set(slow_profiler.begin(f"{request.method} {request.path}", threshold))
+
+    # First, so time spent in the other hooks is sampled too
+    app.before_request_funcs.setdefault(None, []).insert(0, start_slow_profile)
+
+    @app.teardown_request
+    def finish_slow_profile(exc):
+        entry = _request_entry.get()
+        if entry is not None:
+            _request_entry.set(None)
+            slow_profiler.finish(entry)
+
+
+slow_profiler = SlowProfiler(
+    directory=settings.SLOW_PROFILE_DIR,
+    interval=settings.SLOW_PROFILE_INTERVAL_MS / 1000,
+    max_overhead=settings.SLOW_PROFILE_MAX_OVERHEAD,
+    max_per_hour=settings.SLOW_PROFILE_MAX_PER_HOUR
+)
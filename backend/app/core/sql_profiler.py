@@ -0,0 +1,213 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from flask import Flask, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\((?:\?|, |\.\.\.)+\))(?:\s*,\s*\1)+")
+_SPACE = re.compile(r"\s+")
+
+_normalized: Dict[str, str] = {}
+
+# Profile of the request or job being handled, when it was sampled
+_current: ContextVar[Optional["SQLProfile"]] = ContextVar('sql_profile', default=None)
+
+
+def normalize(statement: str) -> str:
+    """Statement with literals and parameters replaced by ?, and lists of them collapsed"""
+    normalized = _normalized.get(statement)
+    if normalized is None:
+        normalized = _SPACE.sub(' ', statement).strip()
+        normalized = _STRING.sub('?', normalized)
+        normalized = _NUMBER.sub('?', normalized)
+        normalized = _PLACEHOLDER.sub('?', normalized)
+        normalized = _LIST.sub('(?, ...)', normalized)
+        normalized = _ROWS.sub(r'\1, ...', normalized)
+        if len(_normalized) < 5000:
+            _normalized[statement] = normalized
+    return normalized
+
+
+class StatementStats:
+    """Executions of one normalized statement"""
+
+    __slots__ = ('count', 'seconds', 'max_seconds', 'caller')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        # Application frame that issued the statement, captured once it repeats
+        self.caller: Optional[str] = None
+
+
+class SQLProfile:
+    """Queries of one request or report job, grouped by normalized statement"""
+
+    def __init__(self, name: str, n_plus_one: int):
+        self.name = name
+        self.n_plus_one = n_plus_one
+        self.statements: Dict[str, StatementStats] = {}
+        self.queries = 0
+        self.seconds = 0.0
+        self.started = time.perf_counter()
+
+    def add(self, statement: str, elapsed: float) -> None:
+        normalized = normalize(statement)
+        stats = self.statements.get(normalized)
+        if stats is None:
+            stats = self.statements[normalized] = StatementStats()
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.max_seconds = max(stats.max_seconds, elapsed)
+        self.queries += 1
+        self.seconds += elapsed
+        if stats.count == self.n_plus_one and stats.caller is None:
+            stats.caller = _app_caller()
+
+    def repeated(self) -> List[tuple]:
+        """(statement, stats) of SELECTs run at least n_plus_one times: likely N+1 loops"""
+        return [(statement, stats) for statement, stats in self.statements.items()
+                if stats.count >= self.n_plus_one and statement[:6].upper() == 'SELECT']
+
+    def log(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        logger.info(
+            f"SQL profile {self.name}: {self.queries} queries ({len(self.statements)} distinct) "
+            f"took {self.seconds * 1000:.1f} ms of {elapsed * 1000:.1f} ms"
+        )
+        top = sorted(self.statements.items(), key=lambda item: -item[1].seconds)[:5]
+        for statement, stats in top:
+            logger.info(
+                f"  {stats.count}x {stats.seconds * 1000:.1f} ms (max {stats.max_seconds * 1000:.1f} ms): "
+                f"{statement[:300]}"
+            )
+        for statement, stats in self.repeated():
+            logger.warning(
+                f"Possible N+1 in {self.name}: {stats.count}x {statement[:300]} "
+                f"issued from {stats.caller or 'unknown'}"
+            )
+
+
+def _app_caller() -> Optional[str]:
+    """Innermost stack frame in application code, below SQLAlchemy's"""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(APP_DIR) and frame.filename != __file__:
+            return f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def sampled() -> bool:
+    """Whether to profile the next request or job under SQL_PROFILER_MODE"""
+    mode = settings.SQL_PROFILER_MODE
+    if mode == 'all':
+        return True
+    return mode == 'sampled' and random.random() < settings.SQL_PROFILER_SAMPLE_RATE
+
+
+@contextmanager
+def profile_sql(name: str) -> Iterator[Optional[SQLProfile]]:
+    """
+    Profile the block's queries if it is sampled, and log the result
+
+    Inside an already profiled block (e.g. a report generated during a
+    profiled request) the queries count towards the outer profile.
+    """
+    if _current.get() is not None or not sampled():
+        yield None
+        return
+
+    _listen()
+    profile = SQLProfile(name, settings.SQL_PROFILER_N_PLUS_ONE)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        profile.log()
+
+
+_explained: set = set()
+_explain_lock = threading.Lock()
+
+
+def _explain(conn, statement: str, parameters, normalized: str) -> None:
+    """Log the plan of a slow SELECT, once per normalized statement per process"""
+    with _explain_lock:
+        if normalized in _explained or len(_explained) >= 1000:
+            return
+        _explained.add(normalized)
+
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.cursor()
+    try:
+        # Straight to the DBAPI cursor, so this query is not profiled itself
+        cursor.execute(prefix + statement, parameters)
+        plan = "\n".join(f"    {row}" for row in cursor.fetchall())
+        logger.warning(f"Slow query plan for {normalized[:300]}:\n{plan}")
+    except Exception as e:
+        logger.warning(f"EXPLAIN failed for {normalized[:300]}: {e}")
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault('sql_profiler_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current.get()
+    if profile is None or not conn.info.get('sql_profiler_start'):
+        return
+    elapsed = time.perf_counter() - conn.info['sql_profiler_start'].pop()
+    profile.add(statement, elapsed)
+
+    explain_ms = settings.SQL_PROFILER_EXPLAIN_MS
+    if explain_ms and elapsed * 1000 >= explain_ms and not executemany \
+            and statement.lstrip()[:6].upper() == 'SELECT':
+        _explain(conn, statement, parameters, normalize(statement))
+
+
+def _listen() -> None:
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_app(app: Flask) -> None:
+    """Profile a sample of requests (all of them with SQL_PROFILER_MODE=all)"""
+    if settings.SQL_PROFILER_MODE not in ('sampled', 'all'):
+        return
+    _listen()
+
+    @app.before_request
+    def start_sql_profile():
+        if sampled():
+            _current.set(SQLProfile(f"{request.method} {request.path}", settings.SQL_PROFILER_N_PLUS_ONE))
+
+    @app.teardown_request
+    def finish_sql_profile(exc):
+        profile = _current.get()
+        if profile is not None:
+            _current.set(None)
+            profile.log()
@@ -1,29 +1,55 @@
+import os
+import threading
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_caching import Cache
 # from celery import Celery
-from neo4j import GraphDatabase
 from app.core.config import settings
+from app.core.database import RoutingSession
 from flask import request, make_response
+from werkzeug.local import LocalProxy
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 cors = CORS()
 mail = Mail()
-limiter = Limiter(key_func=get_remote_address)
 cache = Cache()
 # celery = Celery()
-neo4j_driver = GraphDatabase.driver(
-    settings.NEO4J_URI,
-    auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD)
-)
+_neo4j_driver = None
+_neo4j_lock = threading.Lock()
+
+
+def get_neo4j_driver(create: bool = True):
+    """The Neo4j driver, created on first use since importing neo4j is slow"""
+    global _neo4j_driver
+    if _neo4j_driver is None and create:
+        with _neo4j_lock:
+            if _neo4j_driver is None:
+                from neo4j import GraphDatabase
+
+                _neo4j_driver = GraphDatabase.driver(
+                    settings.NEO4J_URI,
+                    auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD)
+                )
+    return _neo4j_driver
+
+
+def _forget_neo4j_driver() -> None:
+    # A forked process must not use its parent's sockets; it opens its own
+    global _neo4j_driver, _neo4j_lock
+    _neo4j_driver = None
+    _neo4j_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_neo4j_driver)
+
+neo4j_driver = LocalProxy(get_neo4j_driver)
 
 def init_app(app):
     # Initialize extensions
@@ -31,7 +57,6 @@ def init_app(app):
     migrate.init_app(app, db)
     jwt.init_app(app)
     mail.init_app(app)
-    limiter.init_app(app)
     cache.init_app(app)
     # celery.init_app(app)
 
@@ -1,9 +1,11 @@
 from typing import Dict, List, Optional, Any
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Table, Text, Enum, Float, DateTime
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Table, Text, Enum, Float, DateTime, select, update
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.dialects.mysql import JSON
 
-from app.models.base import BaseModel, AuditLogMixin, db
+from app.models.base import BaseModel, AuditLogMixin, db, unit_of_work
+from app.utils.model_cache import model_cache
 
 
 class Advertiser(BaseModel, AuditLogMixin):
@@ -77,24 +79,50 @@ class Advertiser(BaseModel, AuditLogMixin):
         if status == 'rejected' and reason:
             self.rejection_reason = reason
             
+    def change_balance(self, delta: float) -> bool:
+        """
+        Atomically add ``delta`` to the stored balance
+
+        Runs ``balance = balance + ?`` in the database rather than writing
+        back a value computed in Python, so concurrent changes are not lost.
+        Debits only apply while the balance covers them.
+
+        Returns:
+            False if a debit was refused for insufficient funds
+        """
+        table = type(self).__table__
+        statement = update(table).where(table.c.id == self.id).values(balance=table.c.balance + delta)
+        if delta < 0:
+            statement = statement.where(table.c.balance >= -delta)
+
+        if db.session.execute(statement).rowcount == 0:
+            return False
+        model_cache.mark_stale(type(self), [self.id])
+
+        balance = db.session.execute(select(table.c.balance).where(table.c.id == self.id)).scalar_one()
+        set_committed_value(self, 'balance', balance)
+        return True
+
     def deposit(self, amount: float, transaction_id: str, deposited_by: int) -> float:
         """Add funds to advertiser account"""
         if amount <= 0:
             raise ValueError("Deposit amount must be positive")
-            
-        self.balance += amount
-        
-        # Log the transaction
-        transaction = Transaction(
-            advertiser_id=self.id,
-            amount=amount,
-            balance_after=self.balance,
-            transaction_type="deposit",
-            reference_id=transaction_id,
-            created_by_id=deposited_by
-        )
-        transaction.save()
-        
+
+        # Balance change and transaction row commit together
+        with unit_of_work():
+            self.change_balance(amount)
+
+            # Log the transaction
+            transaction = Transaction(
+                advertiser_id=self.id,
+                amount=amount,
+                balance_after=self.balance,
+                transaction_type="deposit",
+                reference_id=transaction_id,
+                created_by_id=deposited_by
+            )
+            transaction.save()
+
         return self.balance
         
     def withdraw(self, amount: float, transaction_id: str, withdrawn_by: int) -> float:
@@ -102,22 +130,22 @@ class Advertiser(BaseModel, AuditLogMixin):
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive")
             
-        if amount > self.balance:
-            raise ValueError("Insufficient funds for withdrawal")
-            
-        self.balance -= amount
-        
-        # Log the transaction
-        transaction = Transaction(
-            advertiser_id=self.id,
-            amount=-amount,
-            balance_after=self.balance,
-            transaction_type="withdrawal",
-            reference_id=transaction_id,
-            created_by_id=withdrawn_by
-        )
-        transaction.save()
-        
+        # Balance change and transaction row commit together
+        with unit_of_work():
+            if not self.change_balance(-amount):
+                raise ValueError("Insufficient funds for withdrawal")
+
+            # Log the transaction
+            transaction = Transaction(
+                advertiser_id=self.id,
+                amount=-amount,
+                balance_after=self.balance,
+                transaction_type="withdraw",
+                reference_id=transaction_id,
+                created_by_id=withdrawn_by
+            )
+            transaction.save()
+
         return self.balance
 
 
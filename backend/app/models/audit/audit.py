@@ -0,0 +1,64 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from sqlalchemy.dialects.mysql import JSON
+
+from app.extensions import db
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_before
+from app.utils.serializers import get_serializer
+
+
+class AuditEvent(db.Model):
+    """Append-only audit trail entry for models using AuditLogMixin
+
+    Rows are only ever inserted (in batches by the audit writer), so this
+    deliberately skips BaseModel's updated_at/is_deleted bookkeeping.
+    """
+    __tablename__ = 'audit_event'
+    __table_args__ = (
+        Index('ix_audit_event_entity', 'entity_type', 'entity_id', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String(50), nullable=False, comment="Table name of the audited model")
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True, comment="User who made the change")
+    action = Column(String(50), nullable=False)
+    details = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<AuditEvent {self.entity_type}:{self.entity_id} {self.action}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert audit event to dictionary"""
+        return get_serializer(type(self))(self)
+
+    @classmethod
+    def history(
+        cls,
+        entity_type: str,
+        entity_id: int,
+        cursor: Optional[str] = None,
+        per_page: int = 20
+    ) -> Dict[str, Any]:
+        """Get one page of an entity's audit history, newest first"""
+        columns = [cls.created_at, cls.id]
+        query = cls.query.filter(
+            cls.entity_type == entity_type,
+            cls.entity_id == entity_id
+        ).order_by(cls.created_at.desc(), cls.id.desc())
+
+        if cursor:
+            query = query.filter(keyset_before(columns, decode_cursor(cursor, columns)))
+
+        rows = query.limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        return {
+            "items": [row.to_dict() for row in rows],
+            "per_page": per_page,
+            "next_cursor": encode_cursor([rows[-1].created_at, rows[-1].id]) if has_more else None,
+            "has_more": has_more
+        }
@@ -1,19 +1,115 @@
-import uuid
+import math
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from functools import wraps
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from flask import jsonify
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, DateTime, String, Boolean, text
-from sqlalchemy.dialects.mysql import JSON
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declared_attr
-from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import load_only
 
 from app.extensions import db
+from app.models.audit.audit import AuditEvent
+from app.utils.audit_writer import audit_writer
+from app.utils.count_service import count_service
+from app.utils.model_cache import model_cache
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_before
+from app.utils.serializers import get_serializer, serializable_fields
 # Initialize SQLAlchemy
 # db = SQLAlchemy()
 migrate = Migrate()
 
+# Active unit of work for the current request or job, if any
+_current_unit_of_work: ContextVar[Optional["UnitOfWork"]] = ContextVar('unit_of_work', default=None)
+
+
+class UnitOfWork:
+    """
+    Groups every save() in a request or job into a single commit
+
+    Inside a unit of work ``save()`` flushes instead of committing, so ids and
+    defaults are still available to the caller, and the whole scope commits
+    once on exit or rolls back on error. Nested scopes join the outermost one.
+    """
+
+    def __init__(self):
+        self._token = None
+        self._rollback_only = False
+
+    def __enter__(self) -> "UnitOfWork":
+        if _current_unit_of_work.get() is None:
+            self._token = _current_unit_of_work.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            # Nested scope; the outermost one decides
+            if exc_type is not None:
+                _current_unit_of_work.get().set_rollback_only()
+            return
+
+        try:
+            if exc_type is not None or self._rollback_only:
+                db.session.rollback()
+            else:
+                try:
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+        finally:
+            _current_unit_of_work.reset(self._token)
+            self._token = None
+            self._rollback_only = False
+
+    def set_rollback_only(self) -> None:
+        """Discard the scope's changes instead of committing them on exit"""
+        self._rollback_only = True
+
+
+def unit_of_work() -> UnitOfWork:
+    """Start (or join) a unit of work, e.g. ``with unit_of_work(): ...``"""
+    return UnitOfWork()
+
+
+def in_unit_of_work() -> bool:
+    """Whether a unit of work is active in the current context"""
+    return _current_unit_of_work.get() is not None
+
+
+def _response_status(rv) -> Optional[int]:
+    """HTTP status of a view return value, if it carries one"""
+    if isinstance(rv, tuple) and len(rv) > 1 and isinstance(rv[1], int):
+        return rv[1]
+    return getattr(rv, 'status_code', None)
+
+
+def transactional(fn):
+    """
+    Run a view in a unit of work committed once after the view returns
+
+    Error responses (status >= 400) roll the request's changes back. A failed
+    commit becomes a 500 response instead of the success the view built.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            with unit_of_work() as uow:
+                rv = fn(*args, **kwargs)
+                status = _response_status(rv)
+                if status is not None and status >= 400:
+                    uow.set_rollback_only()
+        except SQLAlchemyError as e:
+            return jsonify({
+                "error": f"Failed to save changes: {str(e)}"
+            }), 500
+        return rv
+    return wrapper
+
 
 class BaseModel(db.Model):
     """Base model for all database models"""
@@ -28,25 +124,58 @@ class BaseModel(db.Model):
         nullable=False
     )
     is_deleted = Column(Boolean, default=False, nullable=False)
-    
+
+    # Columns for keyset pagination, e.g. ('created_at', 'id'); must be unique together
+    __keyset__ = ('id',)
+
+    # Column attributes left out of to_dict()
+    __serialize_exclude__ = ()
+
+    # Large columns (e.g. JSON blobs) not loaded for list responses unless requested
+    __heavy_columns__ = ()
+
+    # Serve get_by_id() from the model cache; writes invalidate it on commit
+    __cacheable__ = True
+
     @declared_attr
     def __tablename__(cls) -> str:
         return cls.__name__.lower()
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert model instance to dictionary"""
-        result = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, datetime):
-                value = value.isoformat()
-            result[column.name] = value
-        return result
+    def to_dict(self, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Convert model instance to dictionary using its compiled serializer"""
+        return get_serializer(type(self), fields)(self)
+
+    @classmethod
+    def list_fields(cls) -> Tuple[str, ...]:
+        """Default fields for list responses: everything except heavy columns"""
+        return tuple(
+            name for name in serializable_fields(cls)
+            if name not in cls.__heavy_columns__
+        )
+
+    @classmethod
+    def _load_only(cls, query, columns: Sequence[str]):
+        """Restrict the SELECT to the given columns plus the primary key"""
+        return query.options(load_only(*[getattr(cls, name) for name in columns]))
     
-    def save(self) -> "BaseModel":
-        """Save the current instance to database"""
+    def save(self, commit: Optional[bool] = None) -> "BaseModel":
+        """
+        Save the current instance to database
+
+        Args:
+            commit: True commits immediately; False only adds the instance to
+                the session, leaving the flush to the caller's next commit
+                (for batch jobs). The default commits, except inside a unit
+                of work where the change is flushed and committed with the
+                rest of the scope.
+        """
         db.session.add(self)
-        db.session.commit()
+        if commit is None:
+            commit = not in_unit_of_work()
+            if not commit:
+                db.session.flush()
+        if commit:
+            db.session.commit()
         return self
     
     def update(self, **kwargs) -> "BaseModel":
@@ -62,9 +191,23 @@ class BaseModel(db.Model):
         return self.save()
     
     @classmethod
-    def get_by_id(cls, id: int) -> Optional["BaseModel"]:
-        """Get a model instance by ID"""
-        return cls.query.filter_by(id=id, is_deleted=False).first()
+    def get_by_id(cls, id: int, columns: Optional[Sequence[str]] = None) -> Optional["BaseModel"]:
+        """
+        Get a model instance by ID, optionally loading only some columns
+
+        Cacheable models are read through the model cache. A partial load
+        uses a cached row when there is one but is never cached itself.
+        """
+        query = cls.query.filter_by(id=id, is_deleted=False)
+        if not cls.__cacheable__:
+            return (cls._load_only(query, columns) if columns is not None else query).first()
+
+        if columns is not None:
+            instance = model_cache.peek(cls, id) or cls._load_only(query, columns).first()
+        else:
+            instance = model_cache.get(cls, id, query.first)
+        # A cached row may have been soft deleted earlier in this session
+        return instance if instance is not None and not instance.is_deleted else None
     
     @classmethod
     def get_all(cls, **filters) -> List["BaseModel"]:
@@ -75,46 +218,101 @@ class BaseModel(db.Model):
         
     @classmethod
     def paginate(
-        cls, 
-        page: int = 1, 
-        per_page: int = 20, 
+        cls,
+        page: Optional[int] = None,
+        per_page: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
         **filters
     ) -> Dict[str, Any]:
-        """Paginate query results"""
+        """
+        Paginate query results
+
+        Uses keyset pagination over ``__keyset__`` (newest first) driven by an
+        opaque ``cursor``. Passing ``page`` opts into offset pagination in the
+        same order.
+        Totals come from the count service and never run COUNT(*) inline;
+        ``total_exact`` is False when the total is stale or estimated.
+
+        ``fields`` limits both the serialized keys and the SELECTed columns.
+        """
         filters['is_deleted'] = False
         query = cls.query.filter_by(**filters)
-        
-        pagination = query.paginate(page=page, per_page=per_page)
+        total, total_exact = count_service.get_total(cls, filters)
+
+        if fields is not None:
+            query = cls._load_only(query, tuple(fields) + cls.__keyset__)
+
+        if page is None:
+            result = cls._paginate_keyset(query, cursor, per_page, fields)
+        else:
+            # Without an ORDER BY, MySQL may return rows in a different order per page
+            pagination = cls._keyset_order(query).paginate(page=page, per_page=per_page, count=False)
+            result = {
+                "items": [item.to_dict(fields) for item in pagination.items],
+                "page": pagination.page,
+                "per_page": pagination.per_page,
+                "pages": math.ceil(total / per_page) if total is not None else None
+            }
+
+        result["total"] = total
+        result["total_exact"] = total_exact
+        return result
+
+    @classmethod
+    def _keyset_order(cls, query):
+        """Order by ``__keyset__`` descending, newest first"""
+        return query.order_by(*[getattr(cls, name).desc() for name in cls.__keyset__])
+
+    @classmethod
+    def _paginate_keyset(
+        cls,
+        query,
+        cursor: Optional[str],
+        per_page: int,
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
+        """Fetch the page of rows after ``cursor`` in descending keyset order"""
+        columns = [getattr(cls, name) for name in cls.__keyset__]
+        query = cls._keyset_order(query)
+
+        if cursor:
+            values = decode_cursor(cursor, columns)
+            query = query.filter(keyset_before(columns, values))
+
+        # Fetch one extra row to learn whether another page exists
+        rows = query.limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor([getattr(rows[-1], name) for name in cls.__keyset__])
+
         return {
-            "items": [item.to_dict() for item in pagination.items],
-            "total": pagination.total,
-            "page": pagination.page,
-            "per_page": pagination.per_page,
-            "pages": pagination.pages
+            "items": [item.to_dict(fields) for item in rows],
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }
 
 
 class AuditLogMixin:
-    """Mixin to add audit fields for models requiring audit trail"""
+    """Mixin to add audit fields for models requiring audit trail
+
+    Change history lives in the append-only audit_event table rather than
+    on the row itself, so updates don't grow with a model's edit count.
+    """
     created_by_id = Column(Integer, nullable=True)
     updated_by_id = Column(Integer, nullable=True)
-    audit_log = Column(MutableDict.as_mutable(JSON), default=lambda: {}, nullable=True)
-    
-    def log_change(self, user_id: int, action: str, details: Dict[str, Any]) -> None:
-        """Log a change to the model with user info"""
-        if not self.audit_log:
-            self.audit_log = {}
-            
-        timestamp = datetime.utcnow().isoformat()
-        log_entry = {
-            "timestamp": timestamp,
-            "user_id": user_id,
-            "action": action,
-            "details": details
-        }
-        
-        # Add entry to audit log
-        self.audit_log[str(uuid.uuid4())] = log_entry
-        
+
+    def log_change(self, user_id: int, action: str, details: Optional[Dict[str, Any]] = None) -> None:
+        """Log a change to the model with user info; written once the change commits"""
+        audit_writer.enqueue_on_commit(self, user_id=user_id, action=action, details=details)
+
         # Update last modified user
-        self.updated_by_id = user_id 
\ No newline at end of file
+        self.updated_by_id = user_id
+
+    def get_audit_history(self, cursor: Optional[str] = None, per_page: int = 20) -> Dict[str, Any]:
+        """Get one page of this instance's audit history, newest first"""
+        return AuditEvent.history(self.__tablename__, self.id, cursor=cursor, per_page=per_page)
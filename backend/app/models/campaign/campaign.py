@@ -10,6 +10,8 @@ from app.models.creative import Creative
 
 class Campaign(BaseModel, AuditLogMixin):
     """Campaign model representing an advertising campaign"""
+    __heavy_columns__ = ('targeting', 'settings')
+
     name = Column(String(100), nullable=False)
     advertiser_id = Column(Integer, ForeignKey('advertiser.id'), nullable=False)
     daily_budget = Column(Float, nullable=False)
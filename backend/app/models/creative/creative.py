@@ -8,6 +8,10 @@ from app.models.base import BaseModel, AuditLogMixin, db
 
 class Creative(BaseModel, AuditLogMixin):
     """Model for creative assets"""
+
+    # Internal bookkeeping columns are not part of the API representation
+    __serialize_exclude__ = ('is_deleted', 'created_by_id', 'updated_by_id')
+    __heavy_columns__ = ('native_assets', 'targeting')
     
     # Basic information
     name = Column(String(100), nullable=False)
@@ -59,40 +63,6 @@ class Creative(BaseModel, AuditLogMixin):
     def __repr__(self) -> str:
         return f"<Creative {self.name} ({self.type})>"
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert creative to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'advertiser_id': self.advertiser_id,
-            'campaign_id': self.campaign_id,
-            'status': self.status,
-            'type': self.type,
-            'format': self.format,
-            'file_type': self.file_type,
-            'file_size': self.file_size,
-            'file_path': self.file_path,
-            'title': self.title,
-            'description': self.description,
-            'call_to_action': self.call_to_action,
-            'landing_url': self.landing_url,
-            'duration': self.duration,
-            'video_thumbnail': self.video_thumbnail,
-            'html5_zip_path': self.html5_zip_path,
-            'html5_entry_point': self.html5_entry_point,
-            'native_assets': self.native_assets,
-            'click_tracking_url': self.click_tracking_url,
-            'impression_tracking_url': self.impression_tracking_url,
-            'view_tracking_url': self.view_tracking_url,
-            'targeting': self.targeting,
-            'impressions': self.impressions,
-            'clicks': self.clicks,
-            'conversions': self.conversions,
-            'spend': self.spend,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-    
     @classmethod
     def get_by_advertiser(cls, advertiser_id: int) -> List["Creative"]:
         """Get all creatives for an advertiser"""
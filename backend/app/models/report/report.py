@@ -1,6 +1,6 @@
 from typing import Dict, Any, List, Optional
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Table, Text, Enum, Float, DateTime, Date
+from datetime import datetime, time, timedelta
+from sqlalchemy import BigInteger, Column, String, Integer, Boolean, ForeignKey, Table, Text, Enum, Float, DateTime, Date, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import JSON
 
@@ -104,6 +104,94 @@ class HourlyStatistic(BaseModel):
         return f"<HourlyStat {self.date} {self.hour}:00 camp:{self.campaign_id}>"
 
 
+class PlatformDailyStatistic(BaseModel):
+    """Platform-wide daily totals, one row per day, maintained by the daily rollup"""
+    date = Column(Date, nullable=False, unique=True, index=True)
+
+    # Delivery metrics summed from advertiser-level DailyStatistic rows
+    impressions = Column(Integer, default=0, nullable=False)
+    clicks = Column(Integer, default=0, nullable=False)
+    conversions = Column(Integer, default=0, nullable=False)
+    spend = Column(Float, default=0.0, nullable=False, comment="Media cost from delivery stats")
+
+    # Financial metrics summed from completed Transaction rows
+    revenue = Column(Float, default=0.0, nullable=False, comment="Advertiser spend charged, net of refunds")
+
+    # Activity
+    active_advertisers = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<PlatformDailyStat {self.date}>"
+
+    @classmethod
+    def get_stats(cls, start_date: Date, end_date: Date) -> List["PlatformDailyStatistic"]:
+        """Get platform daily totals within date range"""
+        return cls.query.filter(
+            cls.date >= start_date,
+            cls.date <= end_date,
+            cls.is_deleted.is_(False)
+        ).order_by(cls.date.asc()).all()
+
+    @classmethod
+    def rollup(cls, day: Date) -> "PlatformDailyStatistic":
+        """Recompute the platform totals for a single day
+
+        Safe to re-run: the row for ``day`` is overwritten with fresh totals.
+        """
+        # Imported here to avoid a circular import with the advertiser models
+        from app.models.advertiser.advertiser import Transaction
+
+        delivery = db.session.query(
+            func.coalesce(func.sum(DailyStatistic.impressions), 0),
+            func.coalesce(func.sum(DailyStatistic.clicks), 0),
+            func.coalesce(func.sum(DailyStatistic.conversions), 0),
+            func.coalesce(func.sum(DailyStatistic.spend), 0.0),
+            func.count(func.distinct(DailyStatistic.advertiser_id))
+        ).filter(
+            DailyStatistic.date == day,
+            DailyStatistic.campaign_id.is_(None),
+            DailyStatistic.creative_id.is_(None),
+            DailyStatistic.is_deleted.is_(False)
+        ).one()
+
+        # Spend transactions are stored as negative amounts, refunds as positive
+        day_start = datetime.combine(day, time.min)
+        day_end = day_start + timedelta(days=1)
+        charged = db.session.query(
+            func.coalesce(func.sum(-Transaction.amount), 0.0)
+        ).filter(
+            Transaction.transaction_type.in_(['spend', 'refund']),
+            Transaction.status == 'completed',
+            Transaction.created_at >= day_start,
+            Transaction.created_at < day_end,
+            Transaction.is_deleted.is_(False)
+        ).scalar()
+
+        stat = cls.query.filter_by(date=day).first()
+        if stat is None:
+            stat = cls(date=day)
+
+        stat.impressions = int(delivery[0])
+        stat.clicks = int(delivery[1])
+        stat.conversions = int(delivery[2])
+        stat.spend = float(delivery[3])
+        stat.active_advertisers = int(delivery[4])
+        stat.revenue = float(charged or 0.0)
+        stat.is_deleted = False
+
+        return stat.save()
+
+
+class ServingCounterCheckpoint(BaseModel):
+    """Last serving counter batch committed from a shared counter segment"""
+    epoch = Column(BigInteger, nullable=False, unique=True, index=True,
+                   comment="Random id drawn when the shared memory segment was created")
+    sequence = Column(BigInteger, nullable=False, comment="Number of the last batch committed")
+
+    def __repr__(self) -> str:
+        return f"<ServingCounterCheckpoint {self.epoch}:{self.sequence}>"
+
+
 class Report(BaseModel, AuditLogMixin):
     """Model for report generation jobs"""
     name = Column(String(100), nullable=False)
@@ -121,6 +209,7 @@ class Report(BaseModel, AuditLogMixin):
     task_id = Column(String(100), nullable=True, comment="Celery task ID")
     processing_started_at = Column(DateTime, nullable=True)
     processing_completed_at = Column(DateTime, nullable=True)
+    stage_metrics = Column(JSON, nullable=True, comment="Wall time and memory of each generation stage")
 
     def __repr__(self) -> str:
         return f"<Report {self.name} ({self.status})>"
@@ -1,10 +1,15 @@
-from typing import Dict, List, Optional, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Any, Iterable, Tuple
 from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Table, Text
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.dialects.mysql import JSON
 
 from app.models.base import BaseModel, AuditLogMixin, db
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash
+from app.utils.password_hasher import password_hasher
 
 # Association table for user_roles
 user_roles = Table(
@@ -16,7 +21,14 @@ user_roles = Table(
 
 
 class Permission:
-    """System permissions"""
+    """
+    System permissions
+
+    Each permission has a bit in a permission mask, numbered in declaration
+    order from 1; bit 0 is the wildcard. Add new permissions at the end so
+    existing masks (and tokens carrying them) keep their meaning.
+    """
+    WILDCARD = '*'
     # Campaign permissions
     CAMPAIGN_VIEW = 'campaigns.view'
     CAMPAIGN_CREATE = 'campaigns.create'
@@ -63,20 +75,51 @@ class Permission:
     ANALYTICS_VIEW = 'analytics.view'
     ANALYTICS_EXPORT = 'analytics.export'
 
+    # Audit trail permissions
+    AUDIT_VIEW = 'audit.view'
+
     @classmethod
     def get_all_permissions(cls) -> List[str]:
         """Get all available permissions"""
         return [
             value for key, value in cls.__dict__.items()
-            if not key.startswith('_') and isinstance(value, str)
+            if not key.startswith('_') and key != 'WILDCARD' and isinstance(value, str)
         ]
 
+    @classmethod
+    def bit(cls, permission: str) -> Optional[int]:
+        """Mask bit of a permission, or None if it is not a declared permission"""
+        return _PERMISSION_BITS.get(permission)
+
+    @classmethod
+    def compile(cls, permissions: Iterable[str]) -> Tuple[int, FrozenSet[str]]:
+        """
+        Compile permission names into a mask
+
+        Returns:
+            The mask, and the names that have no bit (kept for set lookups)
+        """
+        mask = 0
+        extra = set()
+        for permission in permissions:
+            bit = _PERMISSION_BITS.get(permission)
+            if bit is None:
+                extra.add(permission)
+            else:
+                mask |= bit
+        return mask, frozenset(extra)
+
+    @classmethod
+    def mask_allows(cls, mask: int, permission_bit: int) -> bool:
+        """Whether a mask grants a permission bit, directly or by wildcard"""
+        return bool(mask & (permission_bit | WILDCARD_BIT))
+
     @classmethod
     def get_permission_groups(cls) -> Dict[str, List[str]]:
         """Get permissions grouped by category"""
         groups = {}
         for key, value in cls.__dict__.items():
-            if not key.startswith('_') and isinstance(value, str):
+            if not key.startswith('_') and key != 'WILDCARD' and isinstance(value, str):
                 category = key.split('_')[0].lower()
                 if category not in groups:
                     groups[category] = []
@@ -84,6 +127,42 @@ class Permission:
         return groups
 
 
+WILDCARD_BIT = 1
+_PERMISSION_BITS: Dict[str, int] = {Permission.WILDCARD: WILDCARD_BIT}
+_PERMISSION_BITS.update(
+    (permission, 1 << index)
+    for index, permission in enumerate(Permission.get_all_permissions(), start=1)
+)
+
+# Compiled (mask, extra names) per role set, keyed by (role id, permission_version)
+# pairs, most recently used last. Every version bump makes new keys and users hold
+# arbitrary role combinations, so only the ROLE_SET_CACHE_SIZE most recent are kept
+_compiled_role_sets: "OrderedDict[Tuple[Tuple[int, int], ...], Tuple[int, FrozenSet[str]]]" = OrderedDict()
+ROLE_SET_CACHE_SIZE = 4096
+_role_sets_lock = threading.Lock()
+
+
+def _cached_role_set(key: Tuple[Tuple[int, int], ...]) -> Optional[Tuple[int, FrozenSet[str]]]:
+    with _role_sets_lock:
+        compiled = _compiled_role_sets.get(key)
+        if compiled is not None:
+            _compiled_role_sets.move_to_end(key)
+        return compiled
+
+
+def _cache_role_set(key: Tuple[Tuple[int, int], ...], compiled: Tuple[int, FrozenSet[str]]) -> None:
+    with _role_sets_lock:
+        _compiled_role_sets[key] = compiled
+        while len(_compiled_role_sets) > ROLE_SET_CACHE_SIZE:
+            _compiled_role_sets.popitem(last=False)
+
+
+def _is_committed(role: "Role") -> bool:
+    """Whether a role's permissions are as stored, so a compiled mask may be shared"""
+    state = sa_inspect(role)
+    return state.persistent and not state.modified
+
+
 class User(BaseModel, AuditLogMixin):
     """User model for authentication and authorization"""
     __tablename__ = 'user'
@@ -94,6 +173,7 @@ class User(BaseModel, AuditLogMixin):
     hashed_password = Column(String(255), nullable=False, comment='密码哈希')
     is_active = Column(Boolean, default=True, comment='是否激活')
     is_superuser = Column(Boolean, default=False, comment='是否超级管理员')
+    membership_version = Column(Integer, default=1, nullable=False, server_default='1', comment='角色成员版本')
     last_login = Column(String(30), nullable=True, comment='最后登录时间')
     advertiser_id = Column(Integer, ForeignKey('advertiser.id', name='fk_user_advertiser_id'), nullable=True, comment='关联的广告主ID')
     phone = Column(String(20), nullable=True, comment='手机号')
@@ -115,19 +195,53 @@ class User(BaseModel, AuditLogMixin):
         self.hashed_password = get_password_hash(password)
 
     def check_password(self, password: str) -> bool:
-        """Check if plain text password matches hash"""
-        return verify_password(password, self.hashed_password)
+        """
+        Check if plain text password matches hash
+
+        A matching hash made with an old work factor is replaced; the caller
+        saves the user.
+        """
+        matches, needs_rehash = password_hasher.verify(password, self.hashed_password)
+        if needs_rehash:
+            self.set_password(password)
+        return matches
 
     def has_permission(self, permission: str) -> bool:
         """Check if user has a specific permission"""
         if self.is_superuser:
             return True
 
-        for role in self.roles:
-            if role.has_permission(permission):
-                return True
+        mask, extra = self.compiled_permissions()
+        bit = Permission.bit(permission)
+        if bit is not None:
+            return Permission.mask_allows(mask, bit)
+        return bool(mask & WILDCARD_BIT) or permission in extra
 
-        return False
+    def compiled_permissions(self) -> Tuple[int, FrozenSet[str]]:
+        """
+        Permission mask of all the user's roles, plus names without a bit
+
+        Compiled once per combination of role versions, so a role change
+        takes effect as soon as its version is bumped.
+        """
+        if self.is_superuser:
+            return WILDCARD_BIT, frozenset()
+
+        roles = self.roles
+        shareable = all(_is_committed(role) for role in roles)
+        key = tuple(sorted((role.id, role.permission_version) for role in roles))
+        compiled = _cached_role_set(key) if shareable else None
+        if compiled is None:
+            mask = 0
+            extra = frozenset()
+            for role in roles:
+                role_mask, role_extra = role.compiled_permissions()
+                mask |= role_mask
+                extra |= role_extra
+            compiled = (mask, extra)
+            if shareable:
+                _cache_role_set(key, compiled)
+        return compiled
 
     def get_permissions(self) -> List[str]:
         """Get all permissions assigned to this user through roles"""
@@ -159,6 +273,7 @@ class Role(BaseModel, AuditLogMixin):
     name = Column(String(80), unique=True, nullable=False, comment='角色名称')
     description = Column(String(255), comment='角色描述')
     permissions = Column(JSON, default=lambda: {}, comment='权限列表')
+    permission_version = Column(Integer, default=1, nullable=False, server_default='1', comment='权限版本')
 
     # Relationships
     users = relationship("User", secondary=user_roles, back_populates="roles")
@@ -168,14 +283,23 @@ class Role(BaseModel, AuditLogMixin):
 
     def has_permission(self, permission: str) -> bool:
         """Check if role has a specific permission"""
-        if not self.permissions:
-            return False
-
-        # Handle wildcard permissions
-        if "*" in self.permissions.get("permissions", []):
-            return True
-
-        return permission in self.permissions.get("permissions", [])
+        mask, extra = self.compiled_permissions()
+        bit = Permission.bit(permission)
+        if bit is not None:
+            return Permission.mask_allows(mask, bit)
+        return bool(mask & WILDCARD_BIT) or permission in extra
+
+    def compiled_permissions(self) -> Tuple[int, FrozenSet[str]]:
+        """Permission mask of this role, compiled once per permission version"""
+        if not _is_committed(self):
+            return Permission.compile(self.get_permissions())
+
+        key = ((self.id, self.permission_version),)
+        compiled = _cached_role_set(key)
+        if compiled is None:
+            compiled = Permission.compile(self.get_permissions())
+            _cache_role_set(key, compiled)
+        return compiled
 
     def get_permissions(self) -> List[str]:
         """Get all permissions for this role"""
@@ -190,6 +314,7 @@ class Role(BaseModel, AuditLogMixin):
             self.permissions = {}
 
         self.permissions["permissions"] = permissions
+        self._permissions_changed()
 
     def add_permission(self, permission: str) -> None:
         """Add a permission to this role"""
@@ -197,7 +322,8 @@ class Role(BaseModel, AuditLogMixin):
             self.permissions = {"permissions": []}
 
         if permission not in self.permissions.get("permissions", []):
-            self.permissions["permissions"].append(permission)
+            self.permissions.setdefault("permissions", []).append(permission)
+            self._permissions_changed()
 
     def remove_permission(self, permission: str) -> None:
         """Remove a permission from this role"""
@@ -206,3 +332,19 @@ class Role(BaseModel, AuditLogMixin):
 
         if permission in self.permissions["permissions"]:
             self.permissions["permissions"].remove(permission)
+            self._permissions_changed()
+
+    def delete(self) -> "Role":
+        """Soft delete the role; the version bump revokes it from issued tokens"""
+        self.permission_version = (self.permission_version or 0) + 1
+        return super().delete()
+
+    def _permissions_changed(self) -> None:
+        """
+        Mark the JSON column dirty and bump the version
+
+        Masks compiled under the old version are no longer looked up, and
+        tokens carrying the old version can be detected as stale.
+        """
+        flag_modified(self, 'permissions')
+        self.permission_version = (self.permission_version or 0) + 1
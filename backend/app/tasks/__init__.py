@@ -0,0 +1,9 @@
+from app import create_app
+from app.utils.celery import make_celery
+
+# Celery worker entry point: celery -A app.tasks worker -B
+flask_app = create_app()
+celery = make_celery(flask_app)
+
+# Register task modules
+from app.tasks import report  # noqa: E402,F401
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+from app.tasks import celery
+from app.models.report.report import PlatformDailyStatistic
+
+
+@celery.task(name='app.tasks.report.update_daily_stats')
+def update_daily_stats(days_back: int = 1) -> int:
+    """
+    Roll up platform daily totals
+
+    Recomputes today plus the previous ``days_back`` days so late-arriving
+    statistics and transactions are picked up.
+
+    Returns:
+        Number of days rolled up
+    """
+    today = datetime.utcnow().date()
+    for offset in range(days_back, -1, -1):
+        PlatformDailyStatistic.rollup(today - timedelta(days=offset))
+    return days_back + 1
@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import event, insert, inspect as sa_inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.audit.audit import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+# session.info key holding audit events waiting for their transaction to commit
+PENDING_EVENTS_KEY = 'audit_writer_pending_events'
+
+# Tries of a batch INSERT before it is written row by row, and the delay before the first retry
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+
+
+class AuditWriter:
+    """
+    Batches audit events and inserts them from a background thread
+
+    Events are flushed when ``batch_size`` of them are waiting or when the
+    oldest waiting event is ``flush_interval`` seconds old, whichever comes
+    first, as a single multi-row INSERT into audit_event. A batch that keeps
+    failing is written row by row, so one bad event doesn't lose the rest.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 100000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def enqueue(
+        self,
+        entity_type: str,
+        entity_id: int,
+        user_id: Optional[int],
+        action: str,
+        details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Queue an audit event; blocks only if the writer is far behind"""
+        self._put(_event(entity_type, entity_id, user_id, action, details))
+
+    def enqueue_on_commit(
+        self,
+        instance,
+        user_id: Optional[int],
+        action: str,
+        details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Queue an audit event for a model instance once its session commits
+
+        The event is dropped if the transaction rolls back instead. The
+        entity id is read at commit, so new instances may be logged before
+        they are flushed.
+        """
+        session = object_session(instance) or db.session()
+        session.info.setdefault(PENDING_EVENTS_KEY, []).append(
+            (instance, _event(instance.__tablename__, None, user_id, action, details))
+        )
+
+    def _put(self, audit_event: Dict[str, Any]) -> None:
+        self._ensure_started()
+        self._queue.put(audit_event)
+
+    def flush(self) -> int:
+        """Write every queued event now; returns the number written"""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if self._app is None:
+            return
+
+        with self._write_lock, self._app.app_context():
+            for attempt in range(WRITE_ATTEMPTS):
+                if attempt:
+                    time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+                try:
+                    db.session.execute(insert(AuditEvent), batch)
+                    db.session.commit()
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Failed to write {len(batch)} audit events (attempt {attempt + 1}): {e}")
+
+            # The batch fails as a whole on one bad row; write the rest without it
+            for audit_event in batch:
+                try:
+                    db.session.execute(insert(AuditEvent), [audit_event])
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(
+                        f"Dropping audit event {audit_event['action']} of "
+                        f"{audit_event['entity_type']} {audit_event['entity_id']}: {e}"
+                    )
+
+
+def _event(
+    entity_type: str,
+    entity_id: Optional[int],
+    user_id: Optional[int],
+    action: str,
+    details: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "user_id": user_id,
+        "action": action,
+        # Round-trip through JSON so dates and other values are stored as text
+        "details": json.loads(json.dumps(details, default=str)) if details is not None else None,
+        "created_at": datetime.utcnow()
+    }
+
+
+audit_writer = AuditWriter(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL
+)
+atexit.register(audit_writer.flush)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_committed_events(session) -> None:
+    for instance, audit_event in session.info.pop(PENDING_EVENTS_KEY, ()):
+        identity = sa_inspect(instance).identity
+        if identity is None:
+            # Never written, so there is nothing to audit
+            continue
+        audit_event["entity_id"] = identity[0]
+        audit_writer._put(audit_event)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_events(session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
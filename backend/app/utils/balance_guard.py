@@ -0,0 +1,195 @@
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.advertiser.advertiser import Advertiser
+from app.models.campaign.campaign import Campaign
+from app.utils.shared_counters import SharedCounterTable, from_micros, to_micros
+from app.utils.spend_ledger import spend_ledger
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceGuard:
+    """
+    Keeps an advertiser's campaigns, taken together, within its balance
+
+    Each advertiser has a credit line in shared memory, visible to every
+    worker process on the node:
+
+        limit      balance as of the last refill, minus spend settled since
+        unsettled  spend reserved on the bid path but not yet settled
+        exhausted  1 once less than ``min_credit`` remains
+
+    Reserving spend checks and raises ``unsettled`` under the row's lock, so
+    concurrent workers can never reserve more than ``limit``. When the spend
+    ledger settles a batch, the amount moves out of ``unsettled`` and out of
+    ``limit`` together, matching the balance debit in the database. One
+    process at a time (elected by file lock) refills every limit from
+    Advertiser.balance, which picks up deposits and withdrawals. Crash windows
+    leave ``unsettled`` too high, never too low, so errors refuse spend.
+
+    Campaign eligibility is a dict lookup plus one unlocked shared memory read.
+    """
+
+    def __init__(self, name: str, capacity: int = 65536, refresh_interval: float = 5.0, min_credit: float = 0.01):
+        self.table = SharedCounterTable(name, ('limit', 'unsettled', 'exhausted'), capacity=capacity)
+        self.refresh_interval = refresh_interval
+        self.min_credit = to_micros(min_credit)
+        self._refill_lock_path = os.path.join(tempfile.gettempdir(), f"{name}.refill")
+        self._campaigns: Dict[int, int] = {}
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        spend_ledger.add_settle_listener(self._on_settled)
+
+    def reserve(self, advertiser_id: int, amount: float) -> bool:
+        """Reserve spend against the advertiser's credit line; False if it isn't covered"""
+        self._ensure_started()
+        micros = to_micros(amount)
+        row = self.table.row(advertiser_id)
+
+        def apply(values):
+            available = values['limit'] - values['unsettled']
+            if micros > available:
+                if available < self.min_credit:
+                    values['exhausted'] = 1
+                return False
+            values['unsettled'] += micros
+            values['exhausted'] = int(available - micros < self.min_credit)
+            return True
+
+        return self.table.transact(row, apply)
+
+    def release(self, advertiser_id: int, amount: float) -> None:
+        """Return reserved spend that will not be charged, e.g. a lost auction"""
+        row = self.table.row(advertiser_id)
+
+        def apply(values):
+            values['unsettled'] = max(values['unsettled'] - to_micros(amount), 0)
+            values['exhausted'] = int(values['limit'] - values['unsettled'] < self.min_credit)
+
+        self.table.transact(row, apply)
+
+    def charge(self, advertiser_id: int, reserved: float, actual: float) -> None:
+        """
+        Turn a reservation into spend
+
+        Releases the part of the reservation above the actual price and sends
+        the actual spend to the ledger for settlement.
+        """
+        if reserved > actual:
+            self.release(advertiser_id, reserved - actual)
+        if actual > 0:
+            spend_ledger.record(advertiser_id, actual)
+
+    def available(self, advertiser_id: int) -> float:
+        """Credit left for an advertiser on this node"""
+        self._ensure_started()
+        row = self.table.row(advertiser_id, create=False)
+        if row is None:
+            return 0.0
+        return from_micros(self.table.get(row, 'limit') - self.table.get(row, 'unsettled'))
+
+    def is_campaign_eligible(self, campaign_id: int) -> bool:
+        """Whether an active campaign's advertiser still has credit"""
+        self._ensure_started()
+        advertiser_id = self._campaigns.get(campaign_id)
+        if advertiser_id is None:
+            return False
+        row = self.table.row(advertiser_id, create=False)
+        return row is not None and not self.table.get(row, 'exhausted')
+
+    def refresh(self) -> None:
+        """Reload the campaign map, and refill limits if this process wins the refill"""
+        with self._app.app_context():
+            self._campaigns = dict(db.session.execute(
+                select(Campaign.id, Campaign.advertiser_id).where(
+                    Campaign.status == 'active',
+                    Campaign.is_deleted.is_(False)
+                )
+            ).all())
+
+            with open(self._refill_lock_path, 'a+') as lock_file:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+
+                # The file holds the time of the last refill by any worker
+                lock_file.seek(0)
+                last_refill = float(lock_file.read() or 0)
+                if time.time() - last_refill < self.refresh_interval / 2:
+                    return
+
+                balances = db.session.execute(
+                    select(Advertiser.id, Advertiser.balance).where(Advertiser.is_deleted.is_(False))
+                ).all()
+                db.session.rollback()
+
+                for advertiser_id, balance in balances:
+                    self._refill(advertiser_id, balance)
+
+                lock_file.seek(0)
+                lock_file.truncate()
+                lock_file.write(str(time.time()))
+
+    def _refill(self, advertiser_id: int, balance: float) -> None:
+        # A batch settled between reading the balance and this write is
+        # double-counted in limit until the next refill
+        limit = to_micros(balance or 0.0)
+
+        def apply(values):
+            values['limit'] = limit
+            values['exhausted'] = int(limit - values['unsettled'] < self.min_credit)
+
+        self.table.transact(self.table.row(advertiser_id), apply)
+
+    def _on_settled(self, totals: Dict[int, float]) -> None:
+        for advertiser_id, amount in totals.items():
+            micros = to_micros(amount)
+
+            def apply(values):
+                values['limit'] -= micros
+                values['unsettled'] = max(values['unsettled'] - micros, 0)
+                values['exhausted'] = int(values['limit'] - values['unsettled'] < self.min_credit)
+
+            self.table.transact(self.table.row(advertiser_id), apply)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = current_app._get_current_object()
+            # Fill the campaign map before the first eligibility check
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name='balance-guard', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Balance guard refresh failed: {e}")
+
+
+balance_guard = BalanceGuard(
+    name=settings.BALANCE_GUARD_SHM_NAME,
+    capacity=settings.BALANCE_GUARD_CAPACITY,
+    refresh_interval=settings.BALANCE_GUARD_REFRESH_INTERVAL,
+    min_credit=settings.BALANCE_GUARD_MIN_CREDIT
+)
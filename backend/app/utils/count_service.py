@@ -0,0 +1,174 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import replica_reads
+from app.extensions import db
+
+# session.info key holding the models a flush wrote
+CHANGED_MODELS_KEY = 'count_service_changed_models'
+
+
+class CountService:
+    """
+    Serves list totals without running COUNT(*) on the request path
+
+    Counts are cached per (table, filter signature) and recomputed on a
+    background thread after ``ttl`` seconds, or once this process commits a
+    write to the table. While a count is missing or stale the caller gets
+    the last known value, or an information-schema row estimate for
+    unfiltered lists. A count is reported exact only while it is younger
+    than ``exact_ttl`` and no write has been seen since; other processes'
+    writes are not seen, so that is as long as it can be vouched for.
+    """
+
+    def __init__(self, ttl: int = 60, exact_ttl: float = 5.0, max_entries: int = 10000, max_workers: int = 2):
+        self.ttl = ttl
+        self.exact_ttl = exact_ttl
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self._counts: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+        self._estimates: Dict[str, Tuple[Optional[int], float]] = {}
+        # Table -> when this process last committed a write to it
+        self._changed: Dict[str, float] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def get_total(self, model, filters: Dict[str, Any]) -> Tuple[Optional[int], bool]:
+        """
+        Get the total row count for a filtered model query
+
+        Returns:
+            Tuple of (total, exact); total is None when nothing is known yet
+        """
+        key = (model.__tablename__, self._signature(filters))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is not None:
+                self._counts.move_to_end(key)
+
+        if entry is not None and entry[1] >= self._changed.get(key[0], 0.0):
+            age = now - entry[1]
+            if age < self.ttl:
+                return entry[0], age < self.exact_ttl
+
+        self._schedule_refresh(model, filters, key)
+
+        if entry is not None:
+            return entry[0], False
+
+        if self._is_unfiltered(filters):
+            return self._estimate(model), False
+
+        return None, False
+
+    def invalidate(self, model) -> None:
+        """
+        Mark a model's cached counts stale, e.g. after bulk inserts or deletes
+
+        They are still served, flagged as not exact, until recounted.
+        Commits of ORM changes call this on their own.
+        """
+        self._changed[model.__tablename__] = time.monotonic()
+
+    def _schedule_refresh(self, model, filters: Dict[str, Any], key: Tuple[str, str]) -> None:
+        """Recompute an exact count in the background, once per key at a time"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='count-refresh'
+                )
+
+        app = current_app._get_current_object()
+        self._executor.submit(self._refresh, app, model, dict(filters), key)
+
+    def _refresh(self, app, model, filters: Dict[str, Any], key: Tuple[str, str]) -> None:
+        try:
+            # As of when the query started, so writes committed while it runs make it stale
+            counted_at = time.monotonic()
+            with app.app_context(), replica_reads():
+                total = db.session.query(func.count(model.id)).filter_by(**filters).scalar()
+            with self._lock:
+                self._counts[key] = (int(total or 0), counted_at)
+                self._counts.move_to_end(key)
+                while len(self._counts) > self.max_entries:
+                    self._counts.popitem(last=False)
+        except Exception as e:
+            app.logger.warning(f"Count refresh failed for {key[0]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _after_fork(self) -> None:
+        # Refresh threads don't survive fork; start new ones on demand
+        self._executor = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _estimate(self, model) -> Optional[int]:
+        """Row estimate from the information schema (MySQL only)"""
+        table = model.__tablename__
+        now = time.monotonic()
+
+        cached = self._estimates.get(table)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+
+        estimate = None
+        if db.engine.dialect.name == 'mysql':
+            estimate = db.session.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+                ),
+                {"table": table}
+            ).scalar()
+
+        self._estimates[table] = (estimate, now)
+        return estimate
+
+    @staticmethod
+    def _signature(filters: Dict[str, Any]) -> str:
+        return repr(sorted(filters.items()))
+
+    @staticmethod
+    def _is_unfiltered(filters: Dict[str, Any]) -> bool:
+        return all(key == 'is_deleted' for key in filters)
+
+
+count_service = CountService(ttl=settings.COUNT_CACHE_TTL, exact_ttl=settings.COUNT_EXACT_TTL)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changed_models(session, flush_context) -> None:
+    changed = session.info.setdefault(CHANGED_MODELS_KEY, set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        changed.add(type(instance))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_counts(session) -> None:
+    for model in session.info.pop(CHANGED_MODELS_KEY, ()):
+        count_service.invalidate(model)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_models(session) -> None:
+    session.info.pop(CHANGED_MODELS_KEY, None)
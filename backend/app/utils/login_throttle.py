@@ -0,0 +1,98 @@
+import logging
+import time
+from typing import Optional
+
+from flask import Flask, current_app
+
+from app.core.config import settings
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# Backends that keep a separate store in each worker process, or none at all
+PROCESS_LOCAL_CACHES = ('SimpleCache', 'NullCache')
+
+
+class LoginThrottle:
+    """
+    Failed-login limits per username and per client IP
+
+    Failures are counted in fixed windows of ``window`` seconds in the
+    Flask-Caching backend. A throttled attempt is refused before any
+    password hashing happens. The limits only hold across workers with a
+    shared backend such as Redis. With SimpleCache each worker counts on its
+    own and a restart clears the counts, so up to ``max_per_user`` times
+    the worker count get through per window. NullCache never stores a
+    count, and with no cache configured at all the throttle does nothing.
+    ``init_app`` logs both cases at startup.
+    """
+
+    def __init__(self, max_per_user: int = 5, max_per_ip: int = 50, window: int = 300):
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.window = window
+
+    def retry_after(self, username: str, ip: Optional[str]) -> Optional[int]:
+        """Seconds until another attempt is allowed, or None if it is allowed now"""
+        backend = self._backend()
+        if backend is None:
+            return None
+
+        window, remaining = self._window()
+        user_key, ip_key = self._keys(window, username, ip)
+        user_failures, ip_failures = backend.get_many(user_key, ip_key)
+        if (user_failures or 0) >= self.max_per_user or (ip_failures or 0) >= self.max_per_ip:
+            return remaining
+        return None
+
+    def record_failure(self, username: str, ip: Optional[str]) -> None:
+        backend = self._backend()
+        if backend is None:
+            return
+
+        window, _ = self._window()
+        for key in self._keys(window, username, ip):
+            # add() sets the expiry once; inc() keeps it
+            backend.add(key, 0, timeout=self.window * 2)
+            backend.inc(key)
+
+    def reset(self, username: str) -> None:
+        """Clear a username's failures after a successful login"""
+        backend = self._backend()
+        if backend is None:
+            return
+        window, _ = self._window()
+        backend.delete(self._keys(window, username, None)[0])
+
+    def _window(self):
+        now = int(time.time())
+        return now // self.window, self.window - now % self.window
+
+    @staticmethod
+    def _keys(window: int, username: str, ip: Optional[str]):
+        return f"login:fail:user:{window}:{username.lower()}", f"login:fail:ip:{window}:{ip}"
+
+    @staticmethod
+    def _backend():
+        backends = current_app.extensions.get("cache")
+        return backends.get(cache) if backends else None
+
+
+def init_app(app: Flask) -> None:
+    """Warn at startup when the configured cache can't enforce the limits across workers"""
+    cache_type = app.config.get('CACHE_TYPE') or ''
+    if not app.extensions.get('cache', {}).get(cache) or cache_type.endswith('NullCache'):
+        logger.warning("No cache backend stores login failures; login throttling is disabled")
+    elif cache_type.endswith(PROCESS_LOCAL_CACHES):
+        logger.warning(
+            f"Login failures are counted per worker in {cache_type}; each worker allows "
+            f"{login_throttle.max_per_user} failures per user per {login_throttle.window}s. "
+            "Set CACHE_TYPE to a shared backend such as RedisCache"
+        )
+
+
+login_throttle = LoginThrottle(
+    max_per_user=settings.LOGIN_MAX_FAILURES_PER_USER,
+    max_per_ip=settings.LOGIN_MAX_FAILURES_PER_IP,
+    window=settings.LOGIN_THROTTLE_WINDOW
+)
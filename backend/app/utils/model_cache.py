@@ -0,0 +1,259 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.database import primary_reads, replica_reads
+from app.extensions import cache, db
+
+# session.info key for rows written in the current transaction
+PENDING_KEY = 'model_cache_stale'
+
+# Requests that only read; any other request, or code outside a request, may write
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ModelCache:
+    """
+    Two-tier read-through cache of model rows by primary key
+
+    The per-process tier is an LRU of raw column values. For read-only
+    requests its entries are trusted for ``local_ttl`` seconds, which bounds
+    how stale another process's write can look. Requests that may write
+    check a local entry's version stamp against the shared tier first, so
+    they never start from a row another process has changed. Without a
+    shared tier they bypass the local one. The shared tier is the
+    Flask-Caching ``cache``: Redis in production, SimpleCache as the local
+    stand-in.
+
+    Entries carry the version stamp their row was read under. Writes replace
+    a row's stamp (the time.time_ns() of the write) after their transaction
+    commits, and entries with any other stamp are ignored. A reader that
+    loaded a row just before a concurrent write therefore cannot cache it
+    as current. Read-only misses load from a replica that had applied every
+    commit up to the stamp's time, and from the primary when none has.
+    Row values are turned back into session-attached instances without a
+    SELECT.
+    """
+
+    def __init__(self, local_size: int = 10000, local_ttl: float = 2.0, ttl: int = 300):
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        # key -> (row, time stored, version stamp or None)
+        self._local: "OrderedDict[Tuple[str, Any], Tuple[Dict[str, Any], float, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0,
+            "local_seconds": 0.0, "shared_seconds": 0.0, "miss_seconds": 0.0
+        }
+
+    def get(self, model, id: Any, load) -> Optional[Any]:
+        """
+        Get an instance by primary key, calling ``load()`` on a miss
+
+        ``load`` must return the instance fully loaded from the database or
+        None; its row is cached for later calls.
+        """
+        start = time.perf_counter()
+        key = (model.__tablename__, id)
+        shared = self._shared()
+        writing = self._may_write()
+
+        entry = self._local_entry(key, start, writing, shared)
+        if entry is not None:
+            instance = self._attach(model, entry[0])
+            self._record("local", start)
+            return instance
+
+        version = None
+        if shared is not None:
+            version_key, data_key = self._keys(key)
+            version, data = shared.get_many(version_key, data_key)
+            if version is None:
+                # No stamp yet (or it was evicted): start one; no entry can match it
+                version = time.time_ns()
+                if not shared.add(version_key, version, timeout=0):
+                    version = shared.get(version_key)
+            elif data is not None and data[0] == version:
+                self._store_local(key, data[1], version)
+                instance = self._attach(model, data[1])
+                self._record("shared", start)
+                return instance
+
+        # Only a replica that has applied the row's last write may fill the
+        # cache under its stamp; writes start from the primary's row
+        if writing or version is None:
+            reads = primary_reads()
+        else:
+            reads = replica_reads(caught_up_to=version / 1e9)
+        with reads:
+            instance = load()
+        row = self._row(instance) if instance is not None else None
+        # Rows written by this session's open transaction are not committed yet
+        if row is not None and key not in db.session.info.get(PENDING_KEY, ()):
+            self._store_local(key, row, version)
+            if shared is not None and version is not None:
+                shared.set(self._keys(key)[1], (version, row), timeout=self.ttl)
+        self._record("miss", start)
+        return instance
+
+    def peek(self, model, id: Any) -> Optional[Any]:
+        """Get an instance from the local tier only, without loading on a miss"""
+        entry = self._local_entry((model.__tablename__, id), time.perf_counter(), self._may_write(), self._shared())
+        return self._attach(model, entry[0]) if entry is not None else None
+
+    def invalidate(self, model, ids: Iterable[Any]) -> None:
+        """Drop cached rows now, e.g. after a bulk UPDATE that bypassed the ORM"""
+        self._bump(model.__tablename__, ids)
+
+    def mark_stale(self, model, ids: Iterable[Any]) -> None:
+        """Invalidate rows when the current session commits, e.g. after a Core UPDATE"""
+        pending = db.session.info.setdefault(PENDING_KEY, set())
+        for id in ids:
+            pending.add((model.__tablename__, id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rates and mean latency (ms) per tier since startup"""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._local)
+
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        result = {
+            "lookups": lookups,
+            "local_entries": entries,
+            "invalidations": stats["invalidations"],
+            "hit_rate": round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else None,
+            "local_hit_rate": round(stats["local_hits"] / lookups, 4) if lookups else None,
+        }
+        for tier, count_key in (("local", "local_hits"), ("shared", "shared_hits"), ("miss", "misses")):
+            count = stats[count_key]
+            result[f"{tier}_ms"] = round(stats[f"{tier}_seconds"] / count * 1000, 3) if count else None
+        return result
+
+    def _bump(self, table: str, ids: Iterable[Any]) -> None:
+        keys = [(table, id) for id in ids]
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+            self._stats["invalidations"] += len(keys)
+
+        shared = self._shared()
+        if shared is not None and keys:
+            version = time.time_ns()
+            shared.set_many({self._keys(key)[0]: version for key in keys}, timeout=0)
+
+    def _local_entry(self, key, now: float, verify: bool, shared) -> Optional[Tuple[Dict[str, Any], float, Optional[int]]]:
+        """
+        A local entry within ``local_ttl``, or None
+
+        With ``verify`` the entry must also still carry the row's current
+        stamp in the shared tier, which needs one round trip.
+        """
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None or now - entry[1] >= self.local_ttl:
+                return None
+            self._local.move_to_end(key)
+
+        if verify and (shared is None or entry[2] is None or shared.get(self._keys(key)[0]) != entry[2]):
+            return None
+        return entry
+
+    def _store_local(self, key, row: Dict[str, Any], version: Optional[int]) -> None:
+        with self._lock:
+            self._local[key] = (row, time.perf_counter(), version)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _record(self, tier: str, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["misses" if tier == "miss" else f"{tier}_hits"] += 1
+            self._stats[f"{tier}_seconds"] += elapsed
+
+    @staticmethod
+    def _may_write() -> bool:
+        return not has_request_context() or request.method not in READ_METHODS
+
+    @staticmethod
+    def _keys(key) -> Tuple[str, str]:
+        return f"model:{key[0]}:{key[1]}:v", f"model:{key[0]}:{key[1]}"
+
+    @staticmethod
+    def _shared():
+        """The app's shared cache backend, or None if Flask-Caching isn't set up"""
+        backends = current_app.extensions.get("cache")
+        return backends.get(cache) if backends else None
+
+    @staticmethod
+    def _row(instance) -> Optional[Dict[str, Any]]:
+        """Committed column values of a fully loaded instance, or None"""
+        state = sa_inspect(instance)
+        if state.modified:
+            return None
+        keys = [attr.key for attr in state.mapper.column_attrs]
+        if any(key not in state.dict for key in keys):
+            return None
+        return {key: state.dict[key] for key in keys}
+
+    @staticmethod
+    def _attach(model, row: Dict[str, Any]):
+        """Rebuild a persistent instance from cached column values without a SELECT"""
+        mapper = sa_inspect(model)
+        identity = db.session.identity_map.get(mapper.identity_key_from_primary_key([row['id']]))
+        if identity is not None:
+            return identity
+
+        instance = mapper.class_manager.new_instance()
+        for key, value in row.items():
+            # JSON values are mutable; each request gets its own copy
+            set_committed_value(instance, key, copy.deepcopy(value) if isinstance(value, (dict, list)) else value)
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+
+model_cache = ModelCache(
+    local_size=settings.MODEL_CACHE_LOCAL_SIZE,
+    local_ttl=settings.MODEL_CACHE_LOCAL_TTL,
+    ttl=settings.MODEL_CACHE_TTL
+)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_written_rows(session, flush_context) -> None:
+    pending: Set[Tuple[str, Any]] = session.info.setdefault(PENDING_KEY, set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(instance, '__cacheable__', False):
+            state = sa_inspect(instance)
+            id = state.dict.get('id', state.identity[0] if state.identity else None)
+            if id is not None:
+                pending.add((instance.__tablename__, id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_written_rows(session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    by_table: Dict[str, list] = {}
+    for table, id in pending:
+        by_table.setdefault(table, []).append(id)
+    for table, ids in by_table.items():
+        model_cache._bump(table, ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_written_rows(session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Sequence
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode keyset values into an opaque, URL-safe cursor"""
+    payload = [
+        value.isoformat() if isinstance(value, (datetime, date)) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> List[Any]:
+    """Decode a cursor produced by encode_cursor for the given keyset columns"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursorError("Invalid pagination cursor")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is int:
+                value = int(value)
+        except (ValueError, TypeError) as e:
+            raise InvalidCursorError("Invalid pagination cursor") from e
+        decoded.append(value)
+
+    return decoded
+
+
+def keyset_before(columns: Sequence[ColumnElement], values: Sequence[Any]) -> ColumnElement:
+    """
+    Build the keyset condition for rows ordered by ``columns`` descending
+
+    Expands to ``(c1 < v1) OR (c1 = v1 AND c2 < v2) OR ...`` rather than a
+    row-value comparison, which MySQL cannot always resolve with an index range.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column < values[i]))
+    return or_(*clauses)
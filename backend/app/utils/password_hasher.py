@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from app.core.config import settings
+
+ALGORITHM = 'pbkdf2_sha256'
+
+# Hashes written before the work factor was stored: "salt$hash" at 100,000 iterations
+LEGACY_ITERATIONS = 100000
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """
+    Bounded executor for PBKDF2 password hashing
+
+    PBKDF2 runs on a small thread pool, so at most ``max_workers`` cores
+    per process go to password work however many logins arrive. At most
+    ``max_queue`` more hashes wait for a thread; any beyond that fail fast
+    with HasherBusyError. The request thread itself waits for its hash.
+    hashlib releases the GIL meanwhile, so the worker keeps serving on its
+    other threads, which the gthread workers in gunicorn.conf.py provide;
+    a single-threaded (sync) worker is held for the whole hash.
+
+    Hashes are stored as ``pbkdf2_sha256$iterations$salt$hash``.
+    ``verify`` reports when a stored hash was made with a different work
+    factor (or the legacy format), so the caller can rehash it.
+    """
+
+    def __init__(self, iterations: int = 100000, max_workers: int = 2, max_queue: int = 32):
+        self.iterations = iterations
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._start()
+        # Pool threads do not survive fork; a worker process starts its own
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self) -> None:
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hasher')
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current work factor"""
+        salt = secrets.token_hex(16)
+        digest = self._run(password, salt, self.iterations)
+        return f"{ALGORITHM}${self.iterations}${salt}${digest}"
+
+    def verify(self, password: str, hashed_password: str) -> Tuple[bool, bool]:
+        """
+        Check a password against a stored hash
+
+        Returns:
+            Whether it matches, and whether the stored hash should be rehashed
+        """
+        try:
+            if hashed_password.startswith(f"{ALGORITHM}$"):
+                _, iterations, salt, stored_hash = hashed_password.split('$', 3)
+                iterations = int(iterations)
+            else:
+                salt, stored_hash = hashed_password.split('$', 1)
+                iterations = LEGACY_ITERATIONS
+                hashed_password = None
+        except (AttributeError, ValueError):
+            return False, False
+
+        matches = hmac.compare_digest(self._run(password, salt, iterations), stored_hash)
+        return matches, matches and (hashed_password is None or iterations != self.iterations)
+
+    def _run(self, password: str, salt: str, iterations: int) -> str:
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError("Too many password operations in progress")
+        try:
+            return self._executor.submit(_pbkdf2, password, salt, iterations).result()
+        finally:
+            self._slots.release()
+
+
+def _pbkdf2(password: str, salt: str, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+password_hasher = PasswordHasher(
+    iterations=settings.PASSWORD_HASH_ITERATIONS,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE
+)
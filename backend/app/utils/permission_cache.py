@@ -0,0 +1,219 @@
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.user.user import Permission, Role, User, WILDCARD_BIT, user_roles
+
+# session.info flag set when a flush wrote a role
+ROLES_CHANGED_KEY = 'permission_cache_roles_changed'
+# session.info key holding the ids of users whose membership a flush changed
+MEMBERSHIP_CHANGED_KEY = 'permission_cache_membership_changed'
+
+# User attributes that change what the user may do
+MEMBERSHIP_ATTRIBUTES = ('roles', 'is_superuser', 'is_active', 'is_deleted')
+
+# Seconds between refreshes forced by role ids the cache hasn't seen yet
+MIN_FORCED_REFRESH_INTERVAL = 1.0
+
+# Users cached per process; the longest cached are dropped beyond this
+MAX_CACHED_USERS = 10000
+# User ids per query when checking membership versions
+VERSION_QUERY_BATCH = 1000
+
+# (mask, names without a bit, is_superuser) of a user who may do nothing
+NO_ACCESS: Tuple[int, FrozenSet[str], bool] = (0, frozenset(), False)
+SUPERUSER_ACCESS: Tuple[int, FrozenSet[str], bool] = (WILDCARD_BIT, frozenset(), True)
+
+
+class PermissionCache:
+    """
+    Effective permissions per user, resolved on the server
+
+    Tokens only identify the user. The user's role set and superuser flag
+    are read from the database and cached under the user's
+    ``membership_version``, which moves whenever either changes or the user
+    is deactivated or deleted; each role's permissions are cached under its
+    ``permission_version``. Every ``refresh_interval`` seconds a process
+    reads both versions for what it holds (a few small queries) and reloads
+    only what moved, so a revocation applies within that interval instead
+    of when the token expires. A commit in this process that changes a role
+    or a membership applies at once.
+    """
+
+    def __init__(self, refresh_interval: float = 5.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # role id -> (permission_version, mask, names without a bit)
+        self._roles: Dict[int, Tuple[int, int, FrozenSet[str]]] = {}
+        # role set id ("2,5") -> (pv, mask, names without a bit)
+        self._sets: Dict[str, Tuple[int, int, FrozenSet[str]]] = {}
+        # user id -> (membership_version, role set id, is_superuser)
+        self._users: Dict[int, Tuple[int, str, bool]] = {}
+        self._refreshed_at = 0.0
+
+    def resolve_user(self, user_id: int) -> Tuple[int, FrozenSet[str], bool]:
+        """
+        Permission mask, extra permission names and superuser flag of a user
+
+        A user that doesn't exist, is inactive or is deleted gets nothing.
+        """
+        self._refresh(force=False)
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._load_user(user_id)
+            if user is None:
+                return NO_ACCESS
+        if user[2]:
+            return SUPERUSER_ACCESS
+        compiled = self._sets.get(user[1])
+        if compiled is None:
+            compiled = self._compile(user[1])
+        return compiled[1], compiled[2], False
+
+    def invalidate(self) -> None:
+        """Refresh on the next lookup"""
+        self._refreshed_at = 0.0
+
+    def forget_users(self, user_ids: Iterable[int]) -> None:
+        """Reload these users on their next lookup"""
+        with self._lock:
+            for user_id in user_ids:
+                self._users.pop(user_id, None)
+
+    def _load_user(self, user_id: int) -> Optional[Tuple[int, str, bool]]:
+        # The version is read first: if the membership changes in between,
+        # the entry is stale by version and the next refresh reloads it
+        row = db.session.execute(
+            select(User.membership_version, User.is_superuser, User.is_active, User.is_deleted)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+
+        version, is_superuser, is_active, is_deleted = row
+        if is_deleted or not is_active:
+            user = (version, "", False)
+        else:
+            role_ids = sorted(db.session.execute(
+                select(user_roles.c.role_id).where(user_roles.c.user_id == user_id)
+            ).scalars())
+            user = (version, ",".join(str(role_id) for role_id in role_ids), bool(is_superuser))
+            if (any(role_id not in self._roles for role_id in role_ids)
+                    and time.monotonic() - self._refreshed_at >= MIN_FORCED_REFRESH_INTERVAL):
+                self._refresh(force=True)
+
+        with self._lock:
+            if len(self._users) >= MAX_CACHED_USERS:
+                del self._users[next(iter(self._users))]
+            self._users[user_id] = user
+        return user
+
+    def _compile(self, role_set: str) -> Tuple[int, int, FrozenSet[str]]:
+        version = 0
+        mask = 0
+        extra = frozenset()
+        for role_id in role_set.split(",") if role_set else ():
+            role = self._roles.get(int(role_id))
+            if role is not None:
+                version += role[0]
+                mask |= role[1]
+                extra |= role[2]
+
+        compiled = (version, mask, extra)
+        self._sets[role_set] = compiled
+        return compiled
+
+    def _refresh(self, force: bool) -> None:
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            versions = dict(db.session.execute(select(Role.id, Role.permission_version)).all())
+            changed = [
+                role_id for role_id, version in versions.items()
+                if role_id not in self._roles or self._roles[role_id][0] != version
+            ]
+
+            if changed or len(versions) != len(self._roles):
+                roles = {role_id: role for role_id, role in self._roles.items() if role_id in versions}
+                for role_id, version, permissions, is_deleted in db.session.execute(
+                    select(Role.id, Role.permission_version, Role.permissions, Role.is_deleted)
+                    .where(Role.id.in_(changed))
+                ):
+                    # Deleted roles grant nothing but keep their version in pv sums
+                    mask, extra = Permission.compile(
+                        [] if is_deleted else (permissions or {}).get("permissions", [])
+                    )
+                    roles[role_id] = (version, mask, extra)
+                self._roles = roles
+                self._sets = {}
+
+            if self._users:
+                user_ids = list(self._users)
+                versions = {}
+                for start in range(0, len(user_ids), VERSION_QUERY_BATCH):
+                    versions.update(db.session.execute(
+                        select(User.id, User.membership_version)
+                        .where(User.id.in_(user_ids[start:start + VERSION_QUERY_BATCH]))
+                    ).all())
+                self._users = {
+                    user_id: user for user_id, user in self._users.items()
+                    if versions.get(user_id) == user[0]
+                }
+
+            self._refreshed_at = now
+
+
+permission_cache = PermissionCache(refresh_interval=settings.PERMISSION_REFRESH_INTERVAL)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_membership_versions(session, flush_context, instances) -> None:
+    users = set()
+    for instance in session.dirty:
+        if isinstance(instance, User):
+            state = sa_inspect(instance)
+            if any(state.attrs[name].history.has_changes() for name in MEMBERSHIP_ATTRIBUTES):
+                users.add(instance)
+        elif isinstance(instance, Role):
+            history = sa_inspect(instance).attrs.users.history
+            users.update(history.added)
+            users.update(history.deleted)
+
+    users = [user for user in users if sa_inspect(user).persistent and user not in session.deleted]
+    for user in users:
+        user.membership_version = (user.membership_version or 0) + 1
+    if users:
+        session.info.setdefault(MEMBERSHIP_CHANGED_KEY, set()).update(user.id for user in users)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_role_changes(session, flush_context) -> None:
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Role):
+            session.info[ROLES_CHANGED_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_after_commit(session) -> None:
+    if session.info.pop(ROLES_CHANGED_KEY, False):
+        permission_cache.invalidate()
+    user_ids = session.info.pop(MEMBERSHIP_CHANGED_KEY, None)
+    if user_ids:
+        permission_cache.forget_users(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_permission_changes(session) -> None:
+    session.info.pop(ROLES_CHANGED_KEY, None)
+    session.info.pop(MEMBERSHIP_CHANGED_KEY, None)
@@ -0,0 +1,220 @@
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse "number/period" (e.g. "100/hour") into (limit, period in seconds)"""
+    try:
+        count, period = rate.strip().split('/', 1)
+        period = period.strip().lower().rstrip('s')
+        return int(count), PERIODS[period]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit: {rate!r}") from None
+
+
+class MemoryTokenStore:
+    """
+    In-process token buckets with the same interface as RedisTokenStore
+
+    A stand-in for development and single-process use: every worker has its
+    own buckets. A missing bucket is a full one, so buckets that have
+    refilled are dropped every ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        # key -> (tokens, updated, time the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, want: int, refund: int, capacity: int, rate: float) -> Tuple[int, float]:
+        """
+        Return ``refund`` unused tokens, then take up to ``want`` tokens
+
+        Returns:
+            Tokens granted, and seconds until one token is available if none were
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept_at >= self.sweep_interval:
+                self._buckets = {k: bucket for k, bucket in self._buckets.items() if bucket[2] > now}
+                self._swept_at = now
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate + refund)
+            granted = min(want, int(tokens))
+            tokens -= granted
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return granted, 0.0 if granted else (1 - tokens) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisTokenStore:
+    """Token buckets in Redis, updated atomically by a Lua script"""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local capacity = tonumber(ARGV[3])
+    local rate = tonumber(ARGV[4])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate + tonumber(ARGV[2]))
+    local granted = math.min(tonumber(ARGV[1]), math.floor(tokens))
+    tokens = tokens - granted
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    if granted > 0 then
+        return {granted, '0'}
+    end
+    return {0, tostring((1 - tokens) / rate)}
+    """
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key: str, want: int, refund: int, capacity: int, rate: float) -> Tuple[int, float]:
+        granted, retry_after = self._script(keys=[self.prefix + key], args=[want, refund, capacity, rate])
+        return int(granted), float(retry_after)
+
+    def ping(self) -> None:
+        self._client.ping()
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter with leased tokens
+
+    Buckets live in a shared store (Redis in production), but a process
+    leases a batch of tokens at a time and spends them locally, so most
+    requests never leave the process. A lease is a ``lease_fraction`` of the
+    bucket and lasts ``lease_ttl`` seconds. What is left of it is handed back
+    with the next lease request for the key, or by the sweep that returns
+    expired leases at most once per ``lease_ttl``. A limit can never be
+    exceeded, only under-used while tokens sit in another process's lease,
+    so buckets whose lease would be under ``min_lease`` tokens are not
+    leased at all: every hit goes to the store.
+    """
+
+    def __init__(
+        self,
+        store,
+        lease_fraction: float = 0.05,
+        lease_ttl: float = 1.0,
+        max_lease: int = 100,
+        min_lease: int = 10
+    ):
+        self.store = store
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.max_lease = max_lease
+        self.min_lease = min_lease
+        self._rates: Dict[str, Tuple[int, int]] = {}
+        # key -> [tokens left, lease expiry, rate]
+        self._leases: Dict[str, list] = {}
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.store_calls = 0
+        os.register_at_fork(after_in_child=self._forget_leases)
+
+    def hit(self, key: str, rate: str) -> Tuple[bool, int]:
+        """
+        Spend one token of ``key``'s bucket
+
+        Returns:
+            Whether the request is allowed, and seconds to wait if it is not
+        """
+        now = time.monotonic()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease[0] > 0 and lease[1] > now:
+                lease[0] -= 1
+                return True, 0
+            refund = lease[0] if lease is not None else 0
+            self._leases.pop(key, None)
+            expired = self._pop_expired(now) if now - self._swept_at >= self.lease_ttl else []
+        self._return_leases(expired)
+
+        limit, period = self._parse(rate)
+        rate_per_second = limit / period
+        want = min(self.max_lease, int(limit * self.lease_fraction))
+        if want < self.min_lease:
+            want = 1
+        try:
+            granted, retry_after = self.store.take(key, want, refund, limit, rate_per_second)
+        except Exception as e:
+            # An unreachable store must not take the API down with it
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return True, 0
+        self.store_calls += 1
+
+        if granted == 0:
+            return False, max(1, math.ceil(retry_after))
+
+        with self._lock:
+            if granted > 1:
+                self._leases[key] = [granted - 1, now + self.lease_ttl, rate]
+        return True, 0
+
+    def _pop_expired(self, now: float) -> List[Tuple[str, int, str]]:
+        """Remove expired leases; returns (key, tokens left, rate) for those with tokens left"""
+        self._swept_at = now
+        expired = [key for key, lease in self._leases.items() if lease[1] <= now]
+        returned = []
+        for key in expired:
+            tokens, _, rate = self._leases.pop(key)
+            if tokens > 0:
+                returned.append((key, tokens, rate))
+        return returned
+
+    def _return_leases(self, leases: List[Tuple[str, int, str]]) -> None:
+        for key, tokens, rate in leases:
+            limit, period = self._parse(rate)
+            try:
+                self.store.take(key, 0, tokens, limit, limit / period)
+            except Exception as e:
+                logger.warning(f"Rate limit store unavailable, dropping leased tokens: {e}")
+                return
+            self.store_calls += 1
+
+    def _parse(self, rate: str) -> Tuple[int, int]:
+        parsed = self._rates.get(rate)
+        if parsed is None:
+            parsed = self._rates[rate] = parse_rate(rate)
+        return parsed
+
+    def _forget_leases(self) -> None:
+        # A forked child must not spend tokens its parent also holds
+        self._leases = {}
+        self._lock = threading.Lock()
+
+
+def create_store(url: str):
+    """Token store for a storage URL: ``memory://`` or a Redis URL"""
+    if url.startswith('memory://'):
+        return MemoryTokenStore()
+    return RedisTokenStore(url)
+
+
+rate_limiter = RateLimiter(
+    create_store(settings.RATE_LIMIT_STORAGE_URL),
+    lease_fraction=settings.RATE_LIMIT_LEASE_FRACTION,
+    lease_ttl=settings.RATE_LIMIT_LEASE_TTL
+)
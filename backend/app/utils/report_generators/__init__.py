@@ -1,33 +1,50 @@
-from .base import BaseReportGenerator
-from .campaign import CampaignReportGenerator
-from .creative import CreativeReportGenerator
-from .advertiser import AdvertiserReportGenerator
+from importlib import import_module
+
 from app.models.report.report import Report
 
+# The generators import pandas, so they are loaded on first use instead of
+# by every process that imports the report API
+_GENERATOR_MODULES = {
+    'BaseReportGenerator': '.base',
+    'CampaignReportGenerator': '.campaign',
+    'CreativeReportGenerator': '.creative',
+    'AdvertiserReportGenerator': '.advertiser',
+    'PlatformReportGenerator': '.platform'
+}
+
+
+def __getattr__(name: str):
+    module = _GENERATOR_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module, __name__), name)
+
 
 def generate_campaign_report(report: Report) -> str:
     """Generate campaign performance report"""
+    from .campaign import CampaignReportGenerator
     generator = CampaignReportGenerator(report)
     return generator.generate()
 
 
 def generate_creative_report(report: Report) -> str:
     """Generate creative performance report"""
+    from .creative import CreativeReportGenerator
     generator = CreativeReportGenerator(report)
     return generator.generate()
 
 
 def generate_advertiser_report(report: Report) -> str:
     """Generate advertiser performance report"""
+    from .advertiser import AdvertiserReportGenerator
     generator = AdvertiserReportGenerator(report)
     return generator.generate()
 
 
 def generate_platform_report(report: Report) -> str:
     """Generate platform performance report"""
-    # For now, we'll use the advertiser report generator
-    # In the future, this could be replaced with a dedicated PlatformReportGenerator
-    generator = AdvertiserReportGenerator(report)
+    from .platform import PlatformReportGenerator
+    generator = PlatformReportGenerator(report)
     return generator.generate()
 
 
@@ -36,8 +53,9 @@ __all__ = [
     'CampaignReportGenerator',
     'CreativeReportGenerator',
     'AdvertiserReportGenerator',
+    'PlatformReportGenerator',
     'generate_campaign_report',
     'generate_creative_report',
     'generate_advertiser_report',
     'generate_platform_report'
-] 
\ No newline at end of file
+]
\ No newline at end of file
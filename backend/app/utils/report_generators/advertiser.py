@@ -10,6 +10,10 @@ class AdvertiserReportGenerator(BaseReportGenerator):
 
     def get_data(self) -> pd.DataFrame:
         """Get advertiser performance data"""
+        return self.to_frame(self.query().all())
+
+    def query(self):
+        """Query the daily statistics of the report's advertisers"""
         # Get advertiser IDs from parameters
         advertiser_ids = self.parameters.get('advertiser_ids', [])
 
@@ -22,11 +26,13 @@ class AdvertiserReportGenerator(BaseReportGenerator):
         if advertiser_ids:
             query = query.filter(DailyStatistic.advertiser_id.in_(advertiser_ids))
 
-        stats = query.all()
+        return query
 
+    def to_frame(self, rows: list) -> pd.DataFrame:
+        """Convert daily statistics to a DataFrame"""
         # Convert to DataFrame
         data = []
-        for stat in stats:
+        for stat in rows:
             data.append({
                 'date': stat.date,
                 'advertiser_id': stat.advertiser_id,
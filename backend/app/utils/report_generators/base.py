@@ -1,11 +1,26 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from collections import deque
+from itertools import chain
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime, date
+import gc
+import logging
+import os
+import sqlite3
+import tempfile
 import pandas as pd
+from app.core.config import settings
+from app.core.database import replica_reads
+from app.core.slow_profiler import profile_slow
+from app.core.sql_profiler import profile_sql
+from app.extensions import db
 from app.models.report.report import Report
 from app.models.report.report import DailyStatistic
 from app.models.report.report import HourlyStatistic
 from app.models.report.report import CustomMetric
+from .stages import MB, StageTracker
+
+logger = logging.getLogger(__name__)
 
 
 class BaseReportGenerator(ABC):
@@ -32,22 +47,128 @@ class BaseReportGenerator(ABC):
         """Calculate metrics for the report"""
         pass
 
+    def query(self):
+        """Query of the report's rows, for generators that can load them in chunks"""
+        return None
+
+    def to_frame(self, rows: list) -> pd.DataFrame:
+        """Convert rows of query() to a DataFrame"""
+        raise NotImplementedError
+
+    def get_data_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Get the data in frames of at most chunk_rows rows
+
+        Pages through query() by primary key, so each page is a short
+        buffered query and lazy loads can run between pages. Generators
+        without a query() return all their data as one frame.
+        """
+        query = self.query()
+        if query is None:
+            yield self.get_data()
+            return
+
+        model = query.column_descriptions[0]['entity']
+        last_id = None
+        while True:
+            page = query if last_id is None else query.filter(model.id > last_id)
+            rows = page.order_by(model.id).limit(chunk_rows).all()
+            if rows:
+                yield self.to_frame(rows)
+            if len(rows) < chunk_rows:
+                return
+            last_id = rows[-1].id
+
     def generate(self) -> str:
-        """Generate the report and return the file path"""
+        """
+        Generate the report and return the file path
+
+        The wall time and memory of each stage are saved in the report's
+        stage_metrics. A job that would grow the process by more than
+        REPORT_MEMORY_LIMIT_MB (or runs out of memory) finishes chunk by
+        chunk instead, see _generate_chunked().
+        """
+        name = f"report {self.report.id} ({self.report.report_type})"
+        stages = StageTracker(settings.REPORT_TRACE_MEMORY)
+        with profile_sql(name), profile_slow(name, settings.SLOW_PROFILE_JOB_THRESHOLD_MS), stages:
+            try:
+                # Generate file path
+                file_path = self._generate_file_path()
+
+                # Report queries tolerate replica lag
+                with replica_reads():
+                    self._generate(stages, file_path)
+
+                return file_path
+
+            except Exception as e:
+                raise Exception(f"Error generating report: {str(e)}")
+
+            finally:
+                self._save_stage_metrics(stages)
+
+    def _generate(self, stages: StageTracker, file_path: str) -> None:
+        limit = settings.REPORT_MEMORY_LIMIT_MB * MB
+        chunk_rows = settings.REPORT_CHUNK_ROWS
+
+        if not limit:
+            with stages.stage('get_data'):
+                df = self.get_data()
+            stages.rows, stages.chunks = len(df), 1
+        else:
+            frames = deque()
+            loaded = 0
+            chunks = stages.timed('get_data', self.get_data_chunks(chunk_rows))
+            for frame in chunks:
+                frames.append(frame)
+                loaded += int(frame.memory_usage(deep=True).sum())
+                # The later stages hold copies of the frame next to it
+                if stages.rss_growth() + 2 * loaded > limit:
+                    logger.warning(
+                        f"Report {self.report.id} would pass {settings.REPORT_MEMORY_LIMIT_MB} MB "
+                        f"after {stages.rows} rows; generating it in chunks"
+                    )
+                    del frame
+                    self._generate_chunked(stages, chain(_drain(frames), chunks), file_path)
+                    return
+
+            with stages.stage('get_data'):
+                if len(frames) == 1:
+                    df = frames[0]
+                else:
+                    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            frames.clear()
+
         try:
-            # Get the data
-            df = self.get_data()
+            self._process(stages, df, file_path)
+            return
+        except MemoryError:
+            logger.warning(f"Report {self.report.id} ran out of memory; generating it in chunks")
+
+        # Outside the except block, so the traceback and the frames it holds are freed
+        df = None
+        gc.collect()
+        stages.rows = stages.chunks = 0
+        self._generate_chunked(stages, stages.timed('get_data', self.get_data_chunks(chunk_rows)), file_path)
 
-            # Apply filters
+    def _process(self, stages: StageTracker, df: pd.DataFrame, file_path: str) -> None:
+        # Apply filters
+        with stages.stage('apply_filters'):
             df = self.apply_filters(df)
 
-            # Calculate metrics
+        # Calculate metrics
+        with stages.stage('calculate_metrics'):
             df = self.calculate_metrics(df)
 
-            # Group by if specified
-            if 'group_by' in self.parameters:
+        # Group by if specified
+        if 'group_by' in self.parameters:
+            with stages.stage('group_by'):
                 df = df.groupby(self.parameters['group_by']).sum().reset_index()
 
+        self._sort_and_save(stages, df, file_path)
+
+    def _sort_and_save(self, stages: StageTracker, df: pd.DataFrame, file_path: str) -> None:
+        with stages.stage('sort'):
             # Sort if specified
             if 'sort_by' in self.parameters:
                 df = df.sort_values(
@@ -59,16 +180,107 @@ class BaseReportGenerator(ABC):
             if 'limit' in self.parameters:
                 df = df.head(self.parameters['limit'])
 
-            # Generate file path
-            file_path = self._generate_file_path()
-
-            # Save the report
+        # Save the report
+        with stages.stage('save'):
             self._save_report(df, file_path)
 
-            return file_path
+    def _generate_chunked(self, stages: StageTracker, chunks: Iterator[pd.DataFrame], file_path: str) -> None:
+        """
+        Run the pipeline a chunk at a time, holding about one chunk of rows
+
+        Filters and metrics work row by row, so they run per chunk. Grouped
+        reports keep running per-group sums; other reports are appended to
+        the CSV as they come, through a temporary SQLite table (which sorts
+        on disk) when they are sorted.
+        """
+        if not file_path.endswith('.csv'):
+            raise ValueError(f"Chunked reports are written as CSV, not {file_path}")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        stages.mode = 'chunked'
+        group_by = self.parameters['group_by'] if 'group_by' in self.parameters else None
+        sort_by = self.parameters['sort_by'] if 'sort_by' in self.parameters else None
+        limit = self.parameters.get('limit')
+
+        grouped = None
+        header = True
+        written = 0
+        with tempfile.TemporaryDirectory(prefix='report') as spill_dir:
+            spill = sqlite3.connect(os.path.join(spill_dir, 'rows.sqlite')) if sort_by is not None else None
+            try:
+                for frame in chunks:
+                    with stages.stage('apply_filters'):
+                        frame = self.apply_filters(frame)
+                    with stages.stage('calculate_metrics'):
+                        frame = self.calculate_metrics(frame)
+
+                    if group_by is not None:
+                        with stages.stage('group_by'):
+                            frame = frame.groupby(group_by).sum().reset_index()
+                            if grouped is not None:
+                                frame = pd.concat([grouped, frame], ignore_index=True)
+                                frame = frame.groupby(group_by).sum().reset_index()
+                            grouped = frame
+                    elif spill is not None:
+                        with stages.stage('sort'):
+                            frame.to_sql('report', spill, if_exists='append', index=False)
+                    else:
+                        with stages.stage('save'):
+                            if limit is not None:
+                                frame = frame.head(limit - written)
+                            frame.to_csv(file_path, index=False, mode='w' if header else 'a', header=header)
+                            header = False
+                            written += len(frame)
+                        if limit is not None and written >= limit:
+                            break
 
+                if group_by is not None:
+                    self._sort_and_save(stages, grouped if grouped is not None else pd.DataFrame(), file_path)
+                elif spill is not None:
+                    self._save_sorted(stages, spill, sort_by, limit, file_path)
+                elif header:
+                    pd.DataFrame().to_csv(file_path, index=False)
+            finally:
+                if spill is not None:
+                    spill.close()
+
+    def _save_sorted(self, stages: StageTracker, spill: sqlite3.Connection,
+                     sort_by, limit: Optional[int], file_path: str) -> None:
+        """Write the spilled rows to the CSV in sort_by order"""
+        if not spill.execute("SELECT 1 FROM sqlite_master WHERE name = 'report'").fetchone():
+            pd.DataFrame().to_csv(file_path, index=False)
+            return
+
+        columns = [sort_by] if isinstance(sort_by, str) else list(sort_by)
+        ascending = self.parameters.get('sort_ascending', True)
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(columns)
+        # Missing values last, as sort_values() puts them
+        order = ', '.join(
+            f'"{column}" IS NULL, "{column}" {"ASC" if asc else "DESC"}'
+            for column, asc in zip((c.replace('"', '""') for c in columns), ascending)
+        )
+        sql = f"SELECT * FROM report ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        frames = pd.read_sql_query(sql, spill, chunksize=settings.REPORT_CHUNK_ROWS)
+        # SQLite sorts before it returns the first row
+        with stages.stage('sort'):
+            frame = next(frames, None)
+        header = True
+        while frame is not None:
+            with stages.stage('save'):
+                frame.to_csv(file_path, index=False, mode='w' if header else 'a', header=header)
+                header = False
+                frame = next(frames, None)
+
+    def _save_stage_metrics(self, stages: StageTracker) -> None:
+        self.report.stage_metrics = stages.to_dict()
+        try:
+            self.report.save()
         except Exception as e:
-            raise Exception(f"Error generating report: {str(e)}")
+            db.session.rollback()
+            logger.error(f"Failed to save stage metrics of report {self.report.id}: {e}")
 
     def _generate_file_path(self) -> str:
         """Generate a unique file path for the report"""
@@ -78,7 +290,6 @@ class BaseReportGenerator(ABC):
     def _save_report(self, df: pd.DataFrame, file_path: str) -> None:
         """Save the report to a file"""
         # Create directory if it doesn't exist
-        import os
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
         # Save based on file extension
@@ -99,3 +310,9 @@ class BaseReportGenerator(ABC):
         """Calculate a custom metric"""
         # This is a placeholder - actual implementation would need to parse and evaluate the formula
         return pd.Series(0, index=df.index)
+
+
+def _drain(frames: deque) -> Iterator[pd.DataFrame]:
+    """Yield and drop the frames, so each is freed once processed"""
+    while frames:
+        yield frames.popleft()
@@ -10,6 +10,10 @@ class CampaignReportGenerator(BaseReportGenerator):
 
     def get_data(self) -> pd.DataFrame:
         """Get campaign performance data"""
+        return self.to_frame(self.query().all())
+
+    def query(self):
+        """Query the daily statistics of the report's campaigns"""
         # Get campaign IDs from parameters
         campaign_ids = self.parameters.get('campaign_ids', [])
 
@@ -22,11 +26,13 @@ class CampaignReportGenerator(BaseReportGenerator):
         if campaign_ids:
             query = query.filter(DailyStatistic.campaign_id.in_(campaign_ids))
 
-        stats = query.all()
+        return query
 
+    def to_frame(self, rows: list) -> pd.DataFrame:
+        """Convert daily statistics to a DataFrame"""
         # Convert to DataFrame
         data = []
-        for stat in stats:
+        for stat in rows:
             data.append({
                 'date': stat.date,
                 'campaign_id': stat.campaign_id,
@@ -10,6 +10,10 @@ class CreativeReportGenerator(BaseReportGenerator):
 
     def get_data(self) -> pd.DataFrame:
         """Get creative performance data"""
+        return self.to_frame(self.query().all())
+
+    def query(self):
+        """Query the daily statistics of the report's creatives"""
         # Get creative IDs from parameters
         creative_ids = self.parameters.get('creative_ids', [])
 
@@ -22,11 +26,13 @@ class CreativeReportGenerator(BaseReportGenerator):
         if creative_ids:
             query = query.filter(DailyStatistic.creative_id.in_(creative_ids))
 
-        stats = query.all()
+        return query
 
+    def to_frame(self, rows: list) -> pd.DataFrame:
+        """Convert daily statistics to a DataFrame"""
         # Convert to DataFrame
         data = []
-        for stat in stats:
+        for stat in rows:
             data.append({
                 'date': stat.date,
                 'creative_id': stat.creative_id,
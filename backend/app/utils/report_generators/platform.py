@@ -0,0 +1,63 @@
+import pandas as pd
+from typing import Dict, Any, List
+from app.models.report.report import PlatformDailyStatistic
+from .base import BaseReportGenerator
+
+
+class PlatformReportGenerator(BaseReportGenerator):
+    """Report generator for platform-wide performance reports
+
+    Reads the pre-aggregated PlatformDailyStatistic table, so a report costs
+    one row per day regardless of how many advertisers are on the platform.
+    """
+
+    def get_data(self) -> pd.DataFrame:
+        """Get platform daily totals"""
+        stats = PlatformDailyStatistic.get_stats(self.start_date, self.end_date)
+
+        # Convert to DataFrame
+        data = []
+        for stat in stats:
+            data.append({
+                'date': stat.date,
+                'impressions': stat.impressions,
+                'clicks': stat.clicks,
+                'conversions': stat.conversions,
+                'spend': stat.spend,
+                'revenue': stat.revenue,
+                'active_advertisers': stat.active_advertisers
+            })
+
+        return pd.DataFrame(data, columns=[
+            'date', 'impressions', 'clicks', 'conversions',
+            'spend', 'revenue', 'active_advertisers'
+        ])
+
+    def apply_filters(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Apply filters to the platform data"""
+        filters = self.parameters.get('filters', {})
+
+        for field, value in filters.items():
+            if field in df.columns:
+                if isinstance(value, list):
+                    df = df[df[field].isin(value)]
+                else:
+                    df = df[df[field] == value]
+
+        return df
+
+    def calculate_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculate platform metrics"""
+        impressions = df['impressions'].where(df['impressions'] > 0)
+        clicks = df['clicks'].where(df['clicks'] > 0)
+        spend = df['spend'].where(df['spend'] > 0)
+        revenue = df['revenue'].where(df['revenue'] != 0)
+
+        df['ctr'] = (df['clicks'] / impressions).fillna(0.0)
+        df['cpc'] = (df['spend'] / clicks).fillna(0.0)
+        df['cpm'] = (df['spend'] * 1000 / impressions).fillna(0.0)
+        df['profit'] = df['revenue'] - df['spend']
+        df['margin'] = (df['profit'] / revenue).fillna(0.0)
+        df['roi'] = (df['profit'] / spend).fillna(0.0)
+
+        return df
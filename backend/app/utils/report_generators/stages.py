@@ -0,0 +1,145 @@
+import mmap
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator
+
+MB = 1024 * 1024
+
+# Report jobs tracing allocations; tracemalloc is per process, so it runs
+# while any of them does (and is left alone if something else started it)
+_tracing_jobs = 0
+_owns_tracing = False
+_tracing_lock = threading.Lock()
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def reset_rss_peak() -> bool:
+    """Restart the kernel's RSS high-water mark (VmHWM) at the current RSS"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def rss_peak_bytes() -> int:
+    """Highest RSS since the last reset_rss_peak()"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+class StageTracker:
+    """
+    Wall time and memory of each stage of a report job
+
+    A stage run several times (once per chunk) accumulates its time and RSS
+    growth and keeps its highest peaks. rss_peak_mb is how far RSS rose
+    above its level when the stage started (from the kernel's high-water
+    mark, on Linux); with trace_memory, peak_mb is the same for the Python
+    allocations traced by tracemalloc, which is precise but makes
+    allocation-heavy stages several times slower. Both are per process, so
+    jobs running side by side show up in each other's peaks.
+    """
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.mode = 'in_memory'
+        self.rows = 0
+        self.chunks = 0
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.rss_start = rss_bytes()
+        self.rss_peak = self.rss_start
+
+    def __enter__(self) -> "StageTracker":
+        global _tracing_jobs, _owns_tracing
+        if self.trace_memory:
+            with _tracing_lock:
+                if not _tracing_jobs:
+                    _owns_tracing = not tracemalloc.is_tracing()
+                    if _owns_tracing:
+                        tracemalloc.start(1)
+                _tracing_jobs += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _tracing_jobs
+        if self.trace_memory:
+            with _tracing_lock:
+                _tracing_jobs -= 1
+                if not _tracing_jobs and _owns_tracing:
+                    tracemalloc.stop()
+
+    def rss_growth(self) -> int:
+        """Bytes the process grew by since the job started"""
+        return rss_bytes() - self.rss_start
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        traced = tracemalloc.is_tracing()
+        if traced:
+            tracemalloc.reset_peak()
+            traced_start = tracemalloc.get_traced_memory()[0]
+        rss_start = rss_bytes()
+        peak_reset = reset_rss_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            rss_end = rss_bytes()
+            self.rss_peak = max(self.rss_peak, rss_end)
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'rss_delta_mb': 0.0}
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['rss_delta_mb'] += (rss_end - rss_start) / MB
+            if peak_reset:
+                rss_peak = rss_peak_bytes()
+                self.rss_peak = max(self.rss_peak, rss_peak)
+                stats['rss_peak_mb'] = max(stats.get('rss_peak_mb', 0.0), (rss_peak - rss_start) / MB)
+            if traced:
+                peak = (tracemalloc.get_traced_memory()[1] - traced_start) / MB
+                stats['peak_mb'] = max(stats.get('peak_mb', 0.0), peak)
+
+    def timed(self, name: str, frames: Iterable) -> Iterator:
+        """Yield the frames of a chunked source, timing each fetch as stage name"""
+        frames = iter(frames)
+        while True:
+            with self.stage(name):
+                frame = next(frames, None)
+            if frame is None:
+                return
+            self.rows += len(frame)
+            self.chunks += 1
+            yield frame
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'rss_start_mb': round(self.rss_start / MB, 1),
+            'rss_peak_mb': round(self.rss_peak / MB, 1),
+            'stages': {
+                name: {key: round(value, 4 if key == 'seconds' else 1) for key, value in stats.items()}
+                for name, stats in self.stages.items()
+            }
+        }
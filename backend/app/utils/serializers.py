@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, DateTime
+from sqlalchemy import inspect as sa_inspect
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+Serializer = Callable[[Any], Dict[str, Any]]
+
+# Serializers of every field of a model: one per model
+_serializers: Dict[type, Serializer] = {}
+# Serializers of field subsets, most recently used last. Clients pick the
+# subsets (?fields=), so only the SUBSET_CACHE_SIZE most recent are kept
+_subset_serializers: "OrderedDict[Tuple[type, Tuple[str, ...]], Serializer]" = OrderedDict()
+SUBSET_CACHE_SIZE = 256
+_lock = threading.Lock()
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _value_expression(source: str, column_type) -> str:
+    """Source for converting one attribute value according to its column type"""
+    if isinstance(column_type, (DateTime, Date)):
+        return f"_iso({source})"
+    return source
+
+
+def serializable_fields(model) -> Tuple[str, ...]:
+    """Attribute names a model serializes by default"""
+    exclude = set(getattr(model, '__serialize_exclude__', ()))
+    return tuple(
+        prop.key for prop in sa_inspect(model).column_attrs
+        if prop.key not in exclude
+    )
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when a sparse fieldset names unknown fields"""
+
+
+def resolve_fields(model, raw: Optional[str], default: Optional[Sequence[str]] = None) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a ``fields=a,b,c`` query parameter against a model
+
+    Returns the requested fields in model column order, ``default`` when the
+    parameter is absent, or None meaning "all serializable fields".
+    """
+    if not raw:
+        return tuple(default) if default is not None else None
+
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    available = serializable_fields(model)
+    unknown = requested.difference(available)
+    if unknown:
+        raise InvalidFieldsError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    return tuple(name for name in available if name in requested)
+
+
+def compile_serializer(model, fields: Optional[Sequence[str]] = None) -> Serializer:
+    """
+    Generate a serializer function for a model
+
+    The generated code reads each attribute straight from the instance
+    ``__dict__`` and applies a per-type converter, avoiding column reflection
+    and isinstance checks per row. Instances with unloaded or expired
+    attributes fall back to regular attribute access, which loads them.
+    """
+    column_attrs = {prop.key: prop for prop in sa_inspect(model).column_attrs}
+    keys = tuple(fields) if fields is not None else serializable_fields(model)
+
+    fast_items = []
+    slow_items = []
+    for key in keys:
+        column_type = column_attrs[key].columns[0].type
+        fast_items.append(f"{key!r}: {_value_expression(f'd[{key!r}]', column_type)}")
+        slow_items.append(f"{key!r}: {_value_expression(f'obj.{key}', column_type)}")
+
+    source = "\n".join([
+        "def serialize(obj):",
+        "    d = obj.__dict__",
+        "    try:",
+        "        return {" + ", ".join(fast_items) + "}",
+        "    except KeyError:",
+        "        return {" + ", ".join(slow_items) + "}",
+    ])
+
+    namespace = {"_iso": _iso}
+    exec(compile(source, f"<serializer {model.__name__}>", "exec"), namespace)
+    return namespace["serialize"]
+
+
+def get_serializer(model, fields: Optional[Sequence[str]] = None) -> Serializer:
+    """Get the cached serializer for a model and optional field subset"""
+    if fields is None:
+        serializer = _serializers.get(model)
+        if serializer is None:
+            with _lock:
+                serializer = _serializers.get(model)
+                if serializer is None:
+                    serializer = _serializers[model] = compile_serializer(model)
+        return serializer
+
+    key = (model, tuple(fields))
+    with _lock:
+        serializer = _subset_serializers.get(key)
+        if serializer is not None:
+            _subset_serializers.move_to_end(key)
+            return serializer
+
+    serializer = compile_serializer(model, key[1])
+    with _lock:
+        _subset_serializers[key] = serializer
+        while len(_subset_serializers) > SUBSET_CACHE_SIZE:
+            _subset_serializers.popitem(last=False)
+    return serializer
+
+
+def compile_all(base) -> int:
+    """Compile default serializers for every mapped subclass of ``base``"""
+    count = 0
+    for mapper in base.registry.mappers:
+        model = mapper.class_
+        # Abstract bases are never mapped, and __abstract__ is inherited, so
+        # checking it here would skip every model
+        if issubclass(model, base):
+            get_serializer(model)
+            count += 1
+    return count
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson when it is installed"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._orjson_options()
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+    def _orjson_options(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
@@ -0,0 +1,276 @@
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.campaign.campaign import Campaign
+from app.models.creative.creative import Creative
+from app.models.report.report import DailyStatistic, ServingCounterCheckpoint
+from app.utils.model_cache import model_cache
+from app.utils.shared_counters import SharedCounterArray, from_micros, to_micros
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('impressions', 'clicks', 'conversions', 'spend')
+
+
+class ServingCounters:
+    """
+    Node-wide delivery counters for campaigns and creatives
+
+    Every worker process increments its own slot of a shared memory array
+    indexed by campaign/creative id, so serving never waits on other workers.
+    Pacing and frequency reads sum the slots. One process per node, elected
+    by file lock, aggregates the slots every ``flush_interval`` seconds. It
+    adds creative deltas to the Creative metric columns and campaign deltas
+    to today's campaign-level DailyStatistic rows. Spend is stored in
+    micro-units.
+
+    Each flush is a numbered batch staged in shared memory, and the same
+    database transaction records the batch number in a
+    ServingCounterCheckpoint row. If the aggregator dies between the commit
+    and marking the batch flushed, the next aggregator finds the
+    checkpoint and marks the batch flushed instead of adding it again.
+
+    Nothing calls record() yet: the tree has no bid or serving endpoint, so
+    this provides the counters for that path to call, as BalanceGuard does
+    for spend caps. Until then no aggregator thread is started.
+    """
+
+    def __init__(self, name: str, capacity: int = 65536, workers: int = 16, flush_interval: float = 5.0):
+        self.campaigns = SharedCounterArray(f"{name}_campaign", FIELDS, capacity=capacity, workers=workers)
+        self.creatives = SharedCounterArray(f"{name}_creative", FIELDS, capacity=capacity, workers=workers)
+        self.flush_interval = flush_interval
+        self._aggregator_lock_path = os.path.join(tempfile.gettempdir(), f"{name}.aggregator")
+        self._aggregator_file = None
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def record(
+        self,
+        campaign_id: int,
+        creative_id: int,
+        impressions: int = 0,
+        clicks: int = 0,
+        conversions: int = 0,
+        spend: float = 0.0
+    ) -> None:
+        """Count delivery events for a creative and its campaign"""
+        self._ensure_started()
+        deltas = {
+            'impressions': impressions,
+            'clicks': clicks,
+            'conversions': conversions,
+            'spend': to_micros(spend)
+        }
+        self.campaigns.increment_many(campaign_id, deltas)
+        self.creatives.increment_many(creative_id, deltas)
+
+    def campaign_spend(self, campaign_id: int) -> float:
+        """Spend counted on this node for a campaign since the counters were created"""
+        return from_micros(self.campaigns.total(campaign_id, 'spend'))
+
+    def campaign_impressions(self, campaign_id: int) -> int:
+        """Impressions counted on this node for a campaign since the counters were created"""
+        return self.campaigns.total(campaign_id, 'impressions')
+
+    def flush(self) -> int:
+        """
+        Write counter deltas to the database if this process is the aggregator
+
+        Returns:
+            Number of campaign and creative rows updated
+        """
+        if not self._is_aggregator():
+            return 0
+
+        with self._app.app_context():
+            return self._flush_creatives() + self._flush_campaigns()
+
+    def _flush_creatives(self) -> int:
+        batch, indexes, deltas = self._collect(self.creatives)
+        if batch is None:
+            return 0
+
+        table = Creative.__table__
+        try:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('creative_id')).values(
+                    impressions=table.c.impressions + bindparam('d_impressions'),
+                    clicks=table.c.clicks + bindparam('d_clicks'),
+                    conversions=table.c.conversions + bindparam('d_conversions'),
+                    spend=table.c.spend + bindparam('d_spend')
+                ),
+                [self._params('creative_id', index, delta) for index, delta in zip(indexes, deltas)]
+            )
+            self._checkpoint(batch)
+            model_cache.mark_stale(Creative, [int(index) for index in indexes])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to flush creative counters: {e}")
+            return 0
+
+        self.creatives.mark_flushed(batch)
+        return len(indexes)
+
+    def _flush_campaigns(self) -> int:
+        batch, indexes, deltas = self._collect(self.campaigns)
+        if batch is None:
+            return 0
+
+        today = datetime.utcnow().date()
+        table = DailyStatistic.__table__
+        campaign_ids = [int(index) for index in indexes]
+        try:
+            existing = dict(db.session.execute(
+                select(table.c.campaign_id, table.c.id).where(
+                    table.c.date == today,
+                    table.c.campaign_id.in_(campaign_ids),
+                    table.c.creative_id.is_(None)
+                )
+            ).all())
+            advertisers = dict(db.session.execute(
+                select(Campaign.id, Campaign.advertiser_id).where(
+                    Campaign.id.in_([cid for cid in campaign_ids if cid not in existing])
+                )
+            ).all())
+
+            updates = []
+            inserts = []
+            for index, delta in zip(indexes, deltas):
+                campaign_id = int(index)
+                if campaign_id in existing:
+                    updates.append(self._params('stat_id', existing[campaign_id], delta))
+                elif campaign_id in advertisers:
+                    params = self._params('campaign_id', campaign_id, delta)
+                    inserts.append({
+                        'date': today,
+                        'advertiser_id': advertisers[campaign_id],
+                        'campaign_id': campaign_id,
+                        'impressions': params['d_impressions'],
+                        'clicks': params['d_clicks'],
+                        'conversions': params['d_conversions'],
+                        'spend': params['d_spend']
+                    })
+                else:
+                    logger.warning(f"Dropping counters for unknown campaign {campaign_id}")
+
+            if updates:
+                db.session.execute(
+                    update(table).where(table.c.id == bindparam('stat_id')).values(
+                        impressions=table.c.impressions + bindparam('d_impressions'),
+                        clicks=table.c.clicks + bindparam('d_clicks'),
+                        conversions=table.c.conversions + bindparam('d_conversions'),
+                        spend=table.c.spend + bindparam('d_spend')
+                    ),
+                    updates
+                )
+            if inserts:
+                db.session.execute(insert(DailyStatistic), inserts)
+            self._checkpoint(batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to flush campaign counters: {e}")
+            return 0
+
+        self.campaigns.mark_flushed(batch)
+        return len(indexes)
+
+    @staticmethod
+    def _collect(counters: SharedCounterArray):
+        """
+        Finish a batch an earlier flush left staged, then stage the next one
+
+        A staged batch whose checkpoint committed is marked flushed; one
+        whose checkpoint didn't never reached the database, so its counts
+        are collected again.
+        """
+        staged = counters.staged_batch()
+        if staged is not None:
+            epoch, sequence = staged
+            committed = db.session.execute(
+                select(ServingCounterCheckpoint.sequence).where(ServingCounterCheckpoint.epoch == epoch)
+            ).scalar()
+            db.session.rollback()
+            if committed is not None and committed >= sequence:
+                counters.mark_flushed(staged)
+        return counters.collect()
+
+    @staticmethod
+    def _checkpoint(batch) -> None:
+        """Record a batch as committed, in the transaction that applies it"""
+        epoch, sequence = batch
+        table = ServingCounterCheckpoint.__table__
+        updated = db.session.execute(
+            update(table).where(table.c.epoch == epoch).values(sequence=sequence)
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(ServingCounterCheckpoint), [{'epoch': epoch, 'sequence': sequence}])
+
+    @staticmethod
+    def _params(key: str, value, delta):
+        return {
+            key: int(value),
+            'd_impressions': int(delta[0]),
+            'd_clicks': int(delta[1]),
+            'd_conversions': int(delta[2]),
+            'd_spend': from_micros(int(delta[3]))
+        }
+
+    def _is_aggregator(self) -> bool:
+        """Hold the node's aggregator lock, acquiring it if its holder has exited"""
+        if self._aggregator_file is not None:
+            return True
+
+        lock_file = open(self._aggregator_lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+
+        self._aggregator_file = lock_file
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child must not think it inherited the parent's aggregator role
+            self._aggregator_file = None
+            self._app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, name='serving-counters', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Serving counter flush failed: {e}")
+
+
+serving_counters = ServingCounters(
+    name=settings.SERVING_COUNTERS_SHM_NAME,
+    capacity=settings.SERVING_COUNTERS_CAPACITY,
+    workers=settings.SERVING_COUNTERS_WORKERS,
+    flush_interval=settings.SERVING_COUNTERS_FLUSH_INTERVAL
+)
@@ -0,0 +1,367 @@
+import bisect
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.campaign.campaign import Campaign
+from app.models.creative.creative import Creative
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'DSPSNAP1'
+VERSION = 1
+
+# magic, version, generated_at, campaign count, creative count,
+# then byte offsets of the campaign ids, campaign records, creative records and string table
+HEADER = struct.Struct('<8sIdIIQQQQ')
+
+# Field kinds: q int64, d float64 (NaN for NULL), i int32 (-1 for NULL),
+# s string and j JSON, both stored as (offset, length) into the string table
+CAMPAIGN_FIELDS = (
+    ('id', 'q'), ('advertiser_id', 'q'), ('name', 's'), ('bid_strategy', 's'),
+    ('bid_amount', 'd'), ('daily_budget', 'd'), ('total_budget', 'd'),
+    ('start_at', 'd'), ('end_at', 'd'), ('frequency_cap', 'i'), ('frequency_period', 's'),
+    ('targeting', 'j'), ('creatives_start', 'q'), ('creatives_count', 'q'),
+)
+CREATIVE_FIELDS = (
+    ('id', 'q'), ('campaign_id', 'q'), ('advertiser_id', 'q'), ('name', 's'),
+    ('type', 's'), ('format', 's'), ('file_path', 's'), ('landing_url', 's'),
+    ('click_tracking_url', 's'), ('impression_tracking_url', 's'),
+    ('duration', 'i'), ('targeting', 'j'),
+)
+
+
+class _Layout:
+    """Fixed-size record layout with one precompiled struct per field"""
+
+    def __init__(self, fields: Sequence[Tuple[str, str]]):
+        self.fields = tuple(fields)
+        codes = ''.join('II' if kind in 'sj' else kind for _, kind in fields)
+        self.record = struct.Struct('<' + codes)
+        self.size = self.record.size
+        self.accessors: Dict[str, Tuple[struct.Struct, int, str]] = {}
+
+        offset = 0
+        for name, kind in fields:
+            field_struct = struct.Struct('<II' if kind in 'sj' else '<' + kind)
+            self.accessors[name] = (field_struct, offset, kind)
+            offset += field_struct.size
+
+
+CAMPAIGN_LAYOUT = _Layout(CAMPAIGN_FIELDS)
+CREATIVE_LAYOUT = _Layout(CREATIVE_FIELDS)
+
+
+class SnapshotRecord:
+    """
+    Read-only view of one record inside a mapped snapshot
+
+    Attributes are decoded from the mapping when accessed; nothing is copied
+    up front.
+    """
+    __slots__ = ('_buffer', '_offset', '_layout', '_strings')
+
+    def __init__(self, buffer, offset: int, layout: _Layout, strings: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._layout = layout
+        self._strings = strings
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            field_struct, field_offset, kind = self._layout.accessors[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+        values = field_struct.unpack_from(self._buffer, self._offset + field_offset)
+        if kind in 'sj':
+            offset, length = values
+            if length == 0:
+                return None
+            start = self._strings + offset
+            text = bytes(self._buffer[start:start + length]).decode('utf-8')
+            return json.loads(text) if kind == 'j' else text
+
+        value = values[0]
+        if kind == 'd' and math.isnan(value):
+            return None
+        if kind == 'i' and value == -1:
+            return None
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name, _ in self._layout.fields}
+
+
+class ServingSnapshot:
+    """
+    Memory-mapped, read-only view of the serving snapshot file
+
+    Every worker maps the same file, so the snapshot is held once in the page
+    cache however many workers there are. Lookups unpack fields straight from
+    the mapping. At most every ``check_interval`` seconds the file is
+    stat()ed, and a file swapped in by the builder is mapped in its place.
+    Views of the previous mapping stay valid. Opening a snapshot needs no
+    database access. The app factory maps it, so with a preloaded app the
+    workers inherit the master's mapping and serve from it as soon as they
+    fork.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._identity: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._state = None
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def open(self) -> bool:
+        """Map the snapshot file now rather than on first lookup; False if there is none yet"""
+        with self._lock:
+            self._checked_at = 0.0
+        return self._current() is not None
+
+    @property
+    def generated_at(self) -> Optional[float]:
+        state = self._current()
+        return state['generated_at'] if state else None
+
+    def campaign(self, campaign_id: int) -> Optional[SnapshotRecord]:
+        """Look up an active campaign by id (binary search over the id column)"""
+        state = self._current()
+        if state is None:
+            return None
+        return self._find_campaign(state, campaign_id)
+
+    def campaigns(self) -> Iterator[SnapshotRecord]:
+        """Iterate over every active campaign, ordered by id"""
+        state = self._current()
+        if state is None:
+            return
+        for index in range(state['campaign_count']):
+            yield self._campaign_at(state, index)
+
+    def creatives(self, campaign_id: int) -> List[SnapshotRecord]:
+        """Active creatives of an active campaign"""
+        state = self._current()
+        campaign = self._find_campaign(state, campaign_id) if state is not None else None
+        if campaign is None:
+            return []
+
+        start = campaign.creatives_start
+        return [
+            SnapshotRecord(
+                state['buffer'],
+                state['creatives_offset'] + (start + index) * CREATIVE_LAYOUT.size,
+                CREATIVE_LAYOUT,
+                state['strings_offset']
+            )
+            for index in range(campaign.creatives_count)
+        ]
+
+    def _find_campaign(self, state, campaign_id: int) -> Optional[SnapshotRecord]:
+        ids = state['campaign_ids']
+        index = bisect.bisect_left(ids, campaign_id)
+        if index == len(ids) or ids[index] != campaign_id:
+            return None
+        return self._campaign_at(state, index)
+
+    def _campaign_at(self, state, index: int) -> SnapshotRecord:
+        return SnapshotRecord(
+            state['buffer'],
+            state['campaigns_offset'] + index * CAMPAIGN_LAYOUT.size,
+            CAMPAIGN_LAYOUT,
+            state['strings_offset']
+        )
+
+    def _current(self):
+        now = time.monotonic()
+        if self._state is not None and now - self._checked_at < self.check_interval:
+            return self._state
+
+        with self._lock:
+            if self._state is not None and now - self._checked_at < self.check_interval:
+                return self._state
+            self._checked_at = now
+
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self._state
+
+            identity = (stat.st_ino, stat.st_mtime_ns)
+            if identity != self._identity:
+                self._state = self._map()
+                self._identity = identity
+            return self._state
+
+    def _reset_lock(self) -> None:
+        # The mapping is inherited as is; only the lock may have been held at fork
+        self._lock = threading.Lock()
+
+    def _map(self):
+        with open(self.path, 'rb') as snapshot_file:
+            buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, generated_at, campaign_count, creative_count,
+         ids_offset, campaigns_offset, creatives_offset, strings_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} serving snapshot")
+
+        view = memoryview(buffer)
+        return {
+            'buffer': view,
+            'generated_at': generated_at,
+            'campaign_count': campaign_count,
+            'creative_count': creative_count,
+            'campaign_ids': view[ids_offset:ids_offset + campaign_count * 8].cast('q'),
+            'campaigns_offset': campaigns_offset,
+            'creatives_offset': creatives_offset,
+            'strings_offset': strings_offset
+        }
+
+
+class _StringTable:
+    """Deduplicating string table for the snapshot writer"""
+
+    def __init__(self):
+        self._offsets: Dict[bytes, int] = {}
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, value: Optional[str]) -> Tuple[int, int]:
+        if value is None or value == '':
+            return 0, 0
+        data = value.encode('utf-8')
+        offset = self._offsets.get(data)
+        if offset is None:
+            offset = self.size
+            self._offsets[data] = offset
+            self._chunks.append(data)
+            self.size += len(data)
+        return offset, len(data)
+
+    def getvalue(self) -> bytes:
+        return b''.join(self._chunks)
+
+
+def _pack(layout: _Layout, row: Dict[str, Any], strings: _StringTable) -> bytes:
+    values = []
+    for name, kind in layout.fields:
+        value = row.get(name)
+        if kind == 's':
+            values.extend(strings.add(value))
+        elif kind == 'j':
+            values.extend(strings.add(json.dumps(value, separators=(',', ':')) if value is not None else None))
+        elif kind == 'd':
+            values.append(float('nan') if value is None else float(value))
+        elif kind == 'i':
+            values.append(-1 if value is None else int(value))
+        else:
+            values.append(int(value))
+    return layout.record.pack(*values)
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def build_snapshot(path: str) -> Dict[str, int]:
+    """
+    Write the serving snapshot for active campaigns and creatives to ``path``
+
+    The file is written beside ``path`` and atomically renamed over it, so
+    readers only ever map a complete snapshot. Needs an app context.
+
+    Returns:
+        Counts of campaigns and creatives written
+    """
+    campaign_columns = [getattr(Campaign, name) for name, _ in CAMPAIGN_FIELDS
+                        if name not in ('start_at', 'end_at', 'creatives_start', 'creatives_count')]
+    campaign_rows = db.session.execute(
+        select(*campaign_columns, Campaign.start_date, Campaign.end_date).where(
+            Campaign.status == 'active',
+            Campaign.is_deleted.is_(False)
+        ).order_by(Campaign.id)
+    ).mappings().all()
+
+    creative_columns = [getattr(Creative, name) for name, _ in CREATIVE_FIELDS]
+    creatives_by_campaign: Dict[int, List[Dict[str, Any]]] = {}
+    for row in db.session.execute(
+        select(*creative_columns).where(
+            Creative.status == 'active',
+            Creative.is_deleted.is_(False),
+            Creative.campaign_id.in_(select(Campaign.id).where(
+                Campaign.status == 'active',
+                Campaign.is_deleted.is_(False)
+            ))
+        ).order_by(Creative.campaign_id, Creative.id)
+    ).mappings():
+        creatives_by_campaign.setdefault(row['campaign_id'], []).append(dict(row))
+    db.session.rollback()
+
+    strings = _StringTable()
+    campaign_records = []
+    creative_records = []
+    for row in campaign_rows:
+        creatives = creatives_by_campaign.get(row['id'], [])
+        campaign = dict(row)
+        campaign['start_at'] = _timestamp(row['start_date'])
+        campaign['end_at'] = _timestamp(row['end_date'])
+        campaign['creatives_start'] = len(creative_records)
+        campaign['creatives_count'] = len(creatives)
+        campaign_records.append(_pack(CAMPAIGN_LAYOUT, campaign, strings))
+        creative_records.extend(_pack(CREATIVE_LAYOUT, creative, strings) for creative in creatives)
+
+    ids = struct.pack(f'<{len(campaign_rows)}q', *[row['id'] for row in campaign_rows])
+    ids_offset = HEADER.size
+    campaigns_offset = ids_offset + len(ids)
+    creatives_offset = campaigns_offset + len(campaign_records) * CAMPAIGN_LAYOUT.size
+    strings_offset = creatives_offset + len(creative_records) * CREATIVE_LAYOUT.size
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(
+            MAGIC, VERSION, time.time(), len(campaign_records), len(creative_records),
+            ids_offset, campaigns_offset, creatives_offset, strings_offset
+        ))
+        snapshot_file.write(ids)
+        snapshot_file.writelines(campaign_records)
+        snapshot_file.writelines(creative_records)
+        snapshot_file.write(strings.getvalue())
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temp_path, path)
+
+    return {"campaigns": len(campaign_records), "creatives": len(creative_records)}
+
+
+serving_snapshot = ServingSnapshot(
+    path=settings.SERVING_SNAPSHOT_PATH,
+    check_interval=settings.SERVING_SNAPSHOT_CHECK_INTERVAL
+)
+
+
+def init_app(app) -> None:
+    """Map the serving snapshot at startup; a missing file is picked up once the builder writes it"""
+    try:
+        mapped = serving_snapshot.open()
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not map serving snapshot {serving_snapshot.path}: {e}")
+        return
+    if not mapped:
+        logger.warning(f"No serving snapshot at {serving_snapshot.path}; run scripts/build_serving_snapshot.py")
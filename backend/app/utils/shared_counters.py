@@ -0,0 +1,377 @@
+import atexit
+import fcntl
+import operator
+import os
+import secrets
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+INT64_SIZE = 8
+
+
+class SharedCounterTable:
+    """
+    Fixed-capacity table of int64 counters keyed by id, shared between processes
+
+    Rows live in a named POSIX shared memory segment so every worker process
+    on the node sees the same values. Rows are found by open addressing on a
+    key column (key 0 marks a free row). Writes take a striped lock: a thread
+    lock plus an fcntl byte-range lock on a side file. That makes
+    read-modify-write updates atomic across threads and processes, while
+    plain reads need no lock at all.
+    """
+
+    def __init__(self, name: str, fields: Sequence[str], capacity: int = 65536, stripes: int = 256):
+        self.name = name
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.stripes = stripes
+        self._width = len(self.fields) + 1
+        self._offsets = {field: index + 1 for index, field in enumerate(self.fields)}
+        self._rows: Dict[int, int] = {}
+        self._thread_locks = [threading.Lock() for _ in range(stripes + 1)]
+        self._open_lock = threading.Lock()
+        self._shm: Optional[SharedMemory] = None
+        self._values = None
+        self._lock_fd: Optional[int] = None
+
+    def row(self, key: int, create: bool = True) -> Optional[int]:
+        """Row index for a key, claiming a free row if ``create`` is set"""
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+
+        self._ensure_open()
+        if key <= 0:
+            raise ValueError("Shared counter keys must be positive")
+
+        row = self._probe(key)
+        if row is None and create:
+            # Claiming a row is serialised by the extra stripe past the data stripes
+            with self._locked(self.stripes):
+                row = self._probe(key)
+                if row is None:
+                    row = self._claim(key)
+
+        if row is not None:
+            self._rows[key] = row
+        return row
+
+    def get(self, row: int, field: str) -> int:
+        """Read one counter without locking"""
+        return self._values[row * self._width + self._offsets[field]]
+
+    def add(self, row: int, field: str, delta: int) -> int:
+        """Atomically add to a counter and return the new value"""
+        index = row * self._width + self._offsets[field]
+        with self._locked(row % self.stripes):
+            value = self._values[index] + delta
+            self._values[index] = value
+        return value
+
+    def set(self, row: int, field: str, value: int) -> None:
+        """Overwrite a counter"""
+        with self._locked(row % self.stripes):
+            self._values[row * self._width + self._offsets[field]] = value
+
+    def transact(self, row: int, fn: Callable[[Dict[str, int]], T]) -> T:
+        """
+        Run ``fn`` on a row's counters under the row's lock
+
+        ``fn`` receives the counters as a dict; changes it makes to the dict
+        are written back before the lock is released.
+        """
+        start = row * self._width + 1
+        with self._locked(row % self.stripes):
+            values = dict(zip(self.fields, self._values[start:start + len(self.fields)]))
+            result = fn(values)
+            for offset, field in enumerate(self.fields):
+                self._values[start + offset] = values[field]
+        return result
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over (key, row) for every claimed row"""
+        self._ensure_open()
+        for row in range(self.capacity):
+            key = self._values[row * self._width]
+            if key:
+                yield key, row
+
+    def unlink(self) -> None:
+        """Remove the shared memory segment, e.g. when retiring the node"""
+        self._ensure_open()
+        _unlink_segment(self._shm, self._values)
+        self._shm = self._values = None
+        self._rows.clear()
+
+    def _probe(self, key: int) -> Optional[int]:
+        row = key % self.capacity
+        for _ in range(self.capacity):
+            current = self._values[row * self._width]
+            if current == key:
+                return row
+            if current == 0:
+                return None
+            row = (row + 1) % self.capacity
+        return None
+
+    def _claim(self, key: int) -> int:
+        row = key % self.capacity
+        for _ in range(self.capacity):
+            if self._values[row * self._width] == 0:
+                self._values[row * self._width] = key
+                return row
+            row = (row + 1) % self.capacity
+        raise RuntimeError(f"Shared counter table {self.name} is full")
+
+    @contextmanager
+    def _locked(self, stripe: int):
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _ensure_open(self) -> None:
+        if self._values is not None:
+            return
+
+        with self._open_lock:
+            if self._values is not None:
+                return
+
+            size = self.capacity * self._width * INT64_SIZE
+            try:
+                shm = SharedMemory(name=self.name, create=True, size=size)
+            except FileExistsError:
+                shm = SharedMemory(name=self.name)
+                if shm.size < size:
+                    shm.close()
+                    raise ValueError(f"Shared memory segment {self.name} is smaller than configured")
+
+            # The segment outlives any single worker; keep the resource tracker
+            # from unlinking it when the process that attached it exits
+            resource_tracker.unregister(shm._name, 'shared_memory')
+
+            lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+            self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._shm = shm
+            self._values = shm.buf.cast('q')
+            _close_at_exit(shm, self._values)
+
+
+class SharedCounterArray:
+    """
+    Per-worker int64 counter arrays indexed by dense id, shared between processes
+
+    Each worker process claims its own slot on first use (a byte-range lock
+    held for the life of the process), so increments are single-writer
+    updates that never wait on another process. Node-wide values are the sum
+    over worker slots. A slot freed by a dead worker is taken over, counts
+    included, by the next worker to start. Two trailing regions record the
+    totals already flushed and the totals of the batch being flushed, so
+    whichever process aggregates can compute exact deltas and, after a
+    crash, finish or redo the batch it finds staged.
+
+    A header after the regions holds the segment's epoch (a random id drawn
+    when the segment is created) and the sequence numbers of the last
+    flushed and last staged batch.
+    """
+
+    def __init__(self, name: str, fields: Sequence[str], capacity: int = 65536, workers: int = 16):
+        self.name = name
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.workers = workers
+        self._width = len(self.fields)
+        self._offsets = {field: index for index, field in enumerate(self.fields)}
+        self._region = capacity * self._width
+        self._header = (workers + 2) * self._region
+        self._thread_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._shm: Optional[SharedMemory] = None
+        self._values = None
+        self._base: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._lock_fd: Optional[int] = None
+
+    def increment(self, index: int, field: str, delta: int = 1) -> None:
+        """Add to this worker's counter for ``index``"""
+        if self._pid != os.getpid():
+            self._claim_slot()
+        if not 0 <= index < self.capacity:
+            raise ValueError(f"Index {index} is outside shared counter array {self.name}")
+
+        position = self._base + index * self._width + self._offsets[field]
+        with self._thread_lock:
+            self._values[position] += delta
+
+    def increment_many(self, index: int, deltas: Dict[str, int]) -> None:
+        """Add to several of this worker's counters for ``index`` at once"""
+        if self._pid != os.getpid():
+            self._claim_slot()
+        if not 0 <= index < self.capacity:
+            raise ValueError(f"Index {index} is outside shared counter array {self.name}")
+
+        start = self._base + index * self._width
+        with self._thread_lock:
+            for field, delta in deltas.items():
+                self._values[start + self._offsets[field]] += delta
+
+    def total(self, index: int, field: str) -> int:
+        """Node-wide value of a counter: the sum over every worker slot"""
+        self._ensure_open()
+        position = index * self._width + self._offsets[field]
+        return sum(self._values[slot * self._region + position] for slot in range(self.workers))
+
+    def totals_by_index(self) -> List[Tuple[int, ...]]:
+        """Node-wide values of every counter: one tuple of field totals per index"""
+        self._ensure_open()
+        summed = [0] * self._region
+        for slot in range(self.workers):
+            start = slot * self._region
+            summed = list(map(operator.add, summed, self._values[start:start + self._region]))
+        return [tuple(summed[start:start + self._width]) for start in range(0, self._region, self._width)]
+
+    def collect(self):
+        """
+        Stage the totals that changed since the last flushed batch as the next batch
+
+        Collecting again before ``mark_flushed`` replaces the staged batch
+        under the same sequence number, so only call it once the staged
+        batch is known not to have reached the database.
+
+        Returns:
+            Tuple of (batch, indexes, deltas): batch is (epoch, sequence),
+            unique across segments, or None if nothing changed; indexes and deltas are numpy arrays,
+            deltas with one row per index and one column per field
+        """
+        # Only the aggregating process pays for importing numpy
+        import numpy as np
+
+        self._ensure_open()
+        counters = self._regions()
+        totals = counters[:self.workers].sum(axis=0)
+        deltas = totals - counters[self.workers]
+        indexes = np.flatnonzero(deltas.any(axis=1))
+        if len(indexes) == 0:
+            return None, indexes, deltas[indexes]
+
+        staged = counters[self.workers + 1]
+        staged[:] = counters[self.workers]
+        staged[indexes] = totals[indexes]
+        epoch, flushed = self._values[self._header], self._values[self._header + 1]
+        self._values[self._header + 2] = flushed + 1
+        return (epoch, flushed + 1), indexes, deltas[indexes]
+
+    def staged_batch(self) -> Optional[Tuple[int, int]]:
+        """The (epoch, sequence) of a batch collected but not marked flushed, if any"""
+        self._ensure_open()
+        epoch, flushed, staged = self._values[self._header:self._header + 3]
+        return (epoch, staged) if staged > flushed else None
+
+    def mark_flushed(self, batch: Tuple[int, int]) -> None:
+        """Record a staged batch from ``collect`` as written to the database"""
+        if self.staged_batch() != batch:
+            raise ValueError(f"Batch {batch} is not staged in {self.name}")
+        counters = self._regions()
+        counters[self.workers] = counters[self.workers + 1]
+        self._values[self._header + 1] = batch[1]
+
+    def unlink(self) -> None:
+        """Remove the shared memory segment, e.g. when retiring the node"""
+        self._ensure_open()
+        _unlink_segment(self._shm, self._values)
+        self._shm = self._values = None
+        self._pid = None
+
+    def _regions(self):
+        import numpy as np
+
+        return np.ndarray(
+            (self.workers + 2, self.capacity, self._width), dtype=np.int64, buffer=self._shm.buf
+        )
+
+    def _claim_slot(self) -> None:
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+            self._ensure_open(reopen_lock=True)
+            for slot in range(self.workers):
+                try:
+                    fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                except OSError:
+                    continue
+                self._base = slot * self._region
+                self._pid = os.getpid()
+                return
+            raise RuntimeError(f"All {self.workers} worker slots of {self.name} are taken")
+
+    def _ensure_open(self, reopen_lock: bool = False) -> None:
+        if self._values is None:
+            size = (self._header + 3) * INT64_SIZE
+            try:
+                shm = SharedMemory(name=self.name, create=True, size=size)
+                created = True
+            except FileExistsError:
+                shm = SharedMemory(name=self.name)
+                created = False
+                if shm.size < size:
+                    shm.close()
+                    raise ValueError(f"Shared memory segment {self.name} is smaller than configured")
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            self._shm = shm
+            self._values = shm.buf.cast('q')
+            _close_at_exit(shm, self._values)
+            if created:
+                self._values[self._header] = secrets.randbits(63) or 1
+
+        if self._lock_fd is None or reopen_lock:
+            # A forked child shares the parent's descriptor but not its locks
+            self._lock_fd = os.open(_slots_path(self.name), os.O_RDWR | os.O_CREAT, 0o600)
+
+
+def remove_counter_array(name: str) -> None:
+    """Remove a SharedCounterArray's segment and slot lock file by name, without mapping it"""
+    for path in (f"/dev/shm/{name}", _slots_path(name)):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _slots_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.slots")
+
+
+def _close_at_exit(shm: SharedMemory, values) -> None:
+    """Release our view of a segment at exit, before SharedMemory.__del__ fails on it"""
+    def close():
+        values.release()
+        shm.close()
+    atexit.register(close)
+
+
+def _unlink_segment(shm: SharedMemory, values) -> None:
+    """Release our view of a segment and remove it from the system"""
+    values.release()
+    shm.close()
+    # unlink() unregisters from the resource tracker, which expects a registration
+    resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+def to_micros(amount: float) -> int:
+    """Money amount as integer millionths, for exact shared counters"""
+    return int(round(amount * 1000000))
+
+
+def from_micros(value: int) -> float:
+    return value / 1000000
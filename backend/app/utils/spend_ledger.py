@@ -0,0 +1,395 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+
+from app.core.config import settings
+from app.extensions import db
+from app.models.advertiser.advertiser import Advertiser, Transaction
+from app.utils.model_cache import model_cache
+
+logger = logging.getLogger(__name__)
+
+# Rewrite the write-ahead log once it grows past this size
+WAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+
+class SpendLedger:
+    """
+    Accumulates advertiser spend in memory and settles it in batches
+
+    Every recorded spend is appended to a per-process write-ahead log before
+    it is acknowledged. A settlement claims everything accumulated so far as a
+    numbered batch (logged and fsynced), then applies it in one database
+    transaction: one ``balance = balance - ?`` UPDATE and one 'spend'
+    Transaction row per advertiser. Transaction reference ids are derived
+    from the batch id, so replaying a batch after a crash is a no-op.
+
+    WAL records are JSON lines:
+        {"k": "s", "a": advertiser_id, "v": amount}    spend
+        {"k": "b", "id": batch_id, "t": {id: total}}   batch claimed
+        {"k": "c", "id": batch_id}                     batch committed
+
+    Each process holds an exclusive lock on ``spend-<stem>.lock`` for its
+    whole life. Logs whose lock file is no longer locked belong to dead
+    processes and are settled by whichever process picks them up first.
+    The lock file is never replaced, unlike the log, which compaction swaps
+    for a shorter copy.
+
+    Spend comes from BalanceGuard.charge(); the tree has no event pipeline
+    or bid endpoint yet to call it.
+    """
+
+    def __init__(self, directory: str, settle_interval: float = 1.0, system_user_id: int = 1):
+        self.directory = directory
+        self.settle_interval = settle_interval
+        self.system_user_id = system_user_id
+        self._lock = threading.Lock()
+        self._settle_lock = threading.Lock()
+        self._pending: Dict[int, float] = defaultdict(float)
+        self._unsettled: List[Tuple[str, Dict[int, float]]] = []
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._wal = None
+        self._wal_path: Optional[str] = None
+        self._owner_lock = None
+        self._sync_lock = threading.Lock()
+        # Records appended to the WAL, and how many of them are fsynced
+        self._written = 0
+        self._synced = 0
+        self._stem: Optional[str] = None
+        self._sequence = 0
+        self._pid: Optional[int] = None
+        self._listeners: List[Callable[[Dict[int, float]], None]] = []
+
+    def add_settle_listener(self, callback: Callable[[Dict[int, float]], None]) -> None:
+        """Call ``callback(totals)`` after each batch is committed to the database"""
+        self._listeners.append(callback)
+
+    def record(self, advertiser_id: int, amount: float) -> None:
+        """Record spend for an advertiser; durable in the WAL once this returns"""
+        if amount <= 0:
+            raise ValueError("Spend amount must be positive")
+
+        self._ensure_started()
+        with self._lock:
+            self._append({"k": "s", "a": advertiser_id, "v": amount})
+            self._pending[advertiser_id] += amount
+            written = self._written
+        self._sync(written)
+
+    def pending_spend(self, advertiser_id: int) -> float:
+        """Spend recorded by this process but not yet applied to the balance"""
+        with self._lock:
+            total = self._pending.get(advertiser_id, 0.0)
+            for _, totals in self._unsettled:
+                total += totals.get(advertiser_id, 0.0)
+            return total
+
+    def settle(self) -> int:
+        """
+        Claim pending spend as a batch and apply every unsettled batch
+
+        Returns:
+            Number of advertiser balances debited
+        """
+        if self._app is None:
+            return 0
+
+        with self._settle_lock:
+            self._claim_batch()
+            settled = 0
+            for batch_id, totals in list(self._unsettled):
+                if not self._apply_batch(batch_id, totals):
+                    break
+                with self._lock:
+                    self._append({"k": "c", "id": batch_id}, sync=True)
+                    self._unsettled.remove((batch_id, totals))
+                settled += len(totals)
+
+            self._adopt_orphans()
+            self._maybe_compact()
+            return settled
+
+    def close(self) -> None:
+        """Settle what is left and remove this process's WAL if nothing is outstanding"""
+        if self._pid != os.getpid() or self._wal is None:
+            return
+
+        self.settle()
+        with self._sync_lock, self._lock:
+            if not self._pending and not self._unsettled:
+                # Lock file first: a log without one is only adopted by its own lock
+                os.unlink(self._owner_path())
+                os.unlink(self._wal_path)
+            self._wal.close()
+            self._wal = None
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            if self._pid != os.getpid():
+                # Forked child: the parent still owns its WAL and pending spend.
+                # Close the inherited handles so the parent's locks die with it
+                if self._wal is not None:
+                    self._wal.close()
+                    self._owner_lock.close()
+                self._pending = defaultdict(float)
+                self._unsettled = []
+                self._open_wal()
+
+            self._app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, name='spend-ledger', daemon=True)
+            self._thread.start()
+
+    def _open_wal(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._pid = os.getpid()
+        self._stem = f"{self._pid}-{time.time_ns() // 1000000}"
+        self._sequence = 0
+        self._wal_path = os.path.join(self.directory, f"spend-{self._stem}.wal")
+        self._written = self._synced = 0
+        # Held for the life of the process; a released lock marks an orphaned log
+        self._owner_lock = open(self._owner_path(), 'a')
+        fcntl.flock(self._owner_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._wal = open(self._wal_path, 'a', encoding='utf-8')
+        # Older versions tell orphans by a lock on the log itself
+        fcntl.flock(self._wal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _owner_path(self) -> str:
+        return os.path.join(self.directory, f"spend-{self._stem}.lock")
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.settle_interval)
+            try:
+                self.settle()
+            except Exception as e:
+                logger.error(f"Spend settlement failed: {e}")
+
+    def _append(self, record: Dict, sync: bool = False) -> None:
+        """Append a WAL record; caller holds ``_lock``"""
+        self._wal.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._wal.flush()
+        self._written += 1
+        if sync:
+            os.fsync(self._wal.fileno())
+            self._synced = self._written
+
+    def _sync(self, written: int) -> None:
+        """
+        Group commit: fsync the WAL through its ``written``-th record
+
+        Callers arriving while an fsync runs wait for the next one, which
+        covers all of their records, so concurrent record() calls share
+        fsyncs instead of paying for one each.
+        """
+        with self._sync_lock:
+            if self._synced >= written:
+                return
+            with self._lock:
+                target = self._written
+                fileno = self._wal.fileno()
+            os.fsync(fileno)
+            self._synced = max(self._synced, target)
+
+    def _claim_batch(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            self._sequence += 1
+            batch_id = f"{self._stem}-{self._sequence}"
+            totals = dict(self._pending)
+            self._append({"k": "b", "id": batch_id, "t": totals}, sync=True)
+            self._unsettled.append((batch_id, totals))
+            self._pending = defaultdict(float)
+
+    def _apply_batch(self, batch_id: str, totals: Dict[int, float]) -> bool:
+        """Apply one batch in a single database transaction; idempotent per batch"""
+        references = {advertiser_id: f"spend:{batch_id}:{advertiser_id}" for advertiser_id in totals}
+        advertiser_table = Advertiser.__table__
+
+        with self._app.app_context():
+            try:
+                applied = db.session.execute(
+                    select(Transaction.reference_id).where(
+                        Transaction.reference_id.in_(list(references.values()))
+                    ).limit(1)
+                ).first()
+                if applied is not None:
+                    # A batch commits as a whole, so one row means all of it landed
+                    return True
+
+                db.session.execute(
+                    update(advertiser_table)
+                    .where(advertiser_table.c.id == bindparam('advertiser_id'))
+                    .values(balance=advertiser_table.c.balance - bindparam('amount')),
+                    [{"advertiser_id": advertiser_id, "amount": amount}
+                     for advertiser_id, amount in totals.items()]
+                )
+                model_cache.mark_stale(Advertiser, totals)
+
+                balances = dict(db.session.execute(
+                    select(advertiser_table.c.id, advertiser_table.c.balance)
+                    .where(advertiser_table.c.id.in_(list(totals)))
+                ).all())
+
+                now = datetime.utcnow()
+                rows = []
+                for advertiser_id, amount in totals.items():
+                    if advertiser_id not in balances:
+                        logger.warning(f"Dropping {amount} spend for unknown advertiser {advertiser_id}")
+                        continue
+                    rows.append({
+                        "advertiser_id": advertiser_id,
+                        "amount": -amount,
+                        "balance_after": balances[advertiser_id],
+                        "transaction_type": "spend",
+                        "reference_id": references[advertiser_id],
+                        "status": "completed",
+                        "created_by_id": self.system_user_id,
+                        "completed_at": now
+                    })
+                if rows:
+                    db.session.execute(insert(Transaction), rows)
+
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to settle spend batch {batch_id}: {e}")
+                return False
+
+        for callback in self._listeners:
+            try:
+                callback(totals)
+            except Exception as e:
+                logger.error(f"Spend settle listener failed: {e}")
+        return True
+
+    def _adopt_orphans(self) -> None:
+        """Settle WALs whose owning process has exited, then delete them"""
+        for path in glob.glob(os.path.join(self.directory, "spend-*.wal")):
+            if path == self._wal_path:
+                continue
+
+            lock_path = path[:-len(".wal")] + ".lock"
+            try:
+                owner = open(lock_path, 'r')
+            except FileNotFoundError:
+                # Written by an older version, or being removed: its own lock decides
+                owner = None
+            try:
+                handle = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                if owner is not None:
+                    owner.close()
+                continue
+
+            try:
+                try:
+                    # Owner lock first: it stays on one file while the log is compacted
+                    for lock in (owner, handle):
+                        if lock is not None:
+                            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+
+                stem = os.path.basename(path)[len("spend-"):-len(".wal")]
+                batches = _replay(handle)
+                if all(self._apply_batch(batch_id, totals) for batch_id, totals in batches):
+                    if owner is not None and _is_same_file(lock_path, owner):
+                        os.unlink(lock_path)
+                    if _is_same_file(path, handle):
+                        os.unlink(path)
+                    else:
+                        logger.warning(f"Spend WAL {path} was replaced while being recovered; kept it")
+                    logger.info(f"Recovered {len(batches)} spend batches from {stem}")
+            finally:
+                handle.close()
+                if owner is not None:
+                    owner.close()
+
+    def _maybe_compact(self) -> None:
+        """Rewrite the WAL as just its outstanding state once it grows large"""
+        with self._sync_lock, self._lock:
+            if self._wal.tell() < WAL_COMPACT_BYTES:
+                return
+
+            compact_path = self._wal_path + ".tmp"
+            with open(compact_path, 'w', encoding='utf-8') as compact:
+                for batch_id, totals in self._unsettled:
+                    compact.write(json.dumps({"k": "b", "id": batch_id, "t": totals}) + "\n")
+                for advertiser_id, amount in self._pending.items():
+                    compact.write(json.dumps({"k": "s", "a": advertiser_id, "v": amount}) + "\n")
+                compact.flush()
+                os.fsync(compact.fileno())
+
+            wal = open(compact_path, 'a', encoding='utf-8')
+            fcntl.flock(wal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(compact_path, self._wal_path)
+            self._wal.close()
+            self._wal = wal
+            self._synced = self._written
+
+
+def _is_same_file(path: str, handle) -> bool:
+    """Whether path still names the file open as handle"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(handle.fileno())
+    return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+def _replay(handle) -> List[Tuple[str, Dict[int, float]]]:
+    """Read a WAL into its unsettled batches, with trailing spend as a final batch"""
+    stem = os.path.basename(handle.name)[len("spend-"):-len(".wal")]
+    pending: Dict[int, float] = defaultdict(float)
+    batches: Dict[str, Dict[int, float]] = {}
+
+    for line in handle:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Torn write at the tail of a crashed process's log
+            continue
+
+        if record["k"] == "s":
+            pending[int(record["a"])] += record["v"]
+        elif record["k"] == "b":
+            batches[record["id"]] = {int(key): value for key, value in record["t"].items()}
+            pending = defaultdict(float)
+        elif record["k"] == "c":
+            batches.pop(record["id"], None)
+
+    result = list(batches.items())
+    if pending:
+        # Deterministic id, so a recovery interrupted midway is not applied twice
+        result.append((f"{stem}-r", dict(pending)))
+    return result
+
+
+spend_ledger = SpendLedger(
+    directory=settings.SPEND_LEDGER_DIR,
+    settle_interval=settings.SPEND_SETTLE_INTERVAL,
+    system_user_id=settings.LEDGER_SYSTEM_USER_ID
+)
+atexit.register(spend_ledger.close)
@@ -1,42 +1,83 @@
 from functools import wraps
-from flask import jsonify, request
+from typing import FrozenSet, Tuple
+
+from flask import g, jsonify, request
 from flask_jwt_extended import get_jwt
 
+from app.core.config import settings
+from app.models.user.user import Permission, WILDCARD_BIT
+from app.utils.permission_cache import NO_ACCESS, permission_cache
+from app.utils.rate_limiter import rate_limiter
+
+
+def token_access(claims) -> Tuple[int, FrozenSet[str], bool]:
+    """
+    Effective permission mask, extra permission names and superuser flag for a token
+
+    Only the user id (``sub``) is taken from the token. The user's roles and
+    superuser flag are resolved on the server, so revoking them applies to
+    tokens that were already issued. The result is memoized for the request.
+    """
+    access = g.get('_token_access')
+    if access is None:
+        try:
+            user_id = int(claims.get('sub'))
+        except (TypeError, ValueError):
+            access = NO_ACCESS
+        else:
+            access = permission_cache.resolve_user(user_id)
+        g._token_access = access
+    return access
+
+
+def token_permissions(claims) -> Tuple[int, FrozenSet[str]]:
+    """Effective permission mask and extra permission names for a token"""
+    mask, extra, _ = token_access(claims)
+    return mask, extra
+
+
+def token_is_superuser(claims) -> bool:
+    """Whether the token's user is a superuser now (not when the token was issued)"""
+    return token_access(claims)[2]
+
+
+def claims_have_permission(claims, permission: str) -> bool:
+    """Whether the token's user holds a permission"""
+    mask, extra = token_permissions(claims)
+    bit = Permission.bit(permission)
+    if bit is not None:
+        return Permission.mask_allows(mask, bit)
+    return bool(mask & WILDCARD_BIT) or permission in extra
+
+
 def validate_permissions(required_permissions):
     """
     Decorator to validate if user has required permissions
-    
+
+    The required permissions are compiled to a bit mask once, when the view
+    is decorated, so the check is a single bit test. Permissions without a
+    bit are checked by set membership.
+
     Args:
-        required_permissions: List of permission strings required
-        
+        required_permissions: List of permission strings required (any one suffices)
+
     Returns:
         Decorated function if user has permission, 403 response otherwise
     """
+    required_mask, required_extra = Permission.compile(required_permissions)
+
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            # Get current user permissions from JWT
-            claims = get_jwt()
-            user_permissions = claims.get('permissions', [])
-            is_superuser = claims.get('is_superuser', False)
-            
-            # Superusers have all permissions
-            if is_superuser:
-                return fn(*args, **kwargs)
-                
-            # Check if user has any of the required permissions
-            has_permission = False
-            for permission in required_permissions:
-                if permission in user_permissions or '*' in user_permissions:
-                    has_permission = True
-                    break
-                    
+            mask, extra = token_permissions(get_jwt())
+            has_permission = bool(mask & (required_mask | WILDCARD_BIT)) or not required_extra.isdisjoint(extra)
+
             if not has_permission:
                 return jsonify({
                     "error": "Not authorized to perform this action",
                     "required_permissions": required_permissions
                 }), 403
-                
+
             return fn(*args, **kwargs)
         return wrapper
     return decorator
@@ -66,7 +107,8 @@ def validate_rate_limit(limit_key, rate_limit="100/hour"):
     Args:
         limit_key: Function that returns the key to rate limit on (e.g., IP, user ID)
         rate_limit: Rate limit string in format "number/period" 
-                    (e.g., "100/hour", "1000/day")
+                    (e.g., "100/hour", "1000/day"), or a function of the key
+                    returning one
     
     Returns:
         Decorated function if under rate limit, 429 response otherwise
@@ -79,10 +121,32 @@ def validate_rate_limit(limit_key, rate_limit="100/hour"):
                 key = limit_key()
             else:
                 key = limit_key
-                
-            # TODO: Implement actual rate limiting with Redis
-            # This is a placeholder for now
-            
+            rate = rate_limit(key) if callable(rate_limit) else rate_limit
+
+            allowed, retry_after = rate_limiter.hit(f"{fn.__module__}.{fn.__name__}:{key}", rate)
+            if not allowed:
+                return jsonify({
+                    "error": "Rate limit exceeded"
+                }), 429, {"Retry-After": str(retry_after)}
+
             return fn(*args, **kwargs)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+
+
+def advertiser_key() -> str:
+    """Rate limit key for the token's advertiser, or its user when it has none"""
+    claims = get_jwt()
+    advertiser_id = claims.get('advertiser_id')
+    return f"advertiser:{advertiser_id}" if advertiser_id else f"user:{claims.get('sub')}"
+
+
+def advertiser_rate(key: str) -> str:
+    """Configured limit for an advertiser key, falling back to the default"""
+    if key.startswith('advertiser:'):
+        return settings.RATE_LIMIT_ADVERTISERS.get(key[len('advertiser:'):], settings.RATE_LIMIT_ADVERTISER)
+    return settings.RATE_LIMIT_ADVERTISER
+
+
+# Per-advertiser limit; apply below @jwt_required()
+advertiser_rate_limit = validate_rate_limit(advertiser_key, advertiser_rate)
@@ -0,0 +1,38 @@
+"""
+Gunicorn settings
+
+    gunicorn -c gunicorn.conf.py
+
+With preload_app the master imports the app and calls create_app() once,
+then forks the workers, which share that memory copy-on-write. Pools,
+drivers and background threads are reset in each worker by the
+os.register_at_fork hooks of the modules that own them.
+
+Workers are gthread workers serving GUNICORN_THREADS requests at once, so
+a request waiting on a password hash, a report query or the database
+leaves the worker's other threads serving. DB_POOL_SIZE must be at least
+the thread count.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app()"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:7000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ("true", "1", "t")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Recycle workers now and then so a slow leak can't grow without bound
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything the master built out of the collector's reach, so
+        # collections in the workers don't write to (and copy) shared pages
+        gc.freeze()
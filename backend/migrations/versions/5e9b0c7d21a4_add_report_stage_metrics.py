@@ -0,0 +1,27 @@
+"""Add report stage metrics
+
+Revision ID: 5e9b0c7d21a4
+Revises: d3a7c5e18f42
+Create Date: 2026-10-19 15:20:37.218604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b0c7d21a4'
+down_revision = 'd3a7c5e18f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stage_metrics', mysql.JSON(), nullable=True, comment='Wall time and memory of each generation stage'))
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_column('stage_metrics')
@@ -0,0 +1,42 @@
+"""Add platform daily statistic
+
+Revision ID: 7c1e4b9a2f30
+Revises: 32a2896b973d
+Create Date: 2026-10-19 09:12:04.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b9a2f30'
+down_revision = '32a2896b973d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('platformdailystatistic',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('impressions', sa.Integer(), nullable=False),
+    sa.Column('clicks', sa.Integer(), nullable=False),
+    sa.Column('conversions', sa.Integer(), nullable=False),
+    sa.Column('spend', sa.Float(), nullable=False, comment='Media cost from delivery stats'),
+    sa.Column('revenue', sa.Float(), nullable=False, comment='Advertiser spend charged, net of refunds'),
+    sa.Column('active_advertisers', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('platformdailystatistic', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_platformdailystatistic_date'), ['date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('platformdailystatistic', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_platformdailystatistic_date'))
+
+    op.drop_table('platformdailystatistic')
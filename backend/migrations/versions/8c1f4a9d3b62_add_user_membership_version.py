@@ -0,0 +1,26 @@
+"""Add user membership version
+
+Revision ID: 8c1f4a9d3b62
+Revises: 5e9b0c7d21a4
+Create Date: 2026-10-19 18:05:12.604311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4a9d3b62'
+down_revision = '5e9b0c7d21a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('membership_version', sa.Integer(), server_default='1', nullable=False, comment='角色成员版本'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('membership_version')
@@ -0,0 +1,77 @@
+"""Move audit log JSON columns to append-only audit_event table
+
+Revision ID: b4d82e61c9a7
+Revises: 7c1e4b9a2f30
+Create Date: 2026-10-19 10:41:27.530916
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d82e61c9a7'
+down_revision = '7c1e4b9a2f30'
+branch_labels = None
+depends_on = None
+
+# Tables of models using AuditLogMixin
+AUDITED_TABLES = [
+    'advertiser', 'qualification_file', 'transaction', 'campaign',
+    'creative', 'report', 'user', 'role'
+]
+
+
+def upgrade():
+    audit_event = op.create_table('audit_event',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('entity_type', sa.String(length=50), nullable=False, comment='Table name of the audited model'),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True, comment='User who made the change'),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('details', mysql.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_event', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_event_entity', ['entity_type', 'entity_id', 'created_at'], unique=False)
+
+    # Copy existing in-row history into audit_event, then drop the JSON columns
+    conn = op.get_bind()
+    for table_name in AUDITED_TABLES:
+        table = sa.table(table_name, sa.column('id', sa.Integer), sa.column('audit_log', sa.JSON))
+        result = conn.execute(
+            sa.select(table.c.id, table.c.audit_log).where(table.c.audit_log.isnot(None))
+        )
+
+        rows = []
+        for entity_id, audit_log in result:
+            for entry in (audit_log or {}).values():
+                rows.append({
+                    'entity_type': table_name,
+                    'entity_id': entity_id,
+                    'user_id': entry.get('user_id'),
+                    'action': entry.get('action', 'unknown'),
+                    'details': entry.get('details'),
+                    'created_at': datetime.fromisoformat(entry['timestamp']) if entry.get('timestamp') else datetime.utcnow()
+                })
+        if rows:
+            op.bulk_insert(audit_event, rows)
+
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('audit_log')
+
+
+def downgrade():
+    # History stays in audit_event; restored columns start empty
+    for table_name in AUDITED_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('audit_log', mysql.JSON(), nullable=True))
+
+    with op.batch_alter_table('audit_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_event_entity')
+
+    op.drop_table('audit_event')
@@ -0,0 +1,26 @@
+"""Add role permission version
+
+Revision ID: d3a7c5e18f42
+Revises: b4d82e61c9a7
+Create Date: 2026-10-19 14:40:12.503871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7c5e18f42'
+down_revision = 'b4d82e61c9a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('role', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('permission_version', sa.Integer(), server_default='1', nullable=False, comment='权限版本'))
+
+
+def downgrade():
+    with op.batch_alter_table('role', schema=None) as batch_op:
+        batch_op.drop_column('permission_version')
@@ -0,0 +1,37 @@
+"""Add serving counter checkpoint
+
+Revision ID: e6b3f0a8d915
+Revises: 8c1f4a9d3b62
+Create Date: 2026-10-19 21:40:37.215804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3f0a8d915'
+down_revision = '8c1f4a9d3b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('servingcountercheckpoint',
+    sa.Column('epoch', sa.BigInteger(), nullable=False, comment='Random id drawn when the shared memory segment was created'),
+    sa.Column('sequence', sa.BigInteger(), nullable=False, comment='Number of the last batch committed'),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('servingcountercheckpoint', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_servingcountercheckpoint_epoch'), ['epoch'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('servingcountercheckpoint', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_servingcountercheckpoint_epoch'))
+
+    op.drop_table('servingcountercheckpoint')
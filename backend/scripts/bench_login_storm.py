@@ -0,0 +1,169 @@
+"""
+Benchmark API latency during a login storm under gunicorn
+
+Starts gunicorn with gunicorn.conf.py, the shipped worker model, and runs
+API traffic (GET /health) on a few threads while other threads log in over
+HTTP as fast as they can with valid passwords, so every attempt pays for
+PBKDF2. It reports API p50/p99 latency with no storm and during the storm,
+with the configured threads per worker and again with GUNICORN_THREADS=1,
+where a worker waiting on a hash serves nothing else. The login route
+limit is lifted for the run.
+
+Usage:
+    python scripts/bench_login_storm.py [--seconds 5] [--login-threads 8] [--api-threads 2] [--port 7012]
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app import create_app
+from app.core.config import settings
+from app.models.base import db
+from app.models.user.user import User
+
+
+def seed(db_uri: str, users: int) -> None:
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_uri, 'SQLALCHEMY_ECHO': False})
+    with app.app_context():
+        db.create_all()
+        for index in range(users):
+            user = User(username=f"storm{index}", email=f"storm{index}@example.com")
+            user.set_password('storm-password')
+            db.session.add(user)
+        db.session.commit()
+
+
+def csrf_token() -> str:
+    """A CSRF token for a client without a JWT, as /api/auth/csrf-token would sign it"""
+    timestamp = int(time.time())
+    signature = hmac.new(settings.CSRF_SECRET_KEY.encode(), f"{timestamp}:None".encode(), hashlib.sha256)
+    return f"{timestamp}:{signature.hexdigest()}"
+
+
+def request(port: int, method: str, path: str, body=None, headers=None) -> int:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_ready(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(port, 'GET', '/health')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not answer on port {port}")
+
+
+def run_api(port, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        request(port, 'GET', '/health')
+        latencies.append(time.perf_counter() - start)
+
+
+def run_logins(port, index, users, stop, statuses):
+    headers = {'Content-Type': 'application/json', 'X-CSRF-Token': csrf_token()}
+    attempt = 0
+    while not stop.is_set():
+        body = json.dumps({'username': f"storm{(index + attempt) % users}", 'password': 'storm-password'})
+        attempt += 1
+        statuses[request(port, 'POST', '/api/auth/login', body, headers)] += 1
+
+
+def measure(port, seconds, login_threads, api_threads, users):
+    stop = threading.Event()
+    latencies = []
+    statuses = Counter()
+    threads = [
+        threading.Thread(target=run_api, args=(port, stop, latencies))
+        for _ in range(api_threads)
+    ] + [
+        threading.Thread(target=run_logins, args=(port, index, users, stop, statuses))
+        for index in range(login_threads)
+    ]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "api_rps": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "logins_per_s": statuses[200] / seconds,
+        "statuses": dict(statuses)
+    }
+
+
+def serve(db_uri: str, port: int, threads):
+    env = dict(os.environ, DATABASE_URL=db_uri, GUNICORN_BIND=f"127.0.0.1:{port}", SQLALCHEMY_ECHO='False',
+               RATE_LIMIT_ROUTES=json.dumps({'auth.login': '1000000/minute'}),
+               SQL_PROFILER_MODE='off', SLOW_PROFILE_THRESHOLD_MS='0')
+    if threads is not None:
+        env['GUNICORN_THREADS'] = str(threads)
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_ready(port)
+    return master
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--api-threads', type=int, default=2)
+    parser.add_argument('--port', type=int, default=7012)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.gettempdir(), 'bench_login_storm.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db_uri = f"sqlite:///{db_path}"
+    users = args.login_threads * 4
+    seed(db_uri, users)
+
+    print(f"cpus: {os.cpu_count()}, iterations: {settings.PASSWORD_HASH_ITERATIONS}, "
+          f"hash threads per worker: {settings.PASSWORD_HASH_WORKERS}, "
+          f"login threads: {args.login_threads}, api threads: {args.api_threads}")
+    print(f"{'worker threads':<16}{'mode':<10}{'api req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'logins/s':>10}  statuses")
+    for threads in (None, 1):
+        master = serve(db_uri, args.port, threads)
+        try:
+            label = 'configured' if threads is None else str(threads)
+            for mode, login_threads in (('no storm', 0), ('storm', args.login_threads)):
+                result = measure(args.port, args.seconds, login_threads, args.api_threads, users)
+                print(f"{label:<16}{mode:<10}{result['api_rps']:>10.0f}{result['p50_ms']:>9.2f}"
+                      f"{result['p99_ms']:>9.2f}{result['logins_per_s']:>10.1f}  {result['statuses']}")
+        finally:
+            master.send_signal(signal.SIGTERM)
+            master.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
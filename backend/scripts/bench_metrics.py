@@ -0,0 +1,98 @@
+"""
+Benchmark request metrics overhead
+
+Times RequestMetrics.record() on its own, the request hooks (timer start
+plus recording) inside a request context and rendering the node-wide
+totals for a scrape. Then it times full requests
+through the test client with the hooks installed and removed, alternating
+the two and keeping the best round of each.
+
+Usage:
+    python scripts/bench_metrics.py [--records 500000] [--requests 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.core.config import settings
+from app.core.metrics import RequestMetrics, _finish_request, _start_request, request_metrics
+
+
+def bench_record(records: int) -> float:
+    metrics = RequestMetrics('bench_request_metrics', workers=4)
+    endpoints = [f"campaign.endpoint_{i}" for i in range(32)]
+    metrics.configure((endpoint, 'GET') for endpoint in endpoints)
+    start = time.perf_counter()
+    for i in range(records):
+        metrics.record(endpoints[i % 32], 'GET', 200, 0.0042, 3, 0.0011)
+    elapsed = time.perf_counter() - start
+    metrics._counters.unlink()
+    return elapsed / records * 1000000
+
+
+def bench_render(app, renders: int) -> float:
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(renders):
+            request_metrics.render()
+        return (time.perf_counter() - start) / renders * 1000
+
+
+def bench_hooks(app, records: int) -> float:
+    with app.test_request_context('/api/auth/csrf-token'):
+        response = app.response_class('')
+        start = time.perf_counter()
+        for _ in range(records):
+            _start_request()
+            _finish_request(response)
+        return (time.perf_counter() - start) / records * 1000000
+
+
+def bench_requests(app, requests: int) -> float:
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/auth/csrf-token')
+    return (time.perf_counter() - start) / requests * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=500000)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"record(): {bench_record(args.records):.2f} us")
+
+    db_uri = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_metrics.db')}"
+    settings.RATE_LIMIT_EXEMPT = settings.RATE_LIMIT_EXEMPT + ['auth.refresh_csrf_token']
+    settings.METRICS_ENABLED = True
+    settings.METRICS_TOKEN = settings.METRICS_TOKEN or 'bench'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_uri, 'SQLALCHEMY_ECHO': False})
+    bench_requests(app, args.requests // 10)
+
+    print(f"request hooks: {bench_hooks(app, args.records // 5):.2f} us")
+    print(f"render() over {request_metrics.workers} worker slots: {bench_render(app, 20):.1f} ms")
+
+    before_request = app.before_request_funcs[None]
+    after_request = app.after_request_funcs[None]
+    hooked = (list(before_request), list(after_request))
+    unhooked = ([f for f in before_request if f is not _start_request],
+                [f for f in after_request if f is not _finish_request])
+
+    best = {False: float('inf'), True: float('inf')}
+    for round in range(10):
+        for enabled in ((False, True) if round % 2 else (True, False)):
+            before_request[:], after_request[:] = hooked if enabled else unhooked
+            best[enabled] = min(best[enabled], bench_requests(app, args.requests // 10))
+    print(f"full request (best of 10): {best[False]:.1f} us without metrics, {best[True]:.1f} us with "
+          f"({best[True] - best[False]:+.1f} us)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark per-worker memory with and without gunicorn --preload
+
+Starts gunicorn with gunicorn.conf.py twice, once loading the app in every
+worker and once preloading it in the master, warms every worker with some
+requests, then reads each worker's memory from /proc/<pid>/smaps_rollup.
+RSS counts shared pages in full; PSS divides them between the processes
+sharing them, and USS is what a worker alone holds, so the preload saving
+shows in PSS and USS.
+
+Usage:
+    python scripts/bench_preload.py [--workers 4] [--requests 200] [--port 7011]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_kb(pid: int):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def children(pid: int):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not answer {url}")
+
+
+def run(preload: bool, workers: int, requests: int, port: int, db_uri: str):
+    env = dict(os.environ, DATABASE_URL=db_uri, GUNICORN_PRELOAD=str(preload),
+               GUNICORN_WORKERS=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}", SQLALCHEMY_ECHO='False')
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(f"{base}/health")
+        # Requests are spread over the workers by the kernel; enough of them warm every worker
+        for i in range(requests):
+            path = ('/health', '/ready', '/api/auth/csrf-token')[i % 3]
+            try:
+                urllib.request.urlopen(base + path, timeout=5).read()
+            except OSError:
+                pass
+        time.sleep(0.5)
+        samples = [memory_kb(pid) for pid in children(master.pid)]
+        master_pss = memory_kb(master.pid)[1]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+    return samples, master_pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--port', type=int, default=7011)
+    args = parser.parse_args()
+
+    db_uri = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_preload.db')}"
+    print(f"{args.workers} workers, mean per worker (MB):")
+    print(f"{'mode':<12}{'rss':>8}{'pss':>8}{'uss':>8}{'total pss incl. master':>25}")
+    for name, preload in (('no preload', False), ('preload', True)):
+        samples, master_pss = run(preload, args.workers, args.requests, args.port, db_uri)
+        rss, pss, uss = (sum(sample[i] for sample in samples) / len(samples) / 1024 for i in range(3))
+        total = (sum(sample[1] for sample in samples) + master_pss) / 1024
+        print(f"{name:<12}{rss:>8.1f}{pss:>8.1f}{uss:>8.1f}{total:>25.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark report generation memory in memory and in chunks
+
+Fills a SQLite database with daily statistics, then generates the same
+sorted campaign report twice, each in a fresh process: once with
+REPORT_MEMORY_LIMIT_MB=0 (all in memory) and once with a ceiling low
+enough to switch it to the chunked path. Prints each run's stage
+breakdown from Report.stage_metrics.
+
+Usage:
+    python scripts/bench_report_memory.py [--rows 200000] [--chunk-rows 20000] [--limit-mb 16]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+def make_app(db_path: str):
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}", 'SQLALCHEMY_ECHO': False})
+
+
+def fill(db_path: str, rows: int) -> None:
+    from app.extensions import db
+    from app.models.report.report import DailyStatistic
+
+    with make_app(db_path).app_context():
+        db.create_all()
+        if DailyStatistic.query.count() == rows:
+            return
+        DailyStatistic.query.delete()
+        first_day = datetime.date(2026, 9, 1)
+        for start in range(0, rows, 10000):
+            db.session.execute(DailyStatistic.__table__.insert(), [dict(
+                date=first_day + datetime.timedelta(days=i % 30), advertiser_id=1 + i % 50,
+                impressions=random.randint(0, 100000), clicks=random.randint(0, 1000),
+                conversions=random.randint(0, 50), spend=random.random() * 1000, ctr=random.random(),
+                cpc=random.random(), cpm=random.random(), cvr=random.random(), cpa=random.random()
+            ) for i in range(start, min(start + 10000, rows))])
+        db.session.commit()
+
+
+def generate(db_path: str, chunk_rows: int) -> None:
+    from app.core.config import settings
+    from app.extensions import db
+    from app.models.report.report import Report
+    from app.utils.report_generators.campaign import CampaignReportGenerator
+
+    settings.REPORT_CHUNK_ROWS = chunk_rows
+    with make_app(db_path).app_context():
+        report = Report(name='bench', report_type='campaign', parameters={'sort_by': ['spend']},
+                        start_date=datetime.date(2026, 9, 1), end_date=datetime.date(2026, 9, 30))
+        report.save()
+        generator = CampaignReportGenerator(report)
+        generator._generate_file_path = lambda: os.path.join(tempfile.gettempdir(), 'bench_report.csv')
+        generator.generate()
+        print(json.dumps(db.session.get(Report, report.id).stage_metrics))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-rows', type=int, default=20000)
+    parser.add_argument('--limit-mb', type=int, default=16)
+    parser.add_argument('--generate', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.gettempdir(), 'bench_report_memory.db')
+    if args.generate:
+        generate(db_path, args.chunk_rows)
+        return
+
+    fill(db_path, args.rows)
+    for limit_mb in (0, args.limit_mb):
+        env = dict(os.environ, REPORT_MEMORY_LIMIT_MB=str(limit_mb), SQL_PROFILER_MODE='off',
+                   SLOW_PROFILE_THRESHOLD_MS='0', SLOW_PROFILE_JOB_THRESHOLD_MS='0')
+        output = subprocess.run(
+            [sys.executable, __file__, '--generate', '--chunk-rows', str(args.chunk_rows)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        metrics = json.loads(output.strip().splitlines()[-1])
+        seconds = sum(stage['seconds'] for stage in metrics['stages'].values())
+        print(f"REPORT_MEMORY_LIMIT_MB={limit_mb}: {metrics['mode']}, {metrics['rows']} rows in "
+              f"{metrics['chunks']} chunks, {seconds:.2f} s, RSS {metrics['rss_start_mb']} -> "
+              f"{metrics['rss_peak_mb']} MB at peak")
+        for name, stage in metrics['stages'].items():
+            print(f"    {name:<18}{stage['calls']:>4} calls {stage['seconds']:>8.3f} s "
+                  f"{stage.get('rss_peak_mb', 0):>8.1f} MB peak")
+
+
+if __name__ == '__main__':
+    main()
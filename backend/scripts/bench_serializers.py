@@ -0,0 +1,112 @@
+"""
+Benchmark model serialization for list endpoints
+
+Compares the previous reflective BaseModel.to_dict (walk __table__.columns,
+getattr + isinstance per column) with the compiled serializers, and the
+stdlib JSON encoder with the orjson-backed provider, over 10k rows per model.
+
+Usage:
+    python scripts/bench_serializers.py [--rows 10000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer
+from sqlalchemy import inspect as sa_inspect
+
+from app.main import create_app
+from app.models.advertiser.advertiser import Advertiser
+from app.models.campaign.campaign import Campaign
+from app.models.creative.creative import Creative
+from app.models.report.report import DailyStatistic, Report
+from app.models.user.user import User
+from app.utils.serializers import get_serializer, orjson
+
+MODELS = [Advertiser, Campaign, Creative, Report, User, DailyStatistic]
+
+
+def legacy_to_dict(obj):
+    """The reflective implementation compiled serializers replaced"""
+    result = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        result[column.name] = value
+    return result
+
+
+def sample_value(column, i):
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return datetime(2026, 1, 1, 12, 0, i % 60)
+    if isinstance(column_type, Date):
+        return date(2026, 1, 1)
+    if isinstance(column_type, Boolean):
+        return bool(i % 2)
+    if isinstance(column_type, Integer):
+        return i
+    if isinstance(column_type, Float):
+        return i * 1.5
+    if hasattr(column_type, 'enums'):
+        return column_type.enums[0]
+    if column_type.__class__.__name__ == 'JSON':
+        return {"key": i, "values": [1, 2, 3]}
+    return f"value-{i}"
+
+
+def build_rows(model, count):
+    columns = [prop.columns[0] for prop in sa_inspect(model).column_attrs]
+    keys = [prop.key for prop in sa_inspect(model).column_attrs]
+    return [
+        model(**{key: sample_value(column, i) for key, column in zip(keys, columns)})
+        for i in range(count)
+    ]
+
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    result = [fn(row) for row in rows]
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SQLALCHEMY_ECHO": False})
+
+    print(f"rows per model: {args.rows}, orjson: {'yes' if orjson else 'no'}")
+    print(f"{'model':<16}{'legacy ms':>12}{'compiled ms':>14}{'speedup':>10}"
+          f"{'json ms':>10}{'fast json ms':>14}")
+
+    with app.app_context():
+        for model in MODELS:
+            rows = build_rows(model, args.rows)
+            serializer = get_serializer(model)
+
+            legacy_time, _ = timed(legacy_to_dict, rows)
+            compiled_time, payload = timed(serializer, rows)
+
+            start = time.perf_counter()
+            json.dumps(payload, default=str, sort_keys=True)
+            stdlib_json_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            app.json.dumps(payload)
+            fast_json_time = time.perf_counter() - start
+
+            print(f"{model.__name__:<16}{legacy_time * 1000:>12.1f}{compiled_time * 1000:>14.1f}"
+                  f"{legacy_time / compiled_time:>9.1f}x{stdlib_json_time * 1000:>10.1f}"
+                  f"{fast_json_time * 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark shared-memory counter contention across worker processes
+
+Forks 4, 8 and 16 workers that all increment counters for the same small set
+of hot campaign ids, and compares per-worker slots (SharedCounterArray, the
+serving counters) with a single locked row per id (SharedCounterTable, as
+used by the balance guard). Checks that no increment is lost.
+
+Usage:
+    python scripts/bench_shared_counters.py [--increments 20000] [--hot-ids 8]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.shared_counters import SharedCounterArray, SharedCounterTable
+
+WORKER_COUNTS = (4, 8, 16)
+
+
+def run_slots(counters, hot_ids, increments, barrier, results):
+    barrier.wait()
+    start = time.perf_counter()
+    for i in range(increments):
+        counters.increment(hot_ids[i % len(hot_ids)], 'impressions')
+    results.put(time.perf_counter() - start)
+
+
+def run_locked(counters, hot_ids, increments, barrier, results):
+    barrier.wait()
+    rows = [counters.row(campaign_id) for campaign_id in hot_ids]
+    start = time.perf_counter()
+    for i in range(increments):
+        counters.add(rows[i % len(rows)], 'impressions', 1)
+    results.put(time.perf_counter() - start)
+
+
+def measure(target, counters, workers, hot_ids, increments):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=target, args=(counters, hot_ids, increments, barrier, results))
+        for _ in range(workers)
+    ]
+
+    wall_start = time.perf_counter()
+    for process in processes:
+        process.start()
+    timings = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - wall_start
+
+    per_op_us = sum(timings) / (workers * increments) * 1000000
+    return workers * increments / wall, per_op_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--increments', type=int, default=20000, help='increments per worker')
+    parser.add_argument('--hot-ids', type=int, default=8, help='distinct campaign ids incremented')
+    args = parser.parse_args()
+
+    hot_ids = list(range(1, args.hot_ids + 1))
+    suffix = os.getpid()
+
+    print(f"cpus: {os.cpu_count()}, increments per worker: {args.increments}, hot ids: {args.hot_ids}")
+    print(f"{'workers':>8}  {'mode':<18}{'ops/s':>12}{'us/op':>9}  {'lost':>5}")
+
+    for workers in WORKER_COUNTS:
+        expected = workers * args.increments
+
+        slots = SharedCounterArray(f"bench_slots_{suffix}_{workers}", ('impressions',),
+                                   capacity=args.hot_ids + 1, workers=workers)
+        throughput, per_op = measure(run_slots, slots, workers, hot_ids, args.increments)
+        counted = sum(slots.total(campaign_id, 'impressions') for campaign_id in hot_ids)
+        print(f"{workers:>8}  {'per-worker slots':<18}{throughput:>12,.0f}{per_op:>9.2f}  {expected - counted:>5}")
+        slots.unlink()
+
+        locked = SharedCounterTable(f"bench_locked_{suffix}_{workers}", ('impressions',),
+                                    capacity=args.hot_ids * 4)
+        throughput, per_op = measure(run_locked, locked, workers, hot_ids, args.increments)
+        counted = sum(locked.get(locked.row(campaign_id), 'impressions') for campaign_id in hot_ids)
+        print(f"{workers:>8}  {'locked rows':<18}{throughput:>12,.0f}{per_op:>9.2f}  {expected - counted:>5}")
+        locked.unlink()
+
+
+if __name__ == '__main__':
+    main()
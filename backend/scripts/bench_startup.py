@@ -0,0 +1,93 @@
+"""
+Benchmark application cold start
+
+Starts fresh interpreters that import the app and call create_app(), and
+reports the median wall time and peak RSS. Each run is repeated with the
+libraries that used to be imported at startup (neo4j, pandas, pycryptodome)
+imported first, which is what every process paid before they were made
+lazy. The import-time breakdown sums ``-X importtime`` self times per
+top-level package.
+
+Usage:
+    python scripts/bench_startup.py [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER_IMPORTS = ['neo4j', 'pandas', 'Crypto.Cipher.AES']
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__(name)
+from app.main import create_app
+create_app({{'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'SQLALCHEMY_ECHO': False}})
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [name for name in {watch!r} if name in sys.modules]
+}}))
+"""
+
+
+def start_once(db_uri: str, preload):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD.format(watch=['neo4j', 'pandas', 'Crypto', 'celery']), db_uri, *preload],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    self_us = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        self_us[name.strip().split('.')[0]] += int(own)
+    return json.loads(result.stdout.strip().splitlines()[-1]), self_us
+
+
+def measure(db_uri: str, preload, runs: int):
+    samples, breakdown = [], defaultdict(list)
+    for _ in range(runs):
+        sample, self_us = start_once(db_uri, preload)
+        samples.append(sample)
+        for package, us in self_us.items():
+            breakdown[package].append(us)
+    return {
+        'seconds': statistics.median(s['seconds'] for s in samples),
+        'rss_mb': statistics.median(s['rss_mb'] for s in samples),
+        'loaded': samples[-1]['loaded'],
+        'breakdown': {package: statistics.median(us) / 1000 for package, us in breakdown.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='packages shown in the import breakdown')
+    args = parser.parse_args()
+
+    db_uri = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_startup.db')}"
+    lazy = measure(db_uri, [], args.runs)
+    eager = measure(db_uri, EAGER_IMPORTS, args.runs)
+
+    print(f"{'':<8}{'startup':>10}{'peak rss':>11}  heavy modules loaded")
+    for name, result in (('lazy', lazy), ('eager', eager)):
+        print(f"{name:<8}{result['seconds'] * 1000:>8.0f}ms{result['rss_mb']:>9.0f}MB  {', '.join(result['loaded']) or '-'}")
+    print(f"\nlazy start saves {(eager['seconds'] - lazy['seconds']) * 1000:.0f}ms "
+          f"and {eager['rss_mb'] - lazy['rss_mb']:.0f}MB per process")
+
+    print(f"\nimport time by package, lazy start (median of {args.runs}, self time):")
+    for package, ms in sorted(lazy['breakdown'].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<28}{ms:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark database round trips of the create/update endpoints
+
+Calls the write views directly (skipping the CSRF before_request hook) and
+counts SQL statements and transaction ends (COMMIT/ROLLBACK) per request,
+first with the previous commit-per-save behaviour and then inside the
+request-scoped unit of work.
+
+Usage:
+    python scripts/bench_write_queries.py [--requests 200] [--db /tmp/bench_writes.db]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+import app.models.base as base
+from app.main import create_app
+from app.models.advertiser.advertiser import Advertiser
+from app.models.base import db
+from app.models.campaign.campaign import Campaign
+from app.models.user.user import User
+
+
+class RoundTripCounter:
+    """Counts statements and transaction ends on an engine"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.transactions = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+        event.listen(engine, 'commit', self._on_transaction_end)
+        event.listen(engine, 'rollback', self._on_transaction_end)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_transaction_end(self, *args):
+        self.transactions += 1
+
+    def reset(self):
+        self.statements = 0
+        self.transactions = 0
+
+
+def seed():
+    user = User(username='bench', email='bench@example.com', hashed_password='x', is_superuser=True)
+    advertiser = Advertiser(
+        name='Bench', company_name='Bench Ltd', contact_person='Bench',
+        contact_phone='1', contact_email='bench@example.com', status='approved'
+    )
+    user.save()
+    advertiser.save()
+    campaign = Campaign(
+        name='Bench', advertiser_id=advertiser.id, daily_budget=10, total_budget=100,
+        start_date=datetime.utcnow(), bid_amount=1
+    )
+    campaign.save()
+    return user.id, advertiser.id, campaign.id
+
+
+def scenarios(advertiser_id, campaign_id):
+    """(label, endpoint, method, path, view_args, payload factory)"""
+    return [
+        ('create advertiser', 'api_v1.advertiser.create_advertiser', 'POST', '/api/v1/advertisers/', {},
+         lambda i: {'name': f'A{i}', 'company_name': f'A{i} Ltd', 'contact_person': 'x',
+                    'contact_phone': '1', 'contact_email': f'a{i}@example.com'}),
+        ('update advertiser', 'api_v1.advertiser.update_advertiser', 'PUT',
+         f'/api/v1/advertisers/{advertiser_id}', {'advertiser_id': advertiser_id},
+         lambda i: {'address': f'Street {i}'}),
+        ('deposit', 'api_v1.advertiser.deposit_funds', 'POST',
+         f'/api/v1/advertisers/{advertiser_id}/deposit', {'advertiser_id': advertiser_id},
+         lambda i: {'amount': 10.0, 'transaction_id': f'bench-{time.time_ns()}-{i}'}),
+        ('create campaign', 'api_v1.campaign.create_campaign', 'POST', '/api/v1/campaigns/', {},
+         lambda i: {'name': f'C{i}', 'advertiser_id': advertiser_id, 'daily_budget': 10,
+                    'total_budget': 100, 'start_date': '2026-01-01T00:00:00',
+                    'bid_strategy': 'cpc', 'bid_amount': 1}),
+        ('update campaign', 'api_v1.campaign.update_campaign', 'PUT',
+         f'/api/v1/campaigns/{campaign_id}', {'campaign_id': campaign_id},
+         lambda i: {'name': f'Renamed {i}'}),
+    ]
+
+
+def run(app, counter, token, scenario, requests):
+    label, endpoint, method, path, view_args, payload = scenario
+    view = app.view_functions[endpoint]
+    headers = {'Authorization': f'Bearer {token}'}
+    statuses = set()
+
+    counter.reset()
+    start = time.perf_counter()
+    for i in range(requests):
+        with app.test_request_context(path, method=method, json=payload(i), headers=headers):
+            rv = view(**view_args)
+            statuses.add(rv[1] if isinstance(rv, tuple) else rv.status_code)
+    elapsed = time.perf_counter() - start
+
+    return (counter.statements / requests, counter.transactions / requests,
+            elapsed / requests * 1000, statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--db', default='/tmp/bench_writes.db')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{args.db}", "SQLALCHEMY_ECHO": False})
+
+    with app.app_context():
+        db.create_all()
+        user_id, advertiser_id, campaign_id = seed()
+        token = create_access_token(identity=str(user_id))
+        counter = RoundTripCounter(db.engine)
+
+    print(f"requests per endpoint: {args.requests}")
+    print(f"{'endpoint':<20}{'mode':<16}{'stmts/req':>10}{'txn ends/req':>14}{'ms/req':>9}  statuses")
+
+    in_unit_of_work = base.in_unit_of_work
+    for scenario in scenarios(advertiser_id, campaign_id):
+        for mode in ('commit per save', 'unit of work'):
+            # The baseline makes every save() commit as before
+            base.in_unit_of_work = (lambda: False) if mode == 'commit per save' else in_unit_of_work
+            statements, transactions, ms, statuses = run(app, counter, token, scenario, args.requests)
+            print(f"{scenario[0]:<20}{mode:<16}{statements:>10.1f}{transactions:>14.1f}{ms:>9.2f}  "
+                  f"{sorted(statuses)}")
+    base.in_unit_of_work = in_unit_of_work
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Build the memory-mapped serving snapshot
+
+Run one builder per node. Each build queries active campaigns and creatives
+once and atomically replaces the snapshot file, which the workers remap on
+their next check. With --interval the builder keeps rebuilding.
+
+Usage:
+    python scripts/build_serving_snapshot.py [--path FILE] [--interval SECONDS]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.main import create_app
+from app.utils.serving_snapshot import build_snapshot
+
+logger = logging.getLogger('build_serving_snapshot')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--path', default=settings.SERVING_SNAPSHOT_PATH)
+    parser.add_argument('--interval', type=float, default=None,
+                        help='rebuild every INTERVAL seconds instead of once')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    app = create_app()
+
+    while True:
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                counts = build_snapshot(args.path)
+            logger.info(
+                f"Wrote {counts['campaigns']} campaigns and {counts['creatives']} creatives "
+                f"to {args.path} in {time.perf_counter() - start:.2f}s"
+            )
+        except Exception as e:
+            if args.interval is None:
+                raise
+            logger.error(f"Snapshot build failed: {e}")
+
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
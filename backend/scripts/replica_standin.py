@@ -0,0 +1,58 @@
+"""
+Local primary/replica stand-in using SQLite files
+
+Copies the primary database file into each replica file every --delay
+seconds with SQLite's online backup, so replicas trail the primary the way
+real asynchronous replicas do. After each copy, the copy time is written to
+the replica's PRAGMA user_version, which is where the router reads SQLite
+replica lag from. Run it next to the app with the printed environment:
+
+    DATABASE_URL=sqlite:////tmp/dsp/primary.db
+    REPLICA_DATABASE_URLS=sqlite:////tmp/dsp/replica_0.db,sqlite:////tmp/dsp/replica_1.db
+
+Usage:
+    python scripts/replica_standin.py [--dir /tmp/dsp] [--replicas 2] [--delay 1.0] [--once]
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+
+def sync(primary_path: str, replica_path: str) -> None:
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+        target.execute(f"PRAGMA user_version = {int(time.time())}")
+        target.commit()
+    finally:
+        source.close()
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dir', default='/tmp/dsp')
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--delay', type=float, default=1.0, help='seconds between copies (replication lag)')
+    parser.add_argument('--once', action='store_true', help='copy once and exit')
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    primary = os.path.join(args.dir, 'primary.db')
+    replicas = [os.path.join(args.dir, f"replica_{index}.db") for index in range(args.replicas)]
+
+    print(f"DATABASE_URL=sqlite:///{primary}")
+    print("REPLICA_DATABASE_URLS=" + ",".join(f"sqlite:///{path}" for path in replicas))
+
+    while True:
+        for replica in replicas:
+            sync(primary, replica)
+        if args.once:
+            break
+        time.sleep(args.delay)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import pytest
+
+from app import create_app
+from app.extensions import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a scratch SQLite database, with its tables and an app context"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path}/test.db",
+        'SQLALCHEMY_ECHO': False
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
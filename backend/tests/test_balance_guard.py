@@ -0,0 +1,103 @@
+import datetime
+import os
+import tempfile
+import uuid
+
+import pytest
+
+from app.extensions import db
+from app.models.advertiser.advertiser import Advertiser
+from app.models.campaign.campaign import Campaign
+from app.utils.balance_guard import BalanceGuard
+from app.utils.shared_counters import SharedCounterTable
+
+WORKERS = 4
+
+
+@pytest.fixture
+def name():
+    name = f"test_guard_{uuid.uuid4().hex[:12]}"
+    yield name
+    for suffix in ('.lock', '.refill'):
+        path = os.path.join(tempfile.gettempdir(), name + suffix)
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+@pytest.fixture
+def guard(app, name):
+    db.session.add(Advertiser(
+        id=1, name="a", company_name="c", contact_person="p", contact_phone="1",
+        contact_email="a@example.com", balance=100.0
+    ))
+    db.session.add(Campaign(
+        id=1, name="c", advertiser_id=1, daily_budget=1, total_budget=1,
+        start_date=datetime.datetime(2026, 10, 1), bid_amount=1, status='active'
+    ))
+    db.session.commit()
+    guard = BalanceGuard(name, capacity=64, refresh_interval=3600)
+    yield guard
+    guard.table.unlink()
+
+
+def in_workers(app, run) -> None:
+    """Run ``run()`` in WORKERS forked processes at once and wait for them"""
+    pids = []
+    for _ in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with app.app_context():
+                    run()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        assert os.waitpid(pid, 0)[1] == 0
+
+
+def test_table_adds_are_atomic_across_processes(app, name):
+    table = SharedCounterTable(name, ('hits',), capacity=64)
+    try:
+        row = table.row(7)
+        in_workers(app, lambda: [table.add(table.row(7), 'hits', 1) for _ in range(2000)])
+        assert table.get(row, 'hits') == WORKERS * 2000
+    finally:
+        table.unlink()
+
+
+def test_workers_never_reserve_past_the_balance(app, guard):
+    def run():
+        while guard.reserve(1, 0.3):
+            pass
+
+    in_workers(app, run)
+    # 333 reservations of 0.3 fit in 100.0 whichever workers made them
+    assert guard.table.get(guard.table.row(1), 'unsettled') == 99900000
+    assert guard.available(1) == pytest.approx(0.1)
+    assert not guard.reserve(1, 0.3)
+
+
+def test_exhaustion_follows_reservations(app, guard):
+    assert guard.is_campaign_eligible(1)
+    assert guard.reserve(1, 100.0)
+    assert not guard.is_campaign_eligible(1)
+    assert not guard.reserve(1, 0.01)
+
+    guard.release(1, 40.0)
+    assert guard.is_campaign_eligible(1)
+    assert guard.available(1) == pytest.approx(40.0)
+
+
+def test_settlement_moves_spend_out_of_limit_and_unsettled(app, guard):
+    assert guard.reserve(1, 30.0)
+    guard._on_settled({1: 30.0})
+    row = guard.table.row(1)
+    assert guard.table.get(row, 'unsettled') == 0
+    assert guard.available(1) == pytest.approx(70.0)
+
+    # A refill from the settled balance lands on the same credit
+    db.session.query(Advertiser).filter_by(id=1).update({'balance': 70.0})
+    db.session.commit()
+    guard._refill(1, 70.0)
+    assert guard.available(1) == pytest.approx(70.0)
@@ -0,0 +1,111 @@
+import datetime
+import os
+import tempfile
+import uuid
+
+import pytest
+
+from app.extensions import db
+from app.models.advertiser.advertiser import Advertiser
+from app.models.campaign.campaign import Campaign
+from app.models.report.report import DailyStatistic, ServingCounterCheckpoint
+from app.utils.serving_counters import ServingCounters
+from app.utils.shared_counters import SharedCounterArray
+
+WORKERS = 4
+
+
+@pytest.fixture
+def name():
+    name = f"test_serving_{uuid.uuid4().hex[:12]}"
+    yield name
+    for path in (f"{name}.aggregator", f"{name}_campaign.slots", f"{name}_creative.slots", f"{name}.slots"):
+        path = os.path.join(tempfile.gettempdir(), path)
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+@pytest.fixture
+def counters(app, name):
+    db.session.add(Advertiser(
+        id=1, name="a", company_name="c", contact_person="p", contact_phone="1", contact_email="a@example.com"
+    ))
+    db.session.add(Campaign(
+        id=1, name="c", advertiser_id=1, daily_budget=1, total_budget=1,
+        start_date=datetime.datetime(2026, 10, 1), bid_amount=1, status='active'
+    ))
+    db.session.commit()
+    counters = ServingCounters(name, capacity=64, workers=WORKERS + 1, flush_interval=3600)
+    counters._app = app
+    yield counters
+    counters.campaigns.unlink()
+    counters.creatives.unlink()
+
+
+def campaign_stats():
+    db.session.rollback()
+    return [(stat.impressions, stat.spend) for stat in DailyStatistic.query.all()]
+
+
+def test_increments_from_every_worker_are_summed(app, name):
+    array = SharedCounterArray(name, ('hits',), capacity=16, workers=WORKERS)
+    try:
+        pids = []
+        for _ in range(WORKERS):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    for _ in range(1000):
+                        array.increment(3, 'hits')
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            assert os.waitpid(pid, 0)[1] == 0
+
+        assert array.total(3, 'hits') == WORKERS * 1000
+        batch, indexes, deltas = array.collect()
+        assert list(indexes) == [3] and deltas.tolist() == [[WORKERS * 1000]]
+        array.mark_flushed(batch)
+        assert array.collect()[0] is None
+    finally:
+        array.unlink()
+
+
+def test_flush_writes_deltas_once(counters):
+    counters.campaigns.increment_many(1, {'impressions': 3, 'spend': 1500000})
+    assert counters.flush() == 1
+    counters.campaigns.increment_many(1, {'impressions': 2, 'spend': 500000})
+    assert counters.flush() == 1
+    assert counters.flush() == 0
+    assert campaign_stats() == [(5, 2.0)]
+
+
+def test_crash_between_commit_and_mark_flushed(counters, monkeypatch):
+    counters.campaigns.increment_many(1, {'impressions': 3, 'spend': 1500000})
+    # The aggregator dies right after its transaction commits
+    monkeypatch.setattr(counters.campaigns, 'mark_flushed', lambda batch: None)
+    assert counters.flush() == 1
+    assert counters.campaigns.staged_batch() is not None
+    monkeypatch.undo()
+
+    # The next aggregator finds the checkpoint and does not add the batch again
+    counters.campaigns.increment_many(1, {'impressions': 1})
+    assert counters.flush() == 1
+    assert campaign_stats() == [(4, 1.5)]
+    assert counters.campaigns.staged_batch() is None
+    assert ServingCounterCheckpoint.query.one().sequence == 2
+
+
+def test_failed_commit_is_collected_again(counters, monkeypatch):
+    counters.campaigns.increment_many(1, {'impressions': 3, 'spend': 1500000})
+
+    def fail(batch):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(counters, '_checkpoint', fail)
+    assert counters.flush() == 0
+    assert campaign_stats() == []
+    monkeypatch.undo()
+
+    assert counters.flush() == 1
+    assert campaign_stats() == [(3, 1.5)]
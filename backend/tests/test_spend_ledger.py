@@ -0,0 +1,251 @@
+import fcntl
+import json
+import os
+import shutil
+
+import pytest
+
+from app.extensions import db
+from app.models.advertiser.advertiser import Advertiser, Transaction
+from app.utils import spend_ledger as ledger_module
+from app.utils.spend_ledger import SpendLedger
+
+ADVERTISERS = (1, 2, 3)
+START_BALANCE = 1000.0
+
+
+@pytest.fixture
+def advertisers(app):
+    for advertiser_id in ADVERTISERS:
+        db.session.add(Advertiser(
+            id=advertiser_id, name=f"a{advertiser_id}", company_name="c", contact_person="p",
+            contact_phone="1", contact_email=f"a{advertiser_id}@example.com", balance=START_BALANCE
+        ))
+    db.session.commit()
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "ledger")
+
+
+def debited() -> dict:
+    db.session.rollback()
+    return {
+        advertiser_id: round(START_BALANCE - balance, 6)
+        for advertiser_id, balance in db.session.query(Advertiser.id, Advertiser.balance)
+    }
+
+
+def transactions() -> dict:
+    """Spend Transaction rows per advertiser"""
+    db.session.rollback()
+    counts = dict.fromkeys(ADVERTISERS, 0)
+    for (advertiser_id,) in db.session.query(Transaction.advertiser_id).filter_by(transaction_type='spend'):
+        counts[advertiser_id] += 1
+    return counts
+
+
+def ledger(app, directory: str) -> SpendLedger:
+    # Never settles on its own; each test calls settle() or _adopt_orphans()
+    spend_ledger = SpendLedger(directory, settle_interval=3600)
+    spend_ledger._app = app
+    return spend_ledger
+
+
+def crash(app, directory: str, run) -> None:
+    """Run ``run(ledger)`` in a forked process that then dies without settling or closing"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with app.app_context():
+                child = ledger(app, directory)
+                child._open_wal()
+                run(child)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def test_replay_applies_unsettled_batches_once(app, advertisers, directory):
+    os.makedirs(directory)
+    records = [
+        {"k": "s", "a": 1, "v": 1.0},
+        {"k": "b", "id": "old-1", "t": {"1": 1.0}},
+        {"k": "c", "id": "old-1"},
+        {"k": "s", "a": 2, "v": 2.0},
+        {"k": "b", "id": "old-2", "t": {"2": 2.0}},
+        {"k": "s", "a": 3, "v": 3.0},
+        {"k": "s", "a": 3, "v": 0.5},
+    ]
+    path = os.path.join(directory, "spend-old.wal")
+    with open(path, 'w') as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+        f.write('{"k": "s", "a": 1, "v"')  # torn tail
+    open(os.path.join(directory, "spend-old.lock"), 'w').close()
+    shutil.copy(path, path + ".copy")
+
+    ledger(app, directory)._adopt_orphans()
+    # old-1 was committed before the crash, so only old-2 and the trailing spend apply
+    assert debited() == {1: 0.0, 2: 2.0, 3: 3.5}
+    assert transactions() == {1: 0, 2: 1, 3: 1}
+    assert os.listdir(directory) == ["spend-old.wal.copy"]
+
+    # The same log again, as if recovery died before deleting it
+    os.rename(path + ".copy", path)
+    ledger(app, directory)._adopt_orphans()
+    assert debited() == {1: 0.0, 2: 2.0, 3: 3.5}
+    assert transactions() == {1: 0, 2: 1, 3: 1}
+    assert os.listdir(directory) == []
+
+
+def test_crash_with_unsettled_spend(app, advertisers, directory):
+    def run(child):
+        for advertiser_id in ADVERTISERS:
+            child.record(advertiser_id, 0.25)
+        child.settle()
+        child.record(1, 1.0)
+
+    crash(app, directory, run)
+    assert len(os.listdir(directory)) == 2
+
+    ledger(app, directory)._adopt_orphans()
+    assert debited() == {1: 1.25, 2: 0.25, 3: 0.25}
+    assert transactions() == {1: 2, 2: 1, 3: 1}
+    assert os.listdir(directory) == []
+
+
+def test_crash_mid_settle_after_commit(app, advertisers, directory):
+    """The batch committed but the process died before logging it as committed"""
+    def run(child):
+        for advertiser_id in ADVERTISERS:
+            child.record(advertiser_id, 2.0)
+
+        def append(record, sync=False):
+            if record["k"] == "c":
+                os._exit(0)
+            real_append(record, sync)
+        real_append = child._append
+        child._append = append
+        child.settle()
+
+    crash(app, directory, run)
+    assert debited() == {1: 2.0, 2: 2.0, 3: 2.0}
+    wal = next(name for name in os.listdir(directory) if name.endswith(".wal"))
+    shutil.copy(os.path.join(directory, wal), os.path.join(directory, "replay.copy"))
+
+    # Recovery re-runs the claimed batch, which must not debit again
+    ledger(app, directory)._adopt_orphans()
+    assert debited() == {1: 2.0, 2: 2.0, 3: 2.0}
+    assert transactions() == {1: 1, 2: 1, 3: 1}
+    assert os.listdir(directory) == ["replay.copy"]
+
+    # And again, as if that recovery died before deleting the log
+    os.rename(os.path.join(directory, "replay.copy"), os.path.join(directory, wal))
+    open(os.path.join(directory, wal[:-len(".wal")] + ".lock"), 'w').close()
+    ledger(app, directory)._adopt_orphans()
+    assert debited() == {1: 2.0, 2: 2.0, 3: 2.0}
+    assert transactions() == {1: 1, 2: 1, 3: 1}
+    assert os.listdir(directory) == []
+
+
+def test_crash_mid_settle_before_commit(app, advertisers, directory):
+    """The batch was claimed in the log but never reached the database"""
+    def run(child):
+        child.record(1, 1.5)
+        child.record(2, 0.5)
+        child._claim_batch()
+        child.record(3, 4.0)
+
+    crash(app, directory, run)
+    assert debited() == {1: 0.0, 2: 0.0, 3: 0.0}
+
+    ledger(app, directory)._adopt_orphans()
+    assert debited() == {1: 1.5, 2: 0.5, 3: 4.0}
+    assert transactions() == {1: 1, 2: 1, 3: 1}
+    assert os.listdir(directory) == []
+
+
+def test_apply_batch_is_idempotent(app, advertisers, directory):
+    spend_ledger = ledger(app, directory)
+    assert spend_ledger._apply_batch("b-1", {1: 3.0, 2: 1.0})
+    assert spend_ledger._apply_batch("b-1", {1: 3.0, 2: 1.0})
+    assert debited() == {1: 3.0, 2: 1.0, 3: 0.0}
+    assert transactions() == {1: 1, 2: 1, 3: 0}
+    assert db.session.query(Transaction.reference_id).filter_by(advertiser_id=1).scalar() == "spend:b-1:1"
+
+
+def test_live_log_is_not_adopted(app, advertisers, directory):
+    owner = ledger(app, directory)
+    owner._open_wal()
+    owner.record(1, 1.0)
+
+    ledger(app, directory)._adopt_orphans()
+    assert debited()[1] == 0.0
+    assert os.path.exists(owner._wal_path)
+
+    owner.close()
+    assert debited()[1] == 1.0
+    assert os.listdir(directory) == []
+
+
+class CompactBeforeLock:
+    """fcntl for the ledger module that compacts the owner's WAL before the next lock attempt"""
+    LOCK_EX = fcntl.LOCK_EX
+    LOCK_NB = fcntl.LOCK_NB
+
+    def __init__(self, owner: SpendLedger):
+        self.owner = owner
+        self.armed = False
+
+    def flock(self, fd: int, operation: int) -> None:
+        if self.armed:
+            self.armed = False
+            compact_bytes = ledger_module.WAL_COMPACT_BYTES
+            ledger_module.WAL_COMPACT_BYTES = 0
+            try:
+                self.owner._maybe_compact()
+            finally:
+                ledger_module.WAL_COMPACT_BYTES = compact_bytes
+        fcntl.flock(fd, operation)
+
+
+def test_compaction_during_orphan_scan(app, advertisers, directory, monkeypatch):
+    owner = ledger(app, directory)
+    owner._open_wal()
+    scanner = ledger(app, directory)
+    shim = CompactBeforeLock(owner)
+    monkeypatch.setattr(ledger_module, 'fcntl', shim)
+
+    for round in range(20):
+        for _ in range(20):
+            owner.record(1, 0.01)
+        owner.record(2, 1.0)
+        # Every other round leaves a claimed batch outstanding at compaction
+        if round % 2:
+            owner.settle()
+        else:
+            owner._claim_batch()
+        # The scanner has opened the live WAL when the owner swaps it
+        shim.armed = True
+        inode = os.stat(owner._wal_path).st_ino
+        scanner._adopt_orphans()
+        assert os.stat(owner._wal_path).st_ino != inode, "not compacted"
+        assert os.path.exists(owner._wal_path), f"live WAL deleted in round {round}"
+        assert debited()[2] == round + round % 2, f"live WAL adopted in round {round}"
+
+    owner.settle()
+    assert debited() == {1: 4.0, 2: 20.0, 3: 0.0}
+    owner.close()
+    assert os.listdir(directory) == []
+
+
+def test_record_is_fsynced(app, directory, monkeypatch):
+    spend_ledger = ledger(app, directory)
+    spend_ledger._open_wal()
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(ledger_module.os, 'fsync', lambda fd: synced.append(fd) or real_fsync(fd))
+
+    spend_ledger.record(1, 1.0)
+    assert synced and spend_ledger._synced == spend_ledger._written == 1